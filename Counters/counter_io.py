@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+'''
+Read the item texts exported by the parsers in bulk. The *_adrs columns of a
+summary table are the keys of the items, e.g. '10-K/<cik>/<file>_item7.txt',
+relative to the store_path of the counters. If the folder of a form under
+store_path has an items.sqlite, i.e. the parsers ran with store_backend =
+'sqlite'(see Parsers/item_store.py), the items of the form are read from it,
+many in a query; otherwise from the txt files one by one, which may be
+compressed(store_backend = 'gz', 'bz2' or 'zst'), e.g. <file>_item7.txt.gz,
+and are then decompressed as they are read.
+
+The summary tables are read and written in the format of their extension:
+.xlsx, .csv(.csv.gz, ...), .parquet or .feather, the same as
+Parsers/panel_io.py; the empty strs are written as NaN in Parquet and
+Arrow, as Excel and csv read them back.
+
+'''
+import bz2
+import gzip
+import os
+import sqlite3
+import zlib
+import pandas as pd
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+store_file_name = 'items.sqlite'
+
+def open_item_file(item_path: str, encoding: str):
+    '''
+    Open the txt file of an item, or its compressed file if there is no txt
+    file. None if neither exists.
+
+    '''
+    if os.path.exists(item_path):
+        return open(item_path, 'r', encoding = encoding)
+    if os.path.exists(item_path + '.gz'):
+        return gzip.open(item_path + '.gz', 'rt', encoding = encoding)
+    if os.path.exists(item_path + '.bz2'):
+        return bz2.open(item_path + '.bz2', 'rt', encoding = encoding)
+    if os.path.exists(item_path + '.zst'):
+        if zstandard is None:
+            raise ImportError(f'zstandard is needed to read {item_path}.zst; pip install zstandard')
+        return zstandard.open(item_path + '.zst', 'rt', encoding = encoding)
+    return None
+
+def read_items(store_path: str, adrs_list: list, encoding: str = 'gbk', chunk_size: int = 500):
+    '''
+    Returns {adrs: text} of the items in adrs_list that are found.
+
+    '''
+    items = {}
+    by_form = {}
+    for adrs in adrs_list:
+        # NaN or '' for an item not found
+        if not isinstance(adrs, str) or adrs == '':
+            continue
+        by_form.setdefault(adrs.split('/')[0], []).append(adrs)
+
+    for form, form_adrs in by_form.items():
+        db_path = store_path + '/' + form + '/' + store_file_name
+        if os.path.exists(db_path):
+            connection = sqlite3.connect(db_path, timeout = 600)
+            try:
+                for i in range(0, len(form_adrs), chunk_size):
+                    chunk = form_adrs[i:i + chunk_size]
+                    marks = ', '.join('?' * len(chunk))
+                    for adrs, text in connection.execute(f'SELECT adrs, text FROM items WHERE adrs IN ({marks})', chunk):
+                        items[adrs] = zlib.decompress(text).decode('utf-8')
+            finally:
+                connection.close()
+        else:
+            for adrs in form_adrs:
+                f = open_item_file(store_path + '/' + adrs, encoding)
+                if f is not None:
+                    with f:
+                        items[adrs] = f.read()
+    return items
+
+def summary_format(path: str):
+    lower = path.lower()
+    if lower.endswith(('.xlsx', '.xls')):
+        return 'excel'
+    if '.csv' in lower.rsplit('/', 1)[-1]:
+        return 'csv'
+    if lower.endswith(('.parquet', '.pq')):
+        return 'parquet'
+    if lower.endswith(('.feather', '.arrow')):
+        return 'feather'
+    raise ValueError(f'unknown format of summary table: {path}')
+
+def read_summary(path: str):
+    file_format = summary_format(path)
+    if file_format == 'excel':
+        return pd.read_excel(path)
+    if file_format == 'csv':
+        return pd.read_csv(path)
+    if file_format == 'parquet':
+        return pd.read_parquet(path)
+    return pd.read_feather(path)
+
+def blank_to_nan(summary_df):
+    # a copy of summary_df with the empty strs in its str columns as NaN
+    blanks = {col: summary_df[col].mask(summary_df[col] == '') for col in summary_df.columns
+              if pd.api.types.is_string_dtype(summary_df[col].dtype) and (summary_df[col] == '').any()}
+    if len(blanks) == 0:
+        return summary_df
+    summary_df = summary_df.copy()
+    for col, values in blanks.items():
+        summary_df[col] = values
+    return summary_df
+
+def write_summary(summary_df, path: str, index: bool = False):
+    file_format = summary_format(path)
+    if file_format == 'excel':
+        summary_df.to_excel(path, index = index)
+    elif file_format == 'csv':
+        summary_df.to_csv(path, index = index)
+    elif file_format == 'parquet':
+        blank_to_nan(summary_df).to_parquet(path, index = index)
+    else:
+        summary_df = blank_to_nan(summary_df.reset_index() if index else summary_df.reset_index(drop = True))
+        summary_df.to_feather(path)
@@ -1,12 +1,13 @@
 import numpy as np
 import pandas as pd
-import os
 from russia_counters import *
+from counter_io import read_items, read_summary, write_summary
 from tqdm import tqdm
 
 class RussiaNum:
     def __init__(self, summary_file_name: str, store_path: str):
-        panel_df = pd.read_excel(summary_file_name)
+        # .xlsx, .csv, .parquet or .feather; see counter_io
+        panel_df = read_summary(summary_file_name)
         panel_df['f_date'] = [date.strftime('%Y-%m-%d')
                               if not isinstance(date, str)
                               else date
@@ -34,18 +35,21 @@ class RussiaNum:
         elif mode == 'exact word':
             russia_counter = RussiaCounter_ExactWord()
             
-        for i in tqdm(range(len(self.panel_df))):
-            for item_name in self.item_name_list:
-                if pd.isna(self.panel_df.loc[i, item_name + "_adrs"]):
-                    continue
-                item_path = self.store_path + '/' + self.panel_df.loc[i, item_name + "_adrs"]
-                if not pd.isna(item_path) and os.path.exists(item_path):
-                    with open(item_path, "r", encoding="gbk") as f:
-                        text = f.read()
-                    count_result = russia_counter.count_by_dict(text=text)
+        for item_name in self.item_name_list:
+            # read the items in batches, from the txt files or the packed store; see counter_io
+            rows = [(i, adrs) for i, adrs in enumerate(self.panel_df[item_name + "_adrs"])
+                    if isinstance(adrs, str) and adrs]
+            batch_size = 1000
+            for start in tqdm(range(0, len(rows), batch_size)):
+                batch = rows[start: start + batch_size]
+                texts = read_items(self.store_path, [adrs for _, adrs in batch])
+                for i, adrs in batch:
+                    if adrs not in texts:
+                        continue
+                    count_result = russia_counter.count_by_dict(text=texts[adrs])
                     for count_i, count_num in enumerate(count_result):
                         self.panel_df.loc[i, item_name + "_" + self.indicators[count_i]] = count_num
         return self.panel_df
     
     def save(self, new_summary_save_path: str, if_idx = False):
-        self.panel_df.to_excel(new_summary_save_path, index = if_idx)
\ No newline at end of file
+        write_summary(self.panel_df, new_summary_save_path, index = if_idx)
\ No newline at end of file
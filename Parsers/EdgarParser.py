@@ -1,73 +1,139 @@
-# -*- coding: utf-8 -*-
-'''
-DESCRIPTION
------------
- Parse designated type of forms with the help of 3 parsers 
-
-CONTENTS
---------
-- <CLASS> edgar_parser
-
-OTHER INFO.
------------
-- Last upate: R4/9/5(Getsu)
-
-'''
-import pandas as pd
-from parsing8K import Parsing8K
-from parsing10K import Parsing10K
-from parsing10Q import Parsing10Q
-
-class edgar_parser:
-    def __init__(self, 
-                form_type: str, 
-                store_path: str,
-                panel_df_path: str):
-        
-        self.form_type = form_type
-        
-        # initialise the parser
-        if form_type == '8-K':
-            self.parser = Parsing8K(store_path = store_path, panel_df_path = panel_df_path)
-        elif form_type == '10-K':
-            self.parser = Parsing10K(store_path = store_path, panel_df_path = panel_df_path)
-        elif form_type == '10-Q':
-            self.parser = Parsing10Q(store_path = store_path, panel_df_path = panel_df_path)  
-
-
-    def run(self, summary_df_path: str, jobs: int, file_name = None):
-        ''' 
-        summary_df_path gives the directory where the summary table will be saved,
-        and you can customise the file name by inputing a file_name to replace the default one.
-
-        Note that we separate summary_10K into 2 individual tables, one saving the results for Item 1A
-        and the other for Item7. This procedure is specific to my taks and you do not have to follow
-
-        '''
-        if isinstance(file_name, str):
-            new_name = summary_df_path + '/' + file_name
-        else:
-            new_name = summary_df_path + f'/summary_{self.form_type}'
-        
-        if self.form_type == '10-K':
-            summary_df_I1A, summary_df_I7 = self.parser.threading(jobs = jobs)
-            summary_df_I1A.to_excel(new_name + '.xlsx', index = False)
-            summary_df_I7.to_excel(new_name + '_Item7.xlsx', index = False)
-        else:
-            summary_df = self.parser.threading(jobs = jobs)
-            summary_df.to_excel(new_name + '.xlsx', index = False)
-            
-if __name__ == '__main__':
-    store_path = 'F:/EDGAR/test'
-    panel_df_path = 'F:/EDGAR/2022Q2_10-K_sup2.xlsx'
-    summary_df_path = 'F:/EDGAR'
-
-    parser = edgar_parser(form_type = '10-K', 
-                          store_path = store_path,
-                          panel_df_path = panel_df_path)
-
-    parser.run(summary_df_path = summary_df_path,
-                jobs = 2,
-                file_name = 'test_10-K')
-
+# -*- coding: utf-8 -*-
+'''
+DESCRIPTION
+-----------
+ Parse designated type of forms with the help of 3 parsers 
+
+CONTENTS
+--------
+- <CLASS> edgar_parser
+
+OTHER INFO.
+-----------
+- Last upate: R8/10/18(Nichi)
+
+'''
+import os
+from matching_strategies import item_prefix
+from panel_io import panel_formats, write_panel
+from filing_discovery import discover_filings
+from profiling import run_stage
+from parsing8K import Parsing8K
+from parsing10K import Parsing10K
+from parsing10Q import Parsing10Q
+
+class edgar_parser:
+    def __init__(self, 
+                form_type: str, 
+                store_path: str,
+                panel_df_path: str,
+                items: list = None,
+                store_backend: str = 'dir',
+                header_filter: bool = True,
+                exhibits: list = None,
+                cache_boundaries: bool = True,
+                regex_backend: str = 're',
+                learn_order: bool = True,
+                write_threads: int = 0,
+                fsync: bool = False):
+        '''
+        The keyword args are those of Parsing8K, Parsing10K and Parsing10Q; see there. panel_df_path
+        may also be a folder of filings, from which the panel is built when run; see discover.
+
+        '''
+        self.form_type = form_type
+        self.store_path = store_path
+        
+        # initialise the parser
+        if form_type == '8-K':
+            self.parser = Parsing8K(store_path = store_path, panel_df_path = panel_df_path, items = items, store_backend = store_backend,
+                                    header_filter = header_filter, exhibits = exhibits, cache_boundaries = cache_boundaries,
+                                    regex_backend = regex_backend, learn_order = learn_order,
+                                    write_threads = write_threads, fsync = fsync)
+        elif form_type == '10-K':
+            self.parser = Parsing10K(store_path = store_path, panel_df_path = panel_df_path, items = items, store_backend = store_backend,
+                                     cache_boundaries = cache_boundaries, regex_backend = regex_backend, learn_order = learn_order,
+                                     write_threads = write_threads, fsync = fsync)
+        elif form_type == '10-Q':
+            self.parser = Parsing10Q(store_path = store_path, panel_df_path = panel_df_path, items = items, store_backend = store_backend,
+                                     cache_boundaries = cache_boundaries, regex_backend = regex_backend, learn_order = learn_order,
+                                     write_threads = write_threads, fsync = fsync)
+
+
+    def discover(self, filings_path: str, jobs: int):
+        '''
+        Build the panel of the form from the SGML headers of the filings under filings_path,
+        and save it as store_path/panel_<form_type>.csv. The headers read are cached in
+        store_path/discovery_cache.jsonl, so that only the new filings are read next time;
+        see filing_discovery.
+
+        Returns
+        -------
+        panel_path : str
+            The path of the panel saved.
+
+        '''
+        panel_df = discover_filings(filings_path, [self.form_type], jobs = jobs,
+                                    cache_path = self.store_path + '/discovery_cache.jsonl')
+        panel_path = self.store_path + f'/panel_{self.form_type}.csv'
+        write_panel(panel_df, panel_path)
+        return panel_path
+
+    def run(self, summary_df_path: str, jobs: int, file_name = None, resume: bool = True, force = None,
+            file_format: str = 'xlsx', time_budget: float = None, profile: bool = False, verify: bool = False):
+        ''' 
+        summary_df_path gives the directory where the summary table will be saved,
+        and you can customise the file name by inputing a file_name to replace the default one.
+        The table is saved in file_format unless file_name ends with an extension, e.g. '.parquet'.
+        resume, force, time_budget, profile and verify are those of the threading of the parser;
+        see manifest, scheduling and profiling. With profile, the report is saved next to the table.
+
+        Note that we separate summary_10K into individual tables, one for each item, the others
+        suffixed with the item, e.g. _Item7. This procedure is specific to my taks and you do not have to follow
+
+        '''
+        if os.path.isdir(self.parser.panel_df_path):
+            self.parser.panel_df_path = self.discover(self.parser.panel_df_path, jobs)
+        
+        extension = '.' + file_format
+        if isinstance(file_name, str):
+            for each in panel_formats:
+                if file_name.lower().endswith(each):
+                    file_name, extension = file_name[:-len(each)], file_name[-len(each):]
+                    break
+            new_name = summary_df_path + '/' + file_name
+        else:
+            new_name = summary_df_path + f'/summary_{self.form_type}'
+        
+        if self.form_type == '10-K':
+            summary_dfs = self.parser.threading(jobs = jobs, resume = resume, force = force, time_budget = time_budget,
+                                                profile = profile, verify = verify)
+            with run_stage(self.parser.profiler, 'write_summary'):
+                for i, (item_name, summary_df) in enumerate(zip(self.parser.items, summary_dfs)):
+                    if i == 0:
+                        write_panel(summary_df, new_name + extension)
+                    else:
+                        write_panel(summary_df, new_name + '_Item' + item_prefix(item_name)[1:] + extension)
+        else:
+            summary_df = self.parser.threading(jobs = jobs, resume = resume, force = force, time_budget = time_budget,
+                                               profile = profile, verify = verify)
+            with run_stage(self.parser.profiler, 'write_summary'):
+                write_panel(summary_df, new_name + extension)
+        
+        if profile:
+            self.parser.profiler.save(new_name + '_profile.json')
+            
+if __name__ == '__main__':
+    store_path = 'F:/EDGAR/test'
+    panel_df_path = 'F:/EDGAR/2022Q2_10-K_sup2.xlsx'
+    summary_df_path = 'F:/EDGAR'
+
+    parser = edgar_parser(form_type = '10-K', 
+                          store_path = store_path,
+                          panel_df_path = panel_df_path)
+
+    parser.run(summary_df_path = summary_df_path,
+                jobs = 2,
+                file_name = 'test_10-K')
+
         
\ No newline at end of file
@@ -0,0 +1,717 @@
+# -*- coding: utf-8 -*-
+'''
+DESCRIPTION
+-----------
+Benchmarks for the hot spots of the parsers. All of them run on synthetic
+texts, so no EDGAR archive is needed to compare two versions of the code.
+
+The end-to-end suite writes an archive of synthetic full submissions, with
+SGML headers, several DOCUMENTs, tables, the table of contents before the
+items, &#160; in the titles and uuencoded binary DOCUMENTs, and runs a
+parser over it with the stages profiled; see profiling.
+
+CONTENTS
+--------
+- <FUNC> synthetic_text
+- <FUNC> second_strategy_reference
+- <FUNC> bench_second_strategy
+- <FUNC> synthetic_html
+- <FUNC> check_text_backends
+- <FUNC> bench_text_backends
+- <FUNC> synthetic_ixbrl
+- <FUNC> bench_strip_hidden
+- <FUNC> synthetic_mdna
+- <FUNC> cut_unreadable_reference
+- <FUNC> bench_cut_unreadable
+- <FUNC> write_oversized_submission
+- <FUNC> bench_streaming_reader
+- <FUNC> adversarial_html
+- <FUNC> check_regex_backends
+- <FUNC> bench_adversarial
+- <FUNC> synthetic_submission
+- <FUNC> write_synthetic_archive
+- <FUNC> bench_end_to_end
+- <CLASS> slow_store
+- <FUNC> bench_item_writer
+
+OTHER INFO.
+-----------
+- Last upate: R8/10/18(Nichi)
+
+'''
+import binascii
+import heapq
+import os
+import random
+import re
+import tempfile
+import time
+import timeit
+import tracemalloc
+import pandas as pd
+from matching_strategies import cut_unreadable, item_detector
+from item_table import item_table
+from document_index import document_index
+from html_text import html_to_text, strip_hidden, text_backends
+from regex_backend import compile_pattern, re2
+from panel_io import write_panel
+from item_store import open_item_store
+from item_writer import async_writer
+from parsing8K import Parsing8K
+from parsing10K import Parsing10K
+from parsing10Q import Parsing10Q
+
+# the titles of the items in each form, in the order they appear
+form_titles = {'10-K': ['PART I', 'Item 1. Business', 'Item 1A. Risk Factors', 'Item 1B. Unresolved Staff Comments',
+                        'Item 2. Properties', 'Item 3. Legal Proceedings', 'Item 4. Mine Safety Disclosures',
+                        'PART II', "Item 7. Management's Discussion and Analysis",
+                        'Item 7A. Quantitative and Qualitative Disclosures About Market Risk',
+                        'Item 8. Financial Statements and Supplementary Data', 'Item 9A. Controls and Procedures'],
+               '10-Q': ['Item 1. Financial Statements', "Item 2. Management's Discussion and Analysis",
+                        'Item 3. Quantitative and Qualitative Disclosures About Market Risk',
+                        'Item 4. Controls and Procedures', 'Item 1. Legal Proceedings', 'Item 1A. Risk Factors',
+                        'Item 2. Unregistered Sales of Equity Securities', 'Item 6. Exhibits'],
+               '8-K': ['Item 2.02 Results of Operations and Financial Condition',
+                       'Item 5.02 Departure of Directors or Certain Officers',
+                       'Item 7.01 Regulation FD Disclosure', 'Item 8.01 Other Events',
+                       'Item 9.01 Financial Statements and Exhibits']}
+
+vocabulary = ['the', 'company', 'revenue', 'risk', 'market', 'item', 'results', 'operations', 'financial',
+              'condition', 'liquidity', 'capital', 'we', 'may', 'our', 'business', 'could', 'management',
+              'part', 'of', 'in', 'and', 'to', 'legal', 'control', 'see', 'Note', '2021', '12']
+
+def synthetic_text(form_type: str, n_words: int, seed: int = 0):
+    '''
+    A func to create a text that looks like the content cleaned by BS4 in
+    item_detector.second_method: a table of contents, followed by the items of
+    the form with about n_words words of filler in total.
+
+    '''
+    rng = random.Random(seed)
+    titles = form_titles[form_type]
+    words_per_item = max(n_words // len(titles), 1)
+
+    pieces = ['Table of Contents\n'] + [title + '\n' for title in titles]
+    for title in titles:
+        pieces.append('\n' + title + '\n')
+        pieces.append(' '.join(rng.choice(vocabulary) for _ in range(words_per_item)))
+    return '\n'.join(pieces)
+
+def second_strategy_reference(detector: item_detector, content: str):
+    '''
+    Steps iv and v of item_detector.second_method as they were before the
+    patterns were fused: run every pattern over the text one by one, and
+    derive the names of the items from the matched titles with pandas.
+
+    '''
+    item_name = []
+    item_start = []
+    item_end = []
+    for _, rex in detector.reg_st2:
+        for x in re.finditer(rex, content):
+            item_name.append(x.group())
+            item_start.append(x.start())
+            item_end.append(x.end())
+
+    out_tb = pd.DataFrame([item_name, item_start, item_end]).transpose()
+    out_tb.columns = ['item', 'start', 'end']
+
+    for symbol in [r'\.', '"', '-', '\n', '\bb']:
+        out_tb.replace(symbol, ' ', regex = True, inplace = True)
+
+    if detector.form_type == '8-K':
+        out_tb['item'] = [item[:10] for item in out_tb['item'].values]
+    else:
+        out_tb['item'] = [''.join(item.split(' ')[:2]) for item in out_tb['item'].values]
+
+    out_tb.replace(' ', '', regex = True, inplace = True)
+    out_tb = out_tb.sort_values('start', ascending = True)
+    out_tb['item'] = out_tb.item.str.lower()
+    return out_tb
+
+def bench_second_strategy(form_type: str = '10-K', n_words: int = 200000, repeat: int = 5):
+    '''
+    Compare steps iv and v of second_method before(second_strategy_reference)
+    and after the patterns were fused into alternations, on a long text.
+
+    Returns
+    -------
+    timing : dict
+        The best time in seconds of each way and the speedup of the fused one.
+
+    '''
+    detector = item_detector(form_type)
+    text = synthetic_text(form_type, n_words)
+
+    def run_fused():
+        out_tb = item_table()
+        matches = [rex.finditer(text) for rex in detector.fused_st2]
+        for x in heapq.merge(*matches, key = lambda x: x.start()):
+            out_tb.append(detector.labels_st2[x.lastgroup], x.start(), x.end())
+        return out_tb
+
+    assert run_fused().start == list(second_strategy_reference(detector, text)['start'])
+
+    t_reference = min(timeit.repeat(lambda: second_strategy_reference(detector, text), number = 1, repeat = repeat))
+    t_fused = min(timeit.repeat(run_fused, number = 1, repeat = repeat))
+
+    timing = {'form_type': form_type,
+              'text_mb': round(len(text) / 1e6, 2),
+              'reference_s': t_reference,
+              'fused_s': t_fused,
+              'speedup': t_reference / t_fused}
+    return timing
+
+def synthetic_html(form_type: str, n_words: int, seed: int = 0):
+    '''
+    A func to create the XML codes of a DOCUMENT from synthetic_text: every
+    40 words become a styled <div>, with data tables, lists in tables(with
+    bullets), and scripts and comments in between.
+
+    '''
+    rng = random.Random(seed)
+    lines = []
+    for line in synthetic_text(form_type, n_words, seed).split('\n'):
+        words = line.split(' ')
+        lines += [' '.join(words[i:i + 40]) for i in range(0, len(words), 40)]
+    
+    pieces = ['<html><head><style>div {font-family: Times}</style></head><body>\n']
+    for k, line in enumerate(lines):
+        pieces.append(f'<div style="margin-top:6pt"><span style="color:#000000">{line}</span></div>\n')
+        if k % 40 == 39:
+            cells = ''.join(f'<td style="padding:0">&#160;{rng.randint(0, 9999):,}</td>' for _ in range(6))
+            pieces.append('<table>' + f'<tr>{cells}</tr>' * 8 + '</table>\n')
+        if k % 100 == 99:
+            pieces.append('<table><tr><td>&#8226;</td><td>a risk in a list</td></tr></table>\n<!-- page -->\n')
+    pieces.append('</body></html>\n')
+    return ''.join(pieces)
+
+def check_text_backends(paths: list = None, n_slices: int = 50, seed: int = 0):
+    '''
+    Check that every backend in html_text gives the same text as the bs4
+    backend. The codes checked are every DOCUMENT in the filings in paths(or
+    in synthetic_html if no path is given), and n_slices random slices of
+    each, which are broken codes like those of the items.
+
+    Returns
+    -------
+    mismatches : list
+        (the source, backend, start, end) of the codes on which a backend differs
+        from the bs4 backend.
+
+    '''
+    rng = random.Random(seed)
+    if paths is None:
+        sources = [(form_type, synthetic_html(form_type, 20000)) for form_type in form_titles]
+    else:
+        sources = []
+        for path in paths:
+            with open(path, 'r') as f:
+                docs_index = document_index(f.read())
+            sources += [(f'{path}:{doc_type}', docs_index[doc_type]) for doc_type in docs_index.types]
+
+    mismatches = []
+    for source, codes in sources:
+        spans = [(0, len(codes))]
+        for _ in range(n_slices):
+            start = rng.randrange(len(codes) + 1)
+            spans.append((start, rng.randint(start, len(codes))))
+
+        for start, end in spans:
+            reference = text_backends['bs4'](codes[start:end])
+            for backend, to_text in text_backends.items():
+                if to_text(codes[start:end]) != reference:
+                    mismatches.append((source, backend, start, end))
+    return mismatches
+
+def bench_text_backends(form_type: str = '10-K', n_words: int = 200000, repeat: int = 3):
+    '''
+    Compare the time of each backend in html_text to convert the codes of a
+    long DOCUMENT into text.
+
+    Returns
+    -------
+    timing : dict
+        The best time in seconds of each backend.
+
+    '''
+    codes = synthetic_html(form_type, n_words)
+    timing = {'form_type': form_type, 'codes_mb': round(len(codes) / 1e6, 2)}
+    for backend, to_text in text_backends.items():
+        timing[backend + '_s'] = min(timeit.repeat(lambda: to_text(codes), number = 1, repeat = repeat))
+    return timing
+
+def synthetic_mdna(n_words: int, seed: int = 0):
+    '''
+    A func to create a text that looks like a long MD&A section converted from
+    the XML codes: paragraphs split by blank lines, with page numbers, tables
+    of contents, curly quotes and '>' between them.
+
+    '''
+    rng = random.Random(seed)
+    pieces = []
+    for k in range(max(n_words // 60, 1)):
+        pieces.append(' '.join(rng.choice(vocabulary + ['company’s', '>']) for _ in range(60)))
+        if k % 20 == 19:
+            pieces.append(f'\n {k // 20 + 1} \n\nTable of Contents\n')
+    return '\n\n'.join(pieces)
+
+def cut_unreadable_reference(content: str):
+    '''
+    cut_unreadable as it was before it was fused, as the reference for
+    bench_cut_unreadable.
+
+    '''
+    content = content.encode('ascii', 'ignore')
+    content = content.decode()
+    content = content.replace('>', '')
+    
+    tc = re.compile(r'(\n){0,}Table(\n|\s){0,}of(\n|\s){0,}Contents\n{0,}')
+    out_str = re.sub(tc, '', content)
+    
+    pagenum = re.compile(r'(\n{2,}|\s+|\n\s+)([0-9]{1,2})(\n{2,}|\s+|\n\s+)')
+    out_str = re.sub(pagenum, ' ', out_str)
+    
+    enters = re.compile(r'\n{2,}')
+    out_str = re.sub(enters, ' ', out_str)
+    return out_str
+
+def bench_cut_unreadable(n_words: int = 200000, repeat: int = 5):
+    '''
+    Compare cut_unreadable before(cut_unreadable_reference) and after it was
+    fused, on a long MD&A section.
+
+    Returns
+    -------
+    timing : dict
+        The best time in seconds of each way and the speedup of the fused one.
+
+    '''
+    text = synthetic_mdna(n_words)
+    assert cut_unreadable(text) == cut_unreadable_reference(text)
+    
+    t_reference = min(timeit.repeat(lambda: cut_unreadable_reference(text), number = 1, repeat = repeat))
+    t_fused = min(timeit.repeat(lambda: cut_unreadable(text), number = 1, repeat = repeat))
+    
+    timing = {'text_mb': round(len(text) / 1e6, 2),
+              'reference_s': t_reference,
+              'fused_s': t_fused,
+              'speedup': t_reference / t_fused}
+    return timing
+
+def write_oversized_submission(path: str, n_words: int = 200000, payload_mb: int = 200, seed: int = 0):
+    '''
+    A func to write a 10-K full submission whose 10-K DOCUMENT is made by
+    synthetic_html, followed by GRAPHIC and ZIP DOCUMENTs of payload_mb MB of
+    uuencoded lines in total.
+
+    '''
+    rng = random.Random(seed)
+    line = 'M' + ''.join(chr(rng.randint(33, 96)) for _ in range(60)) + '\n'
+    block = line * 16384
+    n_blocks = max(int(payload_mb * 1e6 / len(block) / 2), 1)
+    with open(path, 'w') as f:
+        f.write('<SEC-HEADER>\nCONFORMED SUBMISSION TYPE:\t10-K\n</SEC-HEADER>\n')
+        f.write('<DOCUMENT>\n<TYPE>10-K\n<SEQUENCE>1\n<TEXT>\n' + synthetic_html('10-K', n_words, seed) + '</TEXT>\n</DOCUMENT>\n')
+        for seq, doc_type in enumerate(['GRAPHIC', 'ZIP'], 2):
+            f.write(f'<DOCUMENT>\n<TYPE>{doc_type}\n<SEQUENCE>{seq}\n<TEXT>\nbegin 644 x{seq}\n')
+            for _ in range(n_blocks):
+                f.write(block)
+            f.write('end\n</TEXT>\n</DOCUMENT>\n')
+
+def bench_streaming_reader(n_words: int = 200000, payload_mb: int = 200):
+    '''
+    Compare reading a whole oversized submission and indexing it with
+    document_index.from_file, which keeps the 10-K DOCUMENT only.
+
+    Returns
+    -------
+    timing : dict
+        The time in seconds and the peak memory in MB traced by tracemalloc
+        of each way.
+
+    '''
+    def whole(path):
+        with open(path, 'r') as f:
+            return document_index(f.read())
+
+    def streamed(path):
+        return document_index.from_file(path, ['10-K'])
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = folder + '/submission.txt'
+        write_oversized_submission(path, n_words, payload_mb)
+        assert whole(path)['10-K'] == streamed(path)['10-K']
+
+        timing = {'file_mb': round(os.path.getsize(path) / 1e6, 1)}
+        for name, read in [('whole', whole), ('streamed', streamed)]:
+            tracemalloc.start()
+            start = timeit.default_timer()
+            read(path)
+            timing[name + '_s'] = timeit.default_timer() - start
+            timing[name + '_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1e6, 1)
+            tracemalloc.stop()
+    return timing
+
+def adversarial_html(form_type: str, n_items: int):
+    '''
+    The codes of a form on a single line, as in some filings made by
+    software, with n_items titles that almost match the first strategy:
+        - 10-Q: '>Item <b>x</b>', on which the <.*> of the pattern runs to
+          the end of the line and backtracks, for time quadratic in n_items;
+        - 10-K and 8-K: '>Item' and runs of spaces not followed by a number.
+
+    '''
+    if form_type == '10-Q':
+        title = '<p>Item <b>note %d</b></p>'
+    else:
+        title = '<p>Item &#160; &nbsp;   <b>note %d</b></p>'
+    body = ''.join(title % i for i in range(n_items))
+    return '<DOCUMENT>\n<TYPE>' + form_type + '\n<TEXT>\n<html><body>' + body + '</body></html>\n</TEXT>\n</DOCUMENT>\n'
+
+def check_regex_backends(n_items: int = 200):
+    '''
+    Check that the patterns of the first strategy give the same matches with
+    re and RE2 on the adversarial codes and on synthetic_html.
+
+    Returns
+    -------
+    mismatches : list
+        (form_type, fixture) for which the matches differ; None if RE2 is not
+        installed.
+
+    '''
+    if re2 is None:
+        return None
+
+    mismatches = []
+    for form_type in ['10-K', '10-Q', '8-K']:
+        pattern = item_detector(form_type).reg_st1.pattern
+        by_re = compile_pattern(pattern, 're')
+        by_re2 = compile_pattern(pattern, 're2')
+        for fixture, codes in [('adversarial', adversarial_html(form_type, n_items)),
+                               ('synthetic', synthetic_html(form_type, 20000))]:
+            spans = [[(m.start(), m.end()) for m in rex.finditer(codes)] for rex in (by_re, by_re2)]
+            if spans[0] != spans[1]:
+                mismatches.append((form_type, fixture))
+    return mismatches
+
+def bench_adversarial(form_type: str = '10-Q', n_items_list: list = [500, 1000, 2000, 4000], repeat: int = 3):
+    '''
+    Time the pattern of the first strategy on adversarial_html of growing
+    sizes, with re and with RE2 if it is installed. The time of a backend
+    in linear time grows as n_items does; that of a backtracking one by the
+    square of it.
+
+    Returns
+    -------
+    timings : list
+        {'n_items': ..., 'codes_kb': ..., 're_s': ..., 're2_s': ...} for each
+        size; re2_s is None if RE2 is not installed.
+
+    '''
+    pattern = item_detector(form_type).reg_st1.pattern
+    backends = {'re': compile_pattern(pattern, 're'),
+                're2': compile_pattern(pattern, 're2') if re2 is not None else None}
+
+    timings = []
+    for n_items in n_items_list:
+        codes = adversarial_html(form_type, n_items)
+        timing = {'form_type': form_type, 'n_items': n_items, 'codes_kb': round(len(codes) / 1e3, 1)}
+        for name, rex in backends.items():
+            if rex is None:
+                timing[name + '_s'] = None
+                continue
+            timing[name + '_s'] = min(timeit.repeat(lambda: sum(1 for _ in rex.finditer(codes)),
+                                                    number = 1, repeat = repeat))
+        timings.append(timing)
+    return timings
+
+def synthetic_ixbrl(form_type: str, n_words: int, n_facts: int = 20000, seed: int = 0):
+    '''
+    A func to make synthetic_html an inline XBRL DOCUMENT: a <div> hidden by
+    display:none with an <ix:header> of n_facts hidden facts and their
+    contexts before the text, and the long style attributes of the tags of
+    an iXBRL form. The visible text is that of synthetic_html.
+
+    Returns
+    -------
+    ixbrl : str
+        The codes of the iXBRL DOCUMENT.
+    plain : str
+        Those of synthetic_html.
+
+    '''
+    rng = random.Random(seed)
+    plain = synthetic_html(form_type, n_words, seed)
+    facts = ''.join(f'<ix:nonNumeric name="dei:Fact{k}" contextRef="c-{k % 50}" id="f-{k}">'
+                    f'{rng.randint(0, 10 ** 9)}</ix:nonNumeric>' for k in range(n_facts))
+    contexts = ''.join(f'<xbrli:context id="c-{k}"><xbrli:entity><xbrli:identifier scheme="http://www.sec.gov/CIK">'
+                       f'0000000001</xbrli:identifier></xbrli:entity><xbrli:period><xbrli:startDate>2022-01-01'
+                       f'</xbrli:startDate><xbrli:endDate>2022-12-31</xbrli:endDate></xbrli:period></xbrli:context>'
+                       for k in range(50))
+    header = (f'<div style="display:none"><ix:header><ix:hidden>{facts}</ix:hidden>'
+              f'<ix:resources>{contexts}</ix:resources></ix:header></div>')
+    long_style = ('margin-top:6pt;margin-bottom:0pt;text-align:justify;text-indent:24.5pt;'
+                  'font-family:Times New Roman,serif;font-size:10pt;font-weight:400;line-height:120%')
+    ixbrl = plain.replace('<body>\n', '<body>\n' + header, 1)
+    ixbrl = ixbrl.replace('style="margin-top:6pt"', f'style="{long_style}"')
+    ixbrl = ixbrl.replace('style="color:#000000"', f'style="color:#000000;{long_style}"')
+    return ixbrl, plain
+
+def bench_strip_hidden(form_type: str = '10-K', n_words: int = 200000, n_facts: int = 20000, repeat: int = 3):
+    '''
+    Compare the time and the peak memory of html_to_text on synthetic_ixbrl
+    with and without strip_hidden, for each backend. The memory is that
+    traced by tracemalloc, i.e. the Python objects; the tree of lxml is
+    allocated by libxml2 and not traced.
+
+    Returns
+    -------
+    timing : dict
+        The size of the codes before and after strip_hidden, its time, the
+        best time and the peak memory in MB of each backend with and without
+        it, and whether the text with it is that of the plain codes.
+
+    '''
+    ixbrl, plain = synthetic_ixbrl(form_type, n_words, n_facts)
+    timing = {'form_type': form_type, 'codes_mb': round(len(ixbrl) / 1e6, 2),
+              'stripped_mb': round(len(strip_hidden(ixbrl)) / 1e6, 2),
+              'strip_hidden_s': min(timeit.repeat(lambda: strip_hidden(ixbrl), number = 1, repeat = repeat))}
+    for backend in text_backends:
+        for strip in [False, True]:
+            name = backend + ('_strip' if strip else '')
+            timing[name + '_s'] = min(timeit.repeat(lambda: html_to_text(ixbrl, backend = backend, strip = strip),
+                                                    number = 1, repeat = repeat))
+            tracemalloc.start()
+            html_to_text(ixbrl, backend = backend, strip = strip)
+            timing[name + '_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1e6, 1)
+            tracemalloc.stop()
+        timing[backend + '_same_text'] = (html_to_text(ixbrl, backend = backend) ==
+                                          html_to_text(plain, backend = backend, strip = False))
+    return timing
+
+# the ITEM INFORMATION of the 8-K items in form_titles, and the exhibits of each form
+item_information = ['Results of Operations and Financial Condition',
+                    'Departure of Directors or Certain Officers; Election of Directors; Appointment of Certain Officers; '
+                    'Compensatory Arrangements of Certain Officers',
+                    'Regulation FD Disclosure', 'Other Events', 'Financial Statements and Exhibits']
+form_exhibits = {'8-K': ['EX-99.1', 'EX-99.2', 'EX-99.3', 'EX-10.1'],
+                 '10-K': ['EX-21.1', 'EX-23.1', 'EX-31.1', 'EX-32.1'],
+                 '10-Q': ['EX-31.1', 'EX-31.2', 'EX-32.1', 'EX-10.1']}
+
+def synthetic_submission(form_type: str, n_words: int, n_exhibits: int = 2, binary_kb: int = 256, seed: int = 0,
+                         cik: int = 1000000, f_date: str = '2022-05-10', accession: str = '0000950170-22-000001'):
+    '''
+    A func to create a full submission of a form: the SGML header, the
+    DOCUMENT of the form by synthetic_html, with its table of contents as a
+    table and &#160; after Item in half of the titles, n_exhibits
+    exhibits in HTML, and a GRAPHIC and a ZIP of binary_kb KB of uuencoded
+    random bytes each.
+
+    '''
+    rng = random.Random(seed)
+    titles = form_titles[form_type]
+    
+    # the table of contents of synthetic_html is the lines before the second of the first title
+    body = synthetic_html(form_type, n_words, seed)
+    toc_start = body.index('<div')
+    toc_end = body.rindex('<div', 0, body.index(f'>{titles[0]}<', body.index(f'>{titles[0]}<') + 1))
+    toc = ''.join(f'<tr><td>{title}</td><td>{k + 3}</td></tr>' for k, title in enumerate(titles))
+    body = body[:toc_start] + '<p>Table of Contents</p><table>' + toc + '</table>\n' + body[toc_end:]
+    body = re.sub(r'>Item (?=[0-9])', lambda m: '>Item&#160;' if rng.random() < 0.5 else m.group(), body)
+    
+    docs = [(form_type, body)]
+    for exhibit in form_exhibits[form_type][:n_exhibits]:
+        words = synthetic_mdna(max(n_words // 10, 100), seed + len(docs)).split('\n')
+        paragraphs = ''.join(f'<p>{line}</p>\n' for line in words if line)
+        docs.append((exhibit, f'<html><body><p>Exhibit {exhibit[3:]}</p>\n{paragraphs}</body></html>\n'))
+    for doc_type in ['GRAPHIC', 'ZIP']:
+        payload = rng.randbytes(binary_kb * 1024)
+        lines = ''.join(binascii.b2a_uu(payload[i:i + 45]).decode('ascii') for i in range(0, len(payload), 45))
+        docs.append((doc_type, f'begin 644 {doc_type.lower()}.bin\n{lines}end\n'))
+    
+    date = f_date.replace('-', '')
+    header = [f'<SEC-HEADER>{accession}.hdr.sgml : {date}',
+              f'ACCESSION NUMBER:\t\t{accession}',
+              f'CONFORMED SUBMISSION TYPE:\t{form_type}',
+              f'PUBLIC DOCUMENT COUNT:\t\t{len(docs)}',
+              f'CONFORMED PERIOD OF REPORT:\t{date}']
+    if form_type == '8-K':
+        header += [f'ITEM INFORMATION:\t\t{description}' for description in item_information]
+    header += [f'FILED AS OF DATE:\t\t{date}',
+               'FILER:',
+               '\tCOMPANY DATA:\t',
+               f'\t\tCOMPANY CONFORMED NAME:\t\t\tSYNTHETIC CORP {cik}',
+               f'\t\tCENTRAL INDEX KEY:\t\t\t{cik:010d}',
+               '\t\tSTANDARD INDUSTRIAL CLASSIFICATION:\tSERVICES-PREPACKAGED SOFTWARE [7372]',
+               '</SEC-HEADER>']
+    
+    pieces = ['\n'.join(header) + '\n']
+    for seq, (doc_type, text) in enumerate(docs, 1):
+        extension = 'htm' if doc_type not in ('GRAPHIC', 'ZIP') else doc_type.lower()
+        pieces.append(f'<DOCUMENT>\n<TYPE>{doc_type}\n<SEQUENCE>{seq}\n<FILENAME>d{seq}.{extension}\n'
+                      f'<TEXT>\n{text}</TEXT>\n</DOCUMENT>\n')
+    return ''.join(pieces)
+
+def write_synthetic_archive(folder: str, form_type: str, n_files: int, n_words: int = 50000, n_exhibits: int = 2,
+                            binary_kb: int = 256, seed: int = 0):
+    '''
+    A func to write n_files synthetic_submission of a form under folder, as
+    <folder>/<form_type>/<CIK>/<CIK>_<form_type>_<date>_<accession>.txt, their
+    sizes spread between half and twice n_words, and their panel.
+
+    Returns
+    -------
+    panel_path : str
+        The panel of the files, <folder>/panel_<form_type>.csv.
+
+    '''
+    rng = random.Random(seed)
+    rows = []
+    for k in range(n_files):
+        cik = 1000000 + k
+        accession = f'0000950170-22-{k:06d}'
+        f_date = f'2022-05-{k % 28 + 1:02d}'
+        path = f'{folder}/{form_type}/{cik}/{cik}_{form_type}_{f_date}_{accession}.txt'
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        with open(path, 'w') as f:
+            f.write(synthetic_submission(form_type, int(n_words * 2 ** rng.uniform(-1, 1)), n_exhibits, binary_kb,
+                                         seed + k, cik, f_date, accession))
+        rows.append({'CIK': cik, 'co_name': f'SYNTHETIC CORP {cik}', 'f_type': form_type, 'f_date': f_date,
+                     'f_name': path})
+    
+    panel_path = f'{folder}/panel_{form_type}.csv'
+    write_panel(pd.DataFrame(rows), panel_path)
+    return panel_path
+
+def bench_end_to_end(form_type: str = '10-K', n_files: int = 20, n_words: int = 50000, jobs: int = 1,
+                     trace_memory: bool = True, seed: int = 0):
+    '''
+    A func to run the parser of a form end to end on a synthetic archive,
+    with the stages profiled, and then once more in this process with
+    tracemalloc for the peak memory of each stage, which tracemalloc slows
+    down too much to be timed.
+
+    Returns
+    -------
+    timing : dict
+        The files and MB parsed, files/s and MB/s, the share of the files in
+        which each item is found, and for each stage its time, share, MB/s of
+        the bytes it processed, and peak memory in MB if trace_memory.
+
+    '''
+    parsers = {'8-K': Parsing8K, '10-K': Parsing10K, '10-Q': Parsing10Q}
+    with tempfile.TemporaryDirectory() as folder:
+        panel_path = write_synthetic_archive(folder + '/filings', form_type, n_files, n_words, seed = seed)
+        mb = sum(os.path.getsize(path) for path in pd.read_csv(panel_path)['f_name']) / 1e6
+        
+        parser = parsers[form_type](panel_path, folder + '/store', cache_boundaries = False)
+        start = timeit.default_timer()
+        output = parser.threading(jobs, resume = False, profile = True)
+        wall = timeit.default_timer() - start
+        report = parser.profiler.report()
+        
+        output = pd.concat(output, axis = 1) if isinstance(output, tuple) else output
+        timing = {'form_type': form_type, 'files': n_files, 'mb': round(mb, 1), 'wall_s': wall,
+                  'files_per_s': n_files / wall, 'mb_per_s': mb / wall,
+                  'found': {name: float(output[name].mean()) for name in output.columns if name.endswith('_y')}}
+        timing['stages'] = {name: {'wall_s': each['wall_s'], 'share': each['share'],
+                                   'mb_per_s': each['bytes'] / 1e6 / each['wall_s'] if each['bytes'] > 0 and each['wall_s'] > 0 else None}
+                            for name, each in report['stages'].items()}
+        
+        if trace_memory:
+            parser = parsers[form_type](panel_path, folder + '/store_traced', cache_boundaries = False)
+            tracemalloc.start()
+            parser.threading(1, resume = False, profile = True)
+            tracemalloc.stop()
+            for name, each in parser.profiler.report()['stages'].items():
+                timing['stages'].setdefault(name, {})['peak_mb'] = round(each['peak_mb'], 2)
+    return timing
+
+class slow_store:
+    '''
+    An item store that takes latency seconds more for each item, like a
+    network filesystem where every file opened is a round trip.
+
+    '''
+    def __init__(self, store, latency: float):
+        self.store = store
+        self.latency = latency
+
+    def write_many(self, items: dict):
+        time.sleep(self.latency * len(items))
+        self.store.write_many(items)
+
+    def exists(self, adrs: str):
+        return self.store.exists(adrs)
+
+    def get_offsets(self, key: str):
+        return self.store.get_offsets(key)
+
+    def put_offsets(self, key: str, sidecar: dict):
+        self.store.put_offsets(key, sidecar)
+
+    def flush(self):
+        return None
+
+def bench_item_writer(form_type: str = '8-K', n_files: int = 20, n_words: int = 20000, latency: float = 0.02,
+                      threads_list: list = [0, 1, 4], seed: int = 0):
+    '''
+    A func to run the parser of a form on a synthetic archive in one worker,
+    its items written to a slow_store synchronously(0 threads) or by an
+    async_writer with so many threads, to see how much of the writing the
+    parsing hides.
+
+    Returns
+    -------
+    timings : list
+        For each num. of threads, the wall time, the time of the write stage,
+        i.e. writing or queuing the items, and the writer_report.
+
+    '''
+    parsers = {'8-K': Parsing8K, '10-K': Parsing10K, '10-Q': Parsing10Q}
+    timings = []
+    with tempfile.TemporaryDirectory() as folder:
+        panel_path = write_synthetic_archive(folder + '/filings', form_type, n_files, n_words, seed = seed)
+        for threads in threads_list:
+            store_path = f'{folder}/store_{threads}'
+            parser = parsers[form_type](panel_path, store_path, cache_boundaries = False, learn_order = False)
+            store = slow_store(open_item_store(store_path), latency)
+            parser.item_store = async_writer(store, threads) if threads > 0 else store
+            start = timeit.default_timer()
+            parser.threading(1, resume = False, profile = True)
+            wall = timeit.default_timer() - start
+            report = parser.profiler.report()
+            timings.append({'form_type': form_type, 'threads': threads, 'wall_s': wall,
+                            'write_stage_s': report['stages']['write']['wall_s'], 'writer': report['writer']})
+    return timings
+
+
+if __name__ == '__main__':
+    for form_type in ['10-K', '10-Q', '8-K']:
+        for n_words in [20000, 200000, 1000000]:
+            print(bench_second_strategy(form_type, n_words))
+    
+    print('mismatches of the text backends:', check_text_backends())
+    for form_type in ['10-K', '10-Q', '8-K']:
+        print(bench_text_backends(form_type))
+        print(bench_strip_hidden(form_type))
+    
+    for n_words in [20000, 200000, 1000000]:
+        print(bench_cut_unreadable(n_words))
+    
+    for payload_mb in [50, 200]:
+        print(bench_streaming_reader(payload_mb = payload_mb))
+    
+    mismatches = check_regex_backends()
+    print('mismatches of the regex backends:', 'RE2 not installed' if mismatches is None else mismatches)
+    for form_type in ['10-K', '10-Q', '8-K']:
+        for timing in bench_adversarial(form_type):
+            print(timing)
+    
+    for form_type in ['10-K', '10-Q', '8-K']:
+        print(bench_end_to_end(form_type))
+    
+    for timing in bench_item_writer():
+        print(timing)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+'''
+DESCRIPTION
+-----------
+A cache of the item tables found by the strategies in matching_strategies,
+so that a rerun, e.g. for a new item or a new rule in item_rules, takes the
+boundaries of the items of a filing from the cache instead of matching the
+form again.
+
+The tables are kept in one SQLite database under the store_path,
+boundaries.sqlite, compressed by zlib:
+
+    boundaries(doc_sha1 TEXT, version TEXT, st INTEGER, tb BLOB)
+
+doc_sha1 is the SHA-1 of the codes under the DOCUMENT of the form, which are
+all a strategy looks at, and version is item_detector.version, which
+changes with the patterns of the strategies; a table of a changed filing or
+of an old detector is never used.
+
+CONTENTS
+--------
+- <FUNC> doc_sha1
+- <CLASS> boundary_cache
+
+OTHER INFO.
+-----------
+- Last upate: R8/10/18(Nichi)
+
+'''
+import hashlib
+import json
+import os
+import sqlite3
+import zlib
+from item_table import item_table
+
+def doc_sha1(codes: str):
+    return hashlib.sha1(codes.encode('utf-8', 'surrogatepass')).hexdigest()
+
+class boundary_cache:
+    file_name = 'boundaries.sqlite'
+
+    def __init__(self, store_path: str):
+        self.store_path = store_path
+        self.db_path = store_path + '/' + self.file_name
+        self.connection = None
+
+    def __getstate__(self):
+        # each process opens a connection of its own
+        state = self.__dict__.copy()
+        state['connection'] = None
+        return state
+
+    def connect(self):
+        if self.connection is None:
+            os.makedirs(self.store_path, exist_ok = True)
+            self.connection = sqlite3.connect(self.db_path, timeout = 600)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS boundaries '
+                                    '(doc_sha1 TEXT, version TEXT, st INTEGER, tb BLOB, PRIMARY KEY (doc_sha1, version, st))')
+            self.connection.commit()
+        return self.connection
+
+    def get(self, sha1: str, version: str, st: int):
+        '''
+        The item table found by strategy st in the DOCUMENT of sha1, or None
+        if it is not in the cache.
+
+        '''
+        row = self.connect().execute('SELECT tb FROM boundaries WHERE doc_sha1 = ? AND version = ? AND st = ?',
+                                     (sha1, version, st)).fetchone()
+        if row is None:
+            return None
+
+        tb = item_table()
+        tb.item, tb.start, tb.end = json.loads(zlib.decompress(row[0]))
+        return tb
+
+    def put(self, sha1: str, version: str, st: int, tb: item_table):
+        packed = zlib.compress(json.dumps([tb.item, tb.start, tb.end], separators = (',', ':')).encode('utf-8'))
+        connection = self.connect()
+        with connection:
+            connection.execute('INSERT OR REPLACE INTO boundaries VALUES (?, ?, ?, ?)', (sha1, version, st, packed))
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+'''
+DESCRIPTION
+-----------
+An index of the <DOCUMENT> sections in an EDGAR full-submission file. The
+layout of a filing is scanned only once and the index is then shared by the
+strategies in matching_strategies, instead of each strategy finding the
+<DOCUMENT> and <TYPE> tags again by itself.
+
+A full-submission file can be hundreds of MB because of the uuencoded
+GRAPHIC/ZIP/PDF/XBRL documents, none of which is ever parsed. The index can
+be built from the file directly(document_index.from_file) by reading it in
+binary chunks: the DOCUMENTs of the types wanted are kept and decoded, and
+the others, together with their 'begin 644' payloads, are skipped by
+searching for the next </DOCUMENT> tag without decoding them. The memory
+needed is then bounded by the size of the DOCUMENTs wanted, not the file.
+A compressed file(.gz, .bz2 or .zst) is decompressed as it is read.
+
+The byte offsets of the DOCUMENTs of a filing can be saved in a sidecar
+index, kept by the item store of the parser(a small JSON file under
+<store_path>/offsets, or a row of items.sqlite; see item_store), so that
+the DOCUMENTs of other types, e.g. other exhibits, are read later by seeking
+to them instead of reading the whole filing again(document_index.load).
+
+A type asked for may also be the prefix of a group of exhibits, e.g. 'EX-10'
+for EX-10.1, EX-10.2 and so on.
+
+CONTENTS
+--------
+- <FUNC> type_wanted
+- <CLASS> submission_reader
+- <CLASS> document_index
+
+OTHER INFO.
+-----------
+- Last upate: R8/10/18(Nichi)
+
+'''
+import locale
+import os
+import re
+from filing_io import open_filing
+from profiling import stage
+
+def type_wanted(doc_type: str, wanted):
+    '''
+    If a DOCUMENT of doc_type is asked for by wanted, a set of types: its type
+    is in wanted, or the part before the first dot is, e.g. 'EX-10' for
+    'EX-10.1'. None asks for every type.
+
+    '''
+    if wanted is None:
+        return True
+    return doc_type in wanted or doc_type.split('.')[0] in wanted
+
+class submission_reader:
+    def __init__(self, f, chunk_size: int = 1 << 20):
+        '''
+        A buffer over a full-submission file opened in binary, read chunk_size
+        bytes at a time as the tags are searched for.
+
+        '''
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = bytearray()
+        # the offset in the file of buffer[0]
+        self.offset = 0
+        self.eof = False
+
+    def read_more(self):
+        with stage('read') as timer:
+            data = self.f.read(self.chunk_size)
+            timer.add_bytes(len(data))
+        if not data:
+            self.eof = True
+        self.buffer += data
+
+    def find(self, tag: bytes, start: int = 0):
+        '''
+        The position of tag in the buffer from start, reading the file until it
+        is found. -1 if it is not in the rest of the file.
+
+        '''
+        while True:
+            i = self.buffer.find(tag, start)
+            if i >= 0 or self.eof:
+                return i
+            # a tag may be cut by the end of the buffer
+            start = max(start, len(self.buffer) - len(tag) + 1)
+            self.read_more()
+
+    def skip_to(self, tag: bytes):
+        '''
+        Like find, but drop the bytes before tag as the file is read, so that
+        only a chunk is in the memory however far the tag is.
+
+        '''
+        while True:
+            i = self.buffer.find(tag)
+            if i >= 0 or self.eof:
+                return i
+            self.discard(max(len(self.buffer) - len(tag) + 1, 0))
+            self.read_more()
+
+    def take(self, n: int):
+        data = bytes(self.buffer[:n])
+        self.discard(n)
+        return data
+
+    def discard(self, n: int):
+        del self.buffer[:n]
+        self.offset += n
+
+class document_index:
+    # a single alternation so that all three tags are found in one pass
+    tag_pattern = re.compile(r'<DOCUMENT>|</DOCUMENT>|<TYPE>[^\n]+')
+
+    def __init__(self, content: str):
+        '''
+        Scan a full-submission file once and record the type, start and end
+        of every code section included in a pair of <DOCUMENT> tags.
+
+        Parameters
+        ----------
+        content : str
+            The XML codes of the form.
+
+        '''
+        self.content = content
+
+        # (type, start, end) in bytes of every DOCUMENT in the file, if the
+        # index is built by from_file or from_offsets
+        self.offsets = None
+
+        doc_start_is = []
+        doc_end_is = []
+        doc_types = []
+        for x in self.tag_pattern.finditer(content):
+            tag = x.group()
+            if tag == '<DOCUMENT>':
+                doc_start_is.append(x.end())
+            elif tag == '</DOCUMENT>':
+                doc_end_is.append(x.start())
+            else:
+                doc_types.append(tag[len('<TYPE>'):])
+
+        # (type, start, end) for each DOCUMENT, in the order they appear
+        self.docs = list(zip(doc_types, doc_start_is, doc_end_is))
+
+        # slices are only copied out of content when they are asked for
+        self._slices = {}
+
+    @classmethod
+    def from_file(cls, path: str, doc_types: list = None, chunk_size: int = 1 << 20, encoding: str = None):
+        '''
+        Build the index from a file, keeping only the DOCUMENTs of doc_types.
+
+        Parameters
+        ----------
+        path : str
+            The path of the full-submission file, which may be compressed;
+            see filing_io.
+        doc_types : list, optional
+            The types of DOCUMENT to keep, e.g. ['8-K', 'EX-99.1'], or the
+            prefixes of them, e.g. 'EX-10'; see type_wanted. The default is
+            None, i.e. all of them.
+        chunk_size : int, optional
+            The num. of bytes read at a time. The default is 1MB.
+        encoding : str, optional
+            The encoding of the file. The default is None, i.e. the one used by
+            open(path, 'r').
+
+        Returns
+        -------
+        index : document_index
+            The index of the SGML header and the DOCUMENTs kept, as if the
+            other DOCUMENTs were not in the file. index.offsets gives the byte
+            offsets of all the DOCUMENTs in the file.
+
+        '''
+        encoding = encoding if encoding is not None else locale.getpreferredencoding(False)
+        wanted = set(doc_types) if doc_types is not None else None
+
+        pieces = []
+        offsets = []
+        with stage('split'), open_filing(path, 'rb') as f:
+            reader = submission_reader(f, chunk_size)
+
+            # the header before the first DOCUMENT
+            i = reader.find(b'<DOCUMENT>')
+            pieces.append(reader.take(i if i >= 0 else len(reader.buffer)))
+
+            while reader.find(b'<DOCUMENT>') >= 0:
+                reader.discard(reader.find(b'<DOCUMENT>') + len(b'<DOCUMENT>'))
+                doc_start = reader.offset
+
+                # the type is the rest of the line of <TYPE>
+                i = reader.find(b'<TYPE>')
+                j = reader.find(b'\n', i) if i >= 0 else -1
+                j = j if j >= 0 else len(reader.buffer)
+                doc_type = reader.buffer[i + len(b'<TYPE>'):j].rstrip(b'\r').decode(encoding, 'replace') if i >= 0 else ''
+
+                if type_wanted(doc_type, wanted):
+                    i = reader.find(b'</DOCUMENT>')
+                    doc = reader.take(i if i >= 0 else len(reader.buffer))
+                    if i >= 0:
+                        pieces.append(b'<DOCUMENT>' + doc + b'</DOCUMENT>\n')
+                else:
+                    # GRAPHIC, ZIP, PDF, ... and their payloads are never decoded
+                    i = reader.skip_to(b'</DOCUMENT>')
+                    reader.discard(i if i >= 0 else len(reader.buffer))
+                if i >= 0:
+                    offsets.append((doc_type, doc_start, reader.offset))
+                    reader.discard(len(b'</DOCUMENT>'))
+
+            return cls.assemble(pieces, offsets, encoding)
+
+    @classmethod
+    def assemble(cls, pieces: list, offsets: list, encoding: str):
+        # the same newlines as open(path, 'r')
+        content = b''.join(pieces).decode(encoding).replace('\r\n', '\n').replace('\r', '\n')
+        index = cls(content)
+        index.offsets = offsets
+        return index
+
+    @classmethod
+    def from_offsets(cls, path: str, offsets: list, doc_types: list = None, encoding: str = None):
+        '''
+        Build the index like from_file, but read the header and the DOCUMENTs
+        of doc_types only, by seeking to their offsets, e.g. those in a sidecar
+        index. A compressed file is still decompressed up to each of them.
+
+        '''
+        encoding = encoding if encoding is not None else locale.getpreferredencoding(False)
+        wanted = set(doc_types) if doc_types is not None else None
+
+        pieces = []
+        with stage('split'), open_filing(path, 'rb') as f:
+            header_end = offsets[0][1] - len(b'<DOCUMENT>') if len(offsets) > 0 else -1
+            with stage('read') as timer:
+                pieces.append(f.read(header_end))
+                for doc_type, doc_start, doc_end in offsets:
+                    if type_wanted(doc_type, wanted):
+                        f.seek(doc_start)
+                        pieces.append(b'<DOCUMENT>' + f.read(doc_end - doc_start) + b'</DOCUMENT>\n')
+                timer.add_bytes(sum(len(piece) for piece in pieces))
+
+            return cls.assemble(pieces, [tuple(each) for each in offsets], encoding)
+
+    def sidecar(self, path: str):
+        '''
+        The sidecar index of the filing in path: the offsets of its DOCUMENTs,
+        along with the size and modified time of the filing to tell if it
+        changes.
+
+        '''
+        stat = os.stat(path)
+        return {'size': stat.st_size, 'mtime': stat.st_mtime, 'docs': self.offsets}
+
+    @classmethod
+    def load(cls, path: str, doc_types: list = None, offsets = None, key: str = None):
+        '''
+        Build the index of a filing by from_offsets if its sidecar index kept
+        under key in offsets, an item store, is still valid, or else by
+        from_file, saving the sidecar index for the next time. Without offsets
+        it is from_file.
+
+        '''
+        if offsets is None:
+            return cls.from_file(path, doc_types)
+
+        try:
+            sidecar = offsets.get_offsets(key)
+            stat = os.stat(path)
+            if sidecar is not None and sidecar['size'] == stat.st_size and sidecar['mtime'] == stat.st_mtime:
+                return cls.from_offsets(path, sidecar['docs'], doc_types)
+        except (OSError, ValueError, KeyError):
+            pass
+
+        index = cls.from_file(path, doc_types)
+        offsets.put_offsets(key, index.sidecar(path))
+        return index
+
+    @classmethod
+    def wrap(cls, content):
+        '''
+        Return content itself if it is already a document_index; otherwise
+        build one from the raw string.
+
+        '''
+        if isinstance(content, cls):
+            return content
+        return cls(content)
+
+    @property
+    def types(self):
+        return [doc_type for doc_type, _, _ in self.docs]
+
+    def span(self, doc_type: str):
+        '''
+        The (start, end) offsets of the first DOCUMENT of the given type, or
+        None if there is no such DOCUMENT in the filing.
+
+        '''
+        for each_type, doc_start, doc_end in self.docs:
+            if each_type == doc_type:
+                return doc_start, doc_end
+        return None
+
+    def get(self, doc_type: str, default = None):
+        '''
+        The codes under the first DOCUMENT of the given type. The slice is
+        made the first time it is asked for and reused afterwards.
+
+        '''
+        if doc_type in self._slices:
+            return self._slices[doc_type]
+
+        span = self.span(doc_type)
+        if span is None:
+            return default
+
+        self._slices[doc_type] = self.content[span[0]:span[1]]
+        return self._slices[doc_type]
+
+    def get_all(self, doc_type: str):
+        '''
+        The codes under every DOCUMENT asked for by doc_type, a type or the
+        prefix of a group of types like 'EX-10'; see type_wanted.
+
+        '''
+        wanted = {doc_type}
+        return [self.content[doc_start:doc_end] for each_type, doc_start, doc_end in self.docs
+                if type_wanted(each_type, wanted)]
+
+    def __contains__(self, doc_type: str):
+        return self.span(doc_type) is not None
+
+    def __getitem__(self, doc_type: str):
+        doc = self.get(doc_type)
+        if doc is None:
+            raise KeyError(doc_type)
+        return doc
+
+    def __len__(self):
+        return len(self.docs)
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+'''
+DESCRIPTION
+-----------
+Build the panel of filings from a folder of full-submission files instead
+of the Excel sheet exported by Crawler/edgarCrawler.R. The folder is walked
+and only the SGML header of each file is read(see sec_header), in a pool of
+processes, to make a row of
+
+    CIK, co_name, f_type, f_date, f_name, accession, period, sic
+
+the first five columns being those of the sheet of the crawler.
+
+The rows are kept in a cache, a JSON-lines file keyed by the path and the
+modified time of each file, so that a rescan of a growing archive reads the
+headers of the new or modified files only.
+
+CONTENTS
+--------
+- <LIST> panel_columns
+- <FUNC> filing_files
+- <FUNC> header_row
+- <FUNC> read_header_rows
+- <FUNC> load_cache
+- <FUNC> save_cache
+- <FUNC> discover_filings
+
+OTHER INFO.
+-----------
+- Last upate: R8/10/18(Nichi)
+
+'''
+import json
+import os
+import re
+import pandas as pd
+from joblib import Parallel, delayed
+from filing_io import compression_suffixes
+from sec_header import parse_header, read_header
+
+panel_columns = ['CIK', 'co_name', 'f_type', 'f_date', 'f_name', 'accession', 'period', 'sic']
+
+def filing_files(root: str):
+    '''
+    The paths and modified times of the full-submission files under root,
+    i.e. the .txt files, compressed or not.
+
+    Returns
+    -------
+    files : list
+        (path, mtime) of each file, the path joined by '/'.
+
+    '''
+    suffixes = ('.txt',) + tuple('.txt' + suffix for suffix in compression_suffixes)
+    files = []
+    folders = [root]
+    while folders:
+        with os.scandir(folders.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks = False):
+                    folders.append(entry.path)
+                elif entry.name.endswith(suffixes):
+                    files.append((entry.path.replace('\\', '/'), entry.stat().st_mtime))
+    files.sort()
+    return files
+
+def to_date(value: str):
+    # '20220510' to '2022-05-10'
+    if re.fullmatch(r'[0-9]{8}', value or ''):
+        return value[:4] + '-' + value[4:6] + '-' + value[6:]
+    return value
+
+def header_row(path: str):
+    '''
+    The row of the panel for a file, read from its SGML header. None if the
+    file cannot be read or has no submission type.
+
+    '''
+    try:
+        fields = parse_header(read_header(path))
+    except OSError:
+        return None
+    if 'CONFORMED SUBMISSION TYPE' not in fields:
+        return None
+
+    cik = fields.get('CENTRAL INDEX KEY', '')
+    sic = re.search(r'\[([0-9]+)\]', fields.get('STANDARD INDUSTRIAL CLASSIFICATION', ''))
+    row = {'CIK': int(cik) if cik.isdigit() else None,
+           'co_name': fields.get('COMPANY CONFORMED NAME'),
+           'f_type': fields['CONFORMED SUBMISSION TYPE'],
+           'f_date': to_date(fields.get('FILED AS OF DATE')),
+           'f_name': path,
+           'accession': fields.get('ACCESSION NUMBER'),
+           'period': to_date(fields.get('CONFORMED PERIOD OF REPORT')),
+           'sic': int(sic.group(1)) if sic is not None else None}
+    return row
+
+def read_header_rows(paths: list):
+    # the func run by a worker
+    return [header_row(path) for path in paths]
+
+def load_cache(cache_path: str):
+    '''
+    {path: {'mtime': ..., 'row': ...}} in the cache file, if any.
+
+    '''
+    cache = {}
+    if cache_path is None or not os.path.exists(cache_path):
+        return cache
+    with open(cache_path, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            cache[record['path']] = record
+    return cache
+
+def save_cache(cache_path: str, cache: dict):
+    # rewrite the cache through a temp file, so that a crash never leaves half of it
+    folder = os.path.dirname(cache_path)
+    if folder:
+        os.makedirs(folder, exist_ok = True)
+    temp_path = cache_path + '.tmp'
+    with open(temp_path, 'w') as f:
+        for record in cache.values():
+            f.write(json.dumps(record) + '\n')
+    os.replace(temp_path, cache_path)
+
+def discover_filings(root: str, form_types: list = None, jobs: int = 4, cache_path: str = None,
+                     batch_size: int = 256, verbose: int = 0):
+    '''
+    Build the panel of the filings under root.
+
+    Parameters
+    ----------
+    root : str
+        The folder of the filings, searched recursively.
+    form_types : list, optional
+        Keep the filings of these types only, e.g. ['8-K']; a str is taken as
+        a list of one type. The default is None, i.e. all of them.
+    jobs : int, optional
+        Num. of processes to read the headers. The default is 4.
+    cache_path : str, optional
+        The cache of the rows read already, created if it does not exist.
+        The default is None, i.e. read every header.
+    batch_size : int, optional
+        The num. of files sent to a worker at a time. The default is 256.
+    verbose : int, optional
+        Passed to joblib.Parallel. The default is 0.
+
+    Returns
+    -------
+    panel_df : pandas.DataFrame
+        The panel sorted by CIK and f_date, with panel_columns.
+
+    '''
+    if isinstance(form_types, str):
+        form_types = [form_types]
+
+    cache = load_cache(cache_path)
+    files = filing_files(root)
+
+    # the files new or modified since the last scan
+    to_read = [path for path, mtime in files if path not in cache or cache[path]['mtime'] != mtime]
+    batches = [to_read[i:i + batch_size] for i in range(0, len(to_read), batch_size)]
+    rows = Parallel(n_jobs = jobs, verbose = verbose)(delayed(read_header_rows)(batch) for batch in batches)
+
+    mtimes = dict(files)
+    for batch, batch_rows in zip(batches, rows):
+        for path, row in zip(batch, batch_rows):
+            cache[path] = {'path': path, 'mtime': mtimes[path], 'row': row}
+
+    # forget the files removed from root; those out of root are kept
+    removed = [path for path in cache if path not in mtimes and path.startswith(root.replace('\\', '/'))]
+    for path in removed:
+        del cache[path]
+    if cache_path is not None and len(to_read) + len(removed) > 0:
+        save_cache(cache_path, cache)
+
+    panel = [cache[path]['row'] for path, _ in files if cache[path]['row'] is not None]
+    if form_types is not None:
+        panel = [row for row in panel if row['f_type'] in form_types]
+
+    panel_df = pd.DataFrame(panel, columns = panel_columns)
+    panel_df.sort_values(by = ['CIK', 'f_date'], inplace = True, kind = 'stable')
+    panel_df.reset_index(drop = True, inplace = True)
+    return panel_df
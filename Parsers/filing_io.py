@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+'''
+DESCRIPTION
+-----------
+Open the raw filings and the item files whether they are compressed or not.
+A file ending with .gz, .bz2 or .zst is decompressed(or compressed, when
+written) as a stream, so a compressed filing is never held in the memory
+as a whole. A path in a panel may also leave out the suffix, e.g.
+'<file>.txt' for '<file>.txt.gz' on the disk.
+
+.zst needs the zstandard package, which is imported only if it is installed.
+
+CONTENTS
+--------
+- <TUPLE> compression_suffixes
+- <DICT> compression_levels
+- <FUNC> compression_of
+- <FUNC> filing_path
+- <FUNC> open_filing
+
+OTHER INFO.
+-----------
+- Last upate: R8/10/18(Nichi)
+
+'''
+import bz2
+import gzip
+import os
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+compression_suffixes = ('.gz', '.bz2', '.zst')
+
+# the levels used to write; a lower level is much faster and nearly as small for texts
+compression_levels = {'.gz': 6, '.bz2': 9, '.zst': 3}
+
+def compression_of(path: str):
+    '''
+    The suffix of compression of path, e.g. '.gz', or '' if it is not compressed.
+
+    '''
+    for suffix in compression_suffixes:
+        if path.endswith(suffix):
+            return suffix
+    return ''
+
+def filing_path(path: str):
+    '''
+    path itself if it exists, or else the compressed file of it on the disk,
+    e.g. path + '.gz'. path is returned as it is if none of them exists.
+
+    '''
+    if os.path.exists(path):
+        return path
+    for suffix in compression_suffixes:
+        if os.path.exists(path + suffix):
+            return path + suffix
+    return path
+
+def open_filing(path: str, mode: str = 'rb', encoding: str = None):
+    '''
+    Open a file like open(), decompressing or compressing it as a stream by
+    the suffix of path.
+
+    Parameters
+    ----------
+    path : str
+        The path of the file.
+    mode : str, optional
+        'rb', 'rt', 'wb', 'wt', 'ab' or 'at'. The default is 'rb'.
+    encoding : str, optional
+        The encoding in a text mode. The default is None, i.e. that of open().
+
+    '''
+    suffix = compression_of(path)
+    level = compression_levels.get(suffix)
+    if suffix == '.gz':
+        return gzip.open(path, mode, compresslevel = level, encoding = encoding)
+    if suffix == '.bz2':
+        return bz2.open(path, mode, compresslevel = level, encoding = encoding)
+    if suffix == '.zst':
+        if zstandard is None:
+            raise ImportError(f'zstandard is needed to open {path}; pip install zstandard')
+        cctx = zstandard.ZstdCompressor(level = level) if mode[0] in 'wa' else None
+        return zstandard.open(path, mode, cctx = cctx, encoding = encoding)
+    return open(path, mode, encoding = encoding)
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+'''
+DESCRIPTION
+-----------
+Backends to convert the XML codes of a DOCUMENT, or a part of it, into text.
+This is the step of washing the codes by BS4 in matching_strategies: parse
+the codes, remove the data tables, and get the text of what remains. A data
+table is kept only if it is in fact a list, i.e. it contains a bullet.
+
+Two backends are available:
+    - bs4: BeautifulSoup with the lxml parser, as the parsers always did. It
+      is kept as the reference for the other backend;
+    - lxml: let lxml parse the codes, and collect the text while parsing,
+      without building a tree or a python object for every tag and string in
+      the codes. The text is the same as that of the bs4 backend.
+
+Before either backend, strip_hidden cuts out at the string level what has no
+text to be read but takes most of the parse on a modern inline XBRL form:
+    - the <ix:header> blocks, i.e. the hidden facts, contexts and units;
+    - the elements hidden by display:none, which wrap the <ix:header> in
+      most cases;
+    - the <style> blocks;
+    - for bs4, the style attributes of the tags, which lxml parses faster
+      than they can be cut; they have no text, so the text of the backends
+      is still the same.
+The hidden facts were left in the text before; the rest has no text.
+
+CONTENTS
+--------
+- <FUNC> strip_hidden
+- <FUNC> bullet_table
+- <FUNC> bs4_text
+- <CLASS> text_collector
+- <FUNC> lxml_text
+- <DICT> text_backends
+- <FUNC> html_to_text
+
+OTHER INFO.
+-----------
+- Last upate: R8/10/18(Nichi)
+
+'''
+import re
+from bs4 import BeautifulSoup
+from lxml import etree
+from profiling import stage
+
+default_backend = 'lxml'
+
+# the tags whose strings are left out of get_text() by BS4
+hidden_tags = ('script', 'style', 'template', 'rt', 'rp')
+
+# the tags where BS4 keeps the blanks as they are
+preserve_tags = ('pre', 'textarea')
+ascii_spaces = ' \n\t\x0c\r'
+
+display_none = re.compile(r'display\s*:\s*none', re.I)
+style_block = re.compile(r'<style\b.*?</style\s*>', re.I | re.S)
+hidden_start = re.compile(r'<([a-z][a-z0-9]*)\b[^<>]*?\sstyle\s*=\s*["\'][^"\'<>]*?display\s*:\s*none[^<>]*>', re.I)
+style_attribute = re.compile(r'(<[a-z][^<>]*?)\s+style\s*=\s*(?:"[^"]*"|\'[^\']*\')', re.I)
+
+# the tags with no end tag, never hiding anything
+void_tags = ('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr')
+tag_patterns = {}
+
+def element_end(codes: str, tag: str, pos: int):
+    '''
+    The end of the element of tag whose start tag ends at pos, i.e. past its
+    end tag, counting the same tags nested in it; -1 if it is not closed.
+
+    '''
+    if tag not in tag_patterns:
+        tag_patterns[tag] = re.compile(r'<(/?)' + tag + r'\b[^<>]*>', re.I)
+    depth = 1
+    for x in tag_patterns[tag].finditer(codes, pos):
+        if x.group(1):
+            depth -= 1
+            if depth == 0:
+                return x.end()
+        elif not x.group().endswith('/>'):
+            depth += 1
+    return -1
+
+def strip_hidden(codes: str, styles: bool = True):
+    '''
+    A func to cut the <ix:header> blocks, the elements hidden by display:none,
+    the <style> blocks and, if styles is True, the style attributes out of
+    the codes. A hidden element that is not closed in the codes, e.g. in the
+    slice of an item, is kept.
+
+    '''
+    # the tags of iXBRL are in lower case, it being XHTML
+    pieces = []
+    last = 0
+    start = codes.find('<ix:header')
+    while start >= 0:
+        end = codes.find('</ix:header>', start)
+        if end < 0:
+            break
+        pieces.append(codes[last:start])
+        last = end + len('</ix:header>')
+        start = codes.find('<ix:header', last)
+    if pieces:
+        codes = ''.join(pieces) + codes[last:]
+    
+    # from each display:none back to its start tag, which is much faster than
+    # matching hidden_start at every tag
+    pieces = []
+    last = 0
+    found = display_none.finditer(codes) if 'isplay' in codes or 'ISPLAY' in codes else []
+    for x in found:
+        start = codes.rfind('<', 0, x.start())
+        if start < last:
+            continue
+        tag = hidden_start.match(codes, start)
+        if tag is None or tag.end() <= x.start() or tag.group(1).lower() in void_tags or tag.group().endswith('/>'):
+            continue
+        end = element_end(codes, tag.group(1).lower(), tag.end())
+        if end >= 0:
+            pieces.append(codes[last:start])
+            last = end
+    if pieces:
+        codes = ''.join(pieces) + codes[last:]
+    
+    if '<style' in codes or '<STYLE' in codes or '<Style' in codes:
+        codes = style_block.sub('', codes)
+    if styles:
+        codes = style_attribute.sub(r'\1', codes)
+    return codes
+
+def bullet_table(table_text: str):
+    '''
+    The default rule to keep a data table: keep it if there is a bullet in it.
+
+    '''
+    return '\u2022' in table_text
+
+def bs4_text(codes: str, keep_table = bullet_table):
+    '''
+    The reference backend. Remove the tables that keep_table rejects from the
+    soup one by one and return soup.get_text().
+
+    '''
+    soup = BeautifulSoup(codes, 'lxml')
+    for table in soup.find_all('table'):
+        if not keep_table(table.get_text()):
+            table.extract()
+    return soup.get_text()
+
+class text_collector:
+    '''
+    A parser target of lxml that collects the text while the codes are being
+    parsed, without building a tree. lxml calls the same methods for the same
+    tags and strings as it does for BS4, so the strings are cut in the same
+    way as the NavigableStrings in a soup:
+        - a string made up of blanks only is cut to a '\n'(if it includes
+          one) or a ' ', unless it is in a <pre> or <textarea> tag;
+        - the strings in the hidden_tags are left out.
+    
+    A table is judged by all the strings in it once its end tag is met, and
+    the strings of the tables that keep_table rejects are then left out.
+
+    '''
+    def __init__(self, keep_table):
+        self.keep_table = keep_table
+        self.strings = []
+        self.pieces = []
+        self.hidden = 0
+        self.preserve = 0
+        # the first string of each table open now, and the strings of each table removed
+        self.table_starts = []
+        self.dropped = []
+
+    def end_string(self):
+        if len(self.pieces) == 0:
+            return
+        
+        string = ''.join(self.pieces)
+        self.pieces = []
+        if self.hidden:
+            return
+        
+        if self.preserve == 0 and not string.strip(ascii_spaces):
+            string = '\n' if '\n' in string else ' '
+        self.strings.append(string)
+
+    def start(self, tag, attrib, nsmap = None):
+        self.end_string()
+        if tag in hidden_tags:
+            self.hidden += 1
+        if tag in preserve_tags:
+            self.preserve += 1
+        if tag == 'table':
+            self.table_starts.append(len(self.strings))
+
+    def end(self, tag):
+        self.end_string()
+        if tag in hidden_tags:
+            self.hidden -= 1
+        if tag in preserve_tags:
+            self.preserve -= 1
+        if tag == 'table':
+            table_start = self.table_starts.pop()
+            if not self.keep_table(''.join(self.strings[table_start:])):
+                self.dropped.append((table_start, len(self.strings)))
+
+    def data(self, data):
+        self.pieces.append(data)
+
+    def comment(self, text):
+        self.end_string()
+
+    def pi(self, target, data = None):
+        self.end_string()
+
+    def doctype(self, *args):
+        self.end_string()
+
+    def close(self):
+        self.end_string()
+        if len(self.dropped) == 0:
+            return ''.join(self.strings)
+        
+        # the tables are found from the inner ones; skip the strings of the outermost ones
+        kept = []
+        last = 0
+        for table_start, table_end in sorted(self.dropped):
+            if table_start >= last:
+                kept.append(''.join(self.strings[last:table_start]))
+                last = table_end
+            elif table_end > last:
+                last = table_end
+        kept.append(''.join(self.strings[last:]))
+        return ''.join(kept)
+
+def lxml_text(codes: str, keep_table = bullet_table):
+    '''
+    The lxml backend. Feed the codes to lxml at once, as BS4 does, and collect
+    the text by text_collector.
+
+    '''
+    if codes[:1] == '\ufeff':
+        codes = codes[1:]
+    
+    try:
+        parser = etree.HTMLParser(target = text_collector(keep_table), recover = True)
+        parser.feed(codes)
+        return parser.close()
+    except (UnicodeDecodeError, LookupError, etree.ParserError):
+        # lxml does not accept the codes as a str, e.g. with an encoding declared
+        parser = etree.HTMLParser(target = text_collector(keep_table), recover = True, encoding = 'utf8')
+        parser.feed(codes.encode('utf8'))
+        return parser.close()
+
+text_backends = {'bs4': bs4_text,
+                 'lxml': lxml_text}
+
+def html_to_text(codes: str, keep_table = bullet_table, backend: str = default_backend, strip: bool = True):
+    '''
+    A func to get the text from the XML codes, with the data tables removed.
+    The codes are stripped by strip_hidden first unless strip is False.
+
+    Parameters
+    ----------
+    codes : str
+        The XML codes, e.g. the codes under a DOCUMENT or of an item.
+    keep_table : function, optional
+        Given the text of a table, return True if the table is to be kept.
+        The default is bullet_table.
+    backend : str, optional
+        One of the keys of text_backends. The default is 'lxml'.
+    strip : bool, optional
+        Strip the hidden markup by strip_hidden first. The default is True.
+
+    Returns
+    -------
+    text : str
+        The text in the codes.
+
+    '''
+    if strip:
+        with stage('strip_hidden', len(codes)):
+            codes = strip_hidden(codes, styles = backend != 'lxml')
+    with stage('html_text', len(codes)):
+        return text_backends[backend](codes, keep_table)
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+'''
+DESCRIPTION
+-----------
+The rules to find the start and the end of each item in a form, and an
+engine that applies them to the item table(out_tb) created by one of the
+strategies in matching_strategies.
+
+For every item of a form, a rule gives:
+    - skip: how many tags of the item may be skipped at most, as the first
+      one(s) are the tags in the table of contents in most cases. The tag
+      used is the (skip + 1)-th one, or the last one if fewer are found;
+    - ends: the items most possible to appear after the item, in order. The
+      item ends at the first tag of the first one of them found after its
+      start;
+    - to_eof: whether the item ends at the end of the DOCUMENT if none of
+      the ends is found. If False, the item is treated as not found.
+
+To parse a new form, e.g. 20-F or S-1, add its rules here and its patterns
+to item_detector.
+
+The confidence of an item extracted is 1 scaled down for what makes its
+boundaries doubtful: found by the second strategy(x0.8), whose patterns also
+match the titles cross-referred to in the text; ended by an end other than
+the first one of the rule(x0.9) or by the end of the DOCUMENT(x0.7); and
+shorter than 500 chars(x0.5), like a line of the table of contents.
+
+CONTENTS
+--------
+- <DICT> form_item_rules
+- <CLASS> boundary_engine
+- <FUNC> confidence
+
+OTHER INFO.
+-----------
+- Last upate: R8/10/18(Nichi)
+
+'''
+from bisect import bisect_right
+
+form_item_rules = {
+    '8-K': {
+        'item202': {'skip': 1, 'ends': ['item501', 'item507', 'item701', 'item801', 'item901'], 'to_eof': True},
+        'item701': {'skip': 1, 'ends': ['item801', 'item901'], 'to_eof': True},
+        'item801': {'skip': 1, 'ends': ['item901'], 'to_eof': True},
+    },
+    '10-K': {
+        'item1': {'skip': 1, 'ends': ['item1a', 'item2', 'item3', 'partii'], 'to_eof': False},
+        'item1a': {'skip': 1, 'ends': ['item1b', 'item2', 'item3', 'item4', 'partii'], 'to_eof': False},
+        'item7': {'skip': 1, 'ends': ['item7a', 'item8', 'item9', 'item9a'], 'to_eof': False},
+        'item7a': {'skip': 1, 'ends': ['item8', 'item9', 'item9a'], 'to_eof': False},
+        # Item 9B is labelled as item9 by the first strategy, and Part III as partii
+        'item9a': {'skip': 1, 'ends': ['item9', 'partii'], 'to_eof': False},
+    },
+    '10-Q': {
+        # both parts have an Item 1 and an Item 2; use the one under Part I
+        'item1': {'skip': 2, 'ends': ['item2', 'item3', 'item4', 'partii'], 'to_eof': False},
+        'item2': {'skip': 2, 'ends': ['item3', 'item4', 'partii', 'item1a', 'item2', 'item6'], 'to_eof': True},
+        'item1a': {'skip': 1, 'ends': ['item2', 'item6'], 'to_eof': False},
+    },
+}
+
+class boundary_engine:
+    def __init__(self, tb):
+        '''
+        Compile an item table into a sorted array of starts for each item, so
+        that finding the next tag of an item after a position is a binary
+        search instead of filtering the table again.
+
+        Parameters
+        ----------
+        tb : item_table
+            A table including the name, start, and end of the items in a form,
+            i.e. out_tb created by one of the strategies in item_detector.
+
+        '''
+        self.starts = {}
+        for item, start in zip(tb.item, tb.start):
+            self.starts.setdefault(item, []).append(start)
+        for item_starts in self.starts.values():
+            item_starts.sort()
+
+    def next_start(self, item: str, pos):
+        '''
+        The start of the first tag of an item after pos, or None.
+
+        '''
+        item_starts = self.starts.get(item)
+        if item_starts is None:
+            return None
+
+        i = bisect_right(item_starts, pos)
+        if i == len(item_starts):
+            return None
+        return item_starts[i]
+
+    def locate(self, rule: dict, which: str, doc_len: int):
+        '''
+        Apply the rule of an item to find its start and end.
+
+        Returns
+        -------
+        span : tuple
+            The (start, end) of the item, or None if it is not found.
+
+        '''
+        return self.find(rule, which, doc_len)[0]
+
+    def find(self, rule: dict, which: str, doc_len: int):
+        '''
+        locate, and which end of the rule ends the item.
+
+        Returns
+        -------
+        span : tuple
+            See locate.
+        end_rank : int
+            The index in rule['ends'] of the end found, or len(rule['ends'])
+            if the item ends at the end of the DOCUMENT; None if not found.
+
+        '''
+        item_starts = self.starts.get(which)
+        if item_starts is None:
+            return None, None
+
+        start_item = item_starts[min(len(item_starts) - 1, rule['skip'])]
+
+        for end_rank, end in enumerate(rule['ends']):
+            end_item = self.next_start(end, start_item)
+            if end_item is not None:
+                return (start_item, end_item), end_rank
+
+        if rule['to_eof']:
+            return (start_item, doc_len), len(rule['ends'])
+        return None, None
+
+def confidence(rule: dict, end_rank: int, st: int, length: int):
+    '''
+    The confidence of an item extracted by strategy st, ended by the end of
+    end_rank(see boundary_engine.find) and of length chars, from 0 to 1.
+
+    '''
+    score = 1.0 if st == 1 else 0.8
+    if end_rank == len(rule['ends']):
+        score *= 0.7
+    elif end_rank > 0:
+        score *= 0.9
+    if length < 500:
+        score *= 0.5
+    return round(score, 2)
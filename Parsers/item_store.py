@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+'''
+DESCRIPTION
+-----------
+The stores where the parsers export the content of the items. An item is
+always keyed by its relative path, i.e. the value in the *_adrs columns of
+the summary tables, e.g. '8-K/<cik>/<file>_item801.txt'.
+
+The backends are:
+    - dir: one txt file for each item under <store_path>/<cik>/, as the
+      parsers always did;
+    - gz, bz2 and zst: the same txt files, compressed, e.g. <file>_item7.txt.gz;
+      the keys of the items do not change. zst needs zstandard; see filing_io;
+    - sqlite: all the items of a store_path packed in one SQLite database,
+      <store_path>/items.sqlite, with the text compressed by zlib. Several
+      processes can write to it at the same time(WAL mode), and the counters
+      read the items from it in bulk instead of opening millions of small
+      files. The table is
+
+        items(adrs TEXT PRIMARY KEY, accession TEXT, item TEXT, text BLOB)
+
+With fsync, a store makes every write_many durable before it returns: the
+dir store fsyncs each file written, and the sqlite store commits with
+synchronous=FULL. A store may be wrapped by an async_writer, which writes
+the items in a pool of threads while the parser goes on; see item_writer.
+flush waits for the items queued, and does nothing for a store itself.
+
+A store also keeps the sidecar indexes of the offsets of the DOCUMENTs of
+the filings(see document_index), keyed by '<cik>/<file>': the dir stores
+as <store_path>/offsets/<cik>/<file>.json, each written to a temp file
+first and then renamed, so that a crash never leaves half of one; the
+sqlite store in a table of items.sqlite, so that it makes no small files:
+
+    offsets(name TEXT PRIMARY KEY, sidecar TEXT)
+
+CONTENTS
+--------
+- <FUNC> adrs_keys
+- <CLASS> directory_store
+- <CLASS> sqlite_store
+- <DICT> item_stores
+- <FUNC> open_item_store
+
+OTHER INFO.
+-----------
+- Last upate: R8/10/18(Nichi)
+
+'''
+import functools
+import json
+import os
+import sqlite3
+import zlib
+from filing_io import open_filing
+from item_writer import async_writer
+
+def adrs_keys(adrs: str):
+    '''
+    The accession number and the item of an adrs, e.g. ('0000950170-22-009069',
+    'item801') for '8-K/1000045/1000045_8-K_2022-05-10_0000950170-22-009069_item801.txt'.
+
+    '''
+    name = adrs.split('/')[-1].rsplit('.', 1)[0]
+    file_name, item = name.rsplit('_', 1)
+    return file_name.split('_')[-1], item
+
+class directory_store:
+    def __init__(self, store_path: str, suffix: str = '', fsync: bool = False):
+        '''
+        suffix is appended to the name of every txt file, e.g. '.gz' to save
+        the items compressed.
+
+        '''
+        self.store_path = store_path
+        self.suffix = suffix
+        self.fsync = fsync
+        # the folders made already by this process
+        self.made_dirs = set()
+
+    def file_path(self, adrs: str):
+        # '<form>/<cik>/<file>' is saved as <store_path>/<cik>/<file>
+        return self.store_path + '/' + '/'.join(adrs.split('/')[-2:]) + self.suffix
+
+    def write_many(self, items: dict):
+        '''
+        Save {adrs: content} of the items of a filing.
+
+        '''
+        for adrs, content in items.items():
+            path = self.file_path(adrs)
+            folder = os.path.dirname(path)
+            if folder not in self.made_dirs:
+                os.makedirs(folder, exist_ok = True)
+                self.made_dirs.add(folder)
+
+            with open_filing(path, 'wt') as f:
+                f.write(content)
+            if self.fsync:
+                # the file is closed first, so that a compressed one is complete
+                handle = os.open(path, os.O_RDWR)
+                try:
+                    os.fsync(handle)
+                finally:
+                    os.close(handle)
+
+    def flush(self):
+        return None
+
+    def get_offsets(self, key: str):
+        # the sidecar index saved under key, or None
+        try:
+            with open(self.store_path + '/offsets/' + key + '.json', 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put_offsets(self, key: str, sidecar: dict):
+        path = self.store_path + '/offsets/' + key + '.json'
+        folder = os.path.dirname(path)
+        if folder not in self.made_dirs:
+            os.makedirs(folder, exist_ok = True)
+            self.made_dirs.add(folder)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(sidecar, f)
+        os.replace(temp_path, path)
+
+    def exists(self, adrs: str):
+        return os.path.exists(self.file_path(adrs))
+
+    def read(self, adrs: str):
+        with open_filing(self.file_path(adrs), 'rt') as f:
+            return f.read()
+
+    def read_many(self, adrs_list: list):
+        return {adrs: self.read(adrs) for adrs in adrs_list if self.exists(adrs)}
+
+class sqlite_store:
+    file_name = 'items.sqlite'
+
+    def __init__(self, store_path: str, fsync: bool = False):
+        self.store_path = store_path
+        self.db_path = store_path + '/' + self.file_name
+        self.fsync = fsync
+        self.connection = None
+
+    def __getstate__(self):
+        # each process opens a connection of its own
+        state = self.__dict__.copy()
+        state['connection'] = None
+        return state
+
+    def connect(self):
+        if self.connection is None:
+            os.makedirs(self.store_path, exist_ok = True)
+            self.connection = sqlite3.connect(self.db_path, timeout = 600)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=' + ('FULL' if self.fsync else 'NORMAL'))
+            self.connection.execute('CREATE TABLE IF NOT EXISTS items '
+                                    '(adrs TEXT PRIMARY KEY, accession TEXT, item TEXT, text BLOB)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS items_accession ON items (accession, item)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS offsets (name TEXT PRIMARY KEY, sidecar TEXT)')
+            self.connection.commit()
+        return self.connection
+
+    def write_many(self, items: dict):
+        '''
+        Save {adrs: content} of the items of a filing in one transaction.
+
+        '''
+        if len(items) == 0:
+            return
+
+        rows = [(adrs, *adrs_keys(adrs), zlib.compress(content.encode('utf-8')))
+                for adrs, content in items.items()]
+        connection = self.connect()
+        with connection:
+            connection.executemany('INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?)', rows)
+
+    def flush(self):
+        return None
+
+    def get_offsets(self, key: str):
+        # the sidecar index saved under key, or None
+        row = self.connect().execute('SELECT sidecar FROM offsets WHERE name = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def put_offsets(self, key: str, sidecar: dict):
+        connection = self.connect()
+        with connection:
+            connection.execute('INSERT OR REPLACE INTO offsets VALUES (?, ?)', (key, json.dumps(sidecar)))
+
+    def exists(self, adrs: str):
+        row = self.connect().execute('SELECT 1 FROM items WHERE adrs = ?', (adrs,)).fetchone()
+        return row is not None
+
+    def read(self, adrs: str):
+        row = self.connect().execute('SELECT text FROM items WHERE adrs = ?', (adrs,)).fetchone()
+        if row is None:
+            raise KeyError(adrs)
+        return zlib.decompress(row[0]).decode('utf-8')
+
+    def read_many(self, adrs_list: list, chunk_size: int = 500):
+        '''
+        Read the items in adrs_list, chunk_size of them in a query.
+
+        Returns
+        -------
+        items : dict
+            {adrs: content} of the items found in the store.
+
+        '''
+        connection = self.connect()
+        items = {}
+        for i in range(0, len(adrs_list), chunk_size):
+            chunk = adrs_list[i:i + chunk_size]
+            marks = ', '.join('?' * len(chunk))
+            for adrs, text in connection.execute(f'SELECT adrs, text FROM items WHERE adrs IN ({marks})', chunk):
+                items[adrs] = zlib.decompress(text).decode('utf-8')
+        return items
+
+item_stores = {'dir': directory_store,
+               'gz': functools.partial(directory_store, suffix = '.gz'),
+               'bz2': functools.partial(directory_store, suffix = '.bz2'),
+               'zst': functools.partial(directory_store, suffix = '.zst'),
+               'sqlite': sqlite_store}
+
+def open_item_store(store_path: str, backend: str = 'dir', write_threads: int = 0, fsync: bool = False):
+    '''
+    A func to create the item store of a parser.
+
+    Parameters
+    ----------
+    store_path : str
+        The store_path of the parser.
+    backend : str, optional
+        'dir', 'gz', 'bz2', 'zst' or 'sqlite'. The default is 'dir'.
+    write_threads : int, optional
+        Write the items in a pool of so many threads by an async_writer; see
+        item_writer. The default is 0, i.e. write them as they come.
+    fsync : bool, optional
+        Make every write durable before it is done. The default is False.
+
+    '''
+    store = item_stores[backend](store_path, fsync = fsync)
+    if write_threads > 0:
+        return async_writer(store, write_threads)
+    return store
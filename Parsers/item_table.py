@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+'''
+DESCRIPTION
+-----------
+A compact table of the items found in a form, i.e. out_tb created by the
+strategies in matching_strategies. A form has fewer than 50 item tags in
+most cases, for which a pandas DataFrame costs more than the matching
+itself, so the names, starts and ends are kept in three plain lists.
+
+CONTENTS
+--------
+- <FUNC> normalise_label
+- <CLASS> item_table
+
+OTHER INFO.
+-----------
+- Last upate: R8/10/18(Nichi)
+
+'''
+import re
+
+# the symbols removed from an item tag to get the name of the item
+label_symbols = re.compile(r'&#160;|&nbsp;|&#xa0;|[.><\s]')
+
+def normalise_label(tag: str):
+    '''
+    A func to convert an item tag matched in the XML codes, e.g. '>Item&#160;1A.',
+    into the name of the item, e.g. 'item1a'.
+
+    '''
+    return label_symbols.sub('', tag.lower())
+
+
+class item_table:
+    __slots__ = ('item', 'start', 'end')
+
+    def __init__(self):
+        # the rows are appended in the order of their starts
+        self.item = []
+        self.start = []
+        self.end = []
+
+    def append(self, item: str, start: int, end: int):
+        self.item.append(item)
+        self.start.append(start)
+        self.end.append(end)
+
+    def __len__(self):
+        return len(self.item)
+
+    @property
+    def size(self):
+        return 3 * len(self.item)
+
+    def to_frame(self):
+        '''
+        The table as a pandas DataFrame with the columns item, start and end,
+        e.g. for checking the results by eye.
+
+        '''
+        import pandas as pd
+        return pd.DataFrame({'item': self.item, 'start': self.start, 'end': self.end})
+
+    def __repr__(self):
+        rows = ', '.join(f'({item}, {start}, {end})' for item, start, end in zip(self.item, self.start, self.end))
+        return f'item_table([{rows}])'
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+'''
+DESCRIPTION
+-----------
+The pipelined writer of the items, so that a worker goes on parsing the
+next filing while the items of the last ones are written, e.g. to a slow
+network filesystem. An async_writer wraps an item store(see item_store):
+
+    - write_many puts the items of a filing in a bounded queue and returns
+      at once, unless the queue is full, in which case it waits for the
+      writers(backpressure), so that a slow disk never lets the items pile
+      up in the memory;
+    - a pool of writer threads, each with a copy of the store of its own,
+      takes the filings from the queue, as many as are waiting up to
+      batch_files of them or batch_bytes, and writes them by one write_many
+      of the store, i.e. one transaction of the sqlite store; the fsync
+      policy is that of the store, see item_store;
+    - flush waits for every write queued and returns the stats of the
+      writes since the last flush, including the latency of each filing from
+      being queued to being written, which the scheduler calls at the end
+      of every batch, before the batch is recorded in the manifest.
+
+An error of a writer is raised by the next write_many or flush. The threads
+are started by the process that writes first, so that the writer can be
+sent to the workers or forked with the parser.
+
+CONTENTS
+--------
+- <CLASS> async_writer
+- <FUNC> writer_report
+
+OTHER INFO.
+-----------
+- Last upate: R8/10/18(Nichi)
+
+'''
+import copy
+import os
+import queue
+import threading
+import time
+from profiling import percentile
+
+class async_writer:
+    def __init__(self, store, threads: int = 2, queue_size: int = 64, batch_files: int = 32,
+                 batch_bytes: int = 8 * 2 ** 20):
+        '''
+        Parameters
+        ----------
+        store : directory_store or sqlite_store
+            The store to write the items in.
+        threads : int, optional
+            Num. of writer threads. The default is 2.
+        queue_size : int, optional
+            The num. of filings queued before write_many waits. The default is 64.
+        batch_files : int, optional
+            The most filings written by one write_many of the store. The default is 32.
+        batch_bytes : int, optional
+            The chars of the items after which a batch is written without
+            waiting for more filings. The default is 8MB.
+
+        '''
+        self.store = store
+        self.threads = threads
+        self.queue_size = queue_size
+        self.batch_files = batch_files
+        self.batch_bytes = batch_bytes
+        # the pid of the process whose threads are running
+        self.pid = None
+
+    def __getstate__(self):
+        # the queue and the threads belong to the process that started them
+        return {name: self.__dict__[name] for name in ['store', 'threads', 'queue_size', 'batch_files', 'batch_bytes']}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.pid = None
+
+    def new_stats(self):
+        return {'files': 0, 'items': 0, 'bytes': 0, 'batches': 0, 'write_s': 0.0, 'wait_s': 0.0, 'latencies': []}
+
+    def start(self):
+        if self.pid == os.getpid():
+            return
+        # a forked process gets the queue and the locks, but not the threads, of its parent
+        self.pid = os.getpid()
+        self.queue = queue.Queue(self.queue_size)
+        self.lock = threading.Lock()
+        self.error = None
+        self.stats = self.new_stats()
+        for _ in range(self.threads):
+            threading.Thread(target = self.run, args = (copy.copy(self.store),), daemon = True).start()
+
+    def run(self, store):
+        # the loop of a writer thread
+        while True:
+            batch = [self.queue.get()]
+            size = batch[0][2]
+            while len(batch) < self.batch_files and size < self.batch_bytes:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+                size += batch[-1][2]
+
+            items = {}
+            for each, _, _ in batch:
+                items.update(each)
+            start = time.perf_counter()
+            try:
+                store.write_many(items)
+            except BaseException as error:
+                with self.lock:
+                    if self.error is None:
+                        self.error = error
+            end = time.perf_counter()
+
+            with self.lock:
+                self.stats['files'] += len(batch)
+                self.stats['items'] += len(items)
+                self.stats['bytes'] += size
+                self.stats['batches'] += 1
+                self.stats['write_s'] += end - start
+                self.stats['latencies'] += [end - queued for _, queued, _ in batch]
+            for _ in batch:
+                self.queue.task_done()
+
+    def raise_error(self):
+        with self.lock:
+            error, self.error = self.error, None
+        if error is not None:
+            raise error
+
+    def write_many(self, items: dict):
+        '''
+        Queue {adrs: content} of the items of a filing to be written.
+
+        '''
+        self.start()
+        self.raise_error()
+        if len(items) == 0:
+            return
+        queued = time.perf_counter()
+        self.queue.put((items, queued, sum(len(content) for content in items.values())))
+        with self.lock:
+            self.stats['wait_s'] += time.perf_counter() - queued
+
+    def flush(self):
+        '''
+        Wait for the items queued to be written.
+
+        Returns
+        -------
+        stats : dict
+            The files, items and chars written since the last flush, the
+            batches and the seconds spent writing them, the seconds
+            write_many waited on a full queue, and the latency of each file.
+
+        '''
+        self.start()
+        self.queue.join()
+        self.raise_error()
+        with self.lock:
+            stats, self.stats = self.stats, self.new_stats()
+        return stats
+
+    def get_offsets(self, key: str):
+        return self.store.get_offsets(key)
+
+    def put_offsets(self, key: str, sidecar: dict):
+        # small, and read back by the same process, so written at once
+        self.store.put_offsets(key, sidecar)
+
+    def exists(self, adrs: str):
+        return self.store.exists(adrs)
+
+    def read(self, adrs: str):
+        return self.store.read(adrs)
+
+    def read_many(self, adrs_list: list):
+        return self.store.read_many(adrs_list)
+
+def writer_report(flushes: list):
+    '''
+    A func to sum up the stats returned by the flushes of the writers of a
+    run; None if the items were written synchronously.
+
+    Returns
+    -------
+    report : dict
+        The files, items and MB written, the batches, the seconds spent
+        writing, the seconds the parsing waited on a full queue, and the
+        50th and 95th percentiles and the max of the latency of a file.
+
+    '''
+    flushes = [each for each in flushes if each is not None]
+    if len(flushes) == 0:
+        return None
+    latencies = [latency for each in flushes for latency in each['latencies']]
+    return {'files': sum(each['files'] for each in flushes),
+            'items': sum(each['items'] for each in flushes),
+            'mb': sum(each['bytes'] for each in flushes) / 1e6,
+            'batches': sum(each['batches'] for each in flushes),
+            'write_s': sum(each['write_s'] for each in flushes),
+            'wait_s': sum(each['wait_s'] for each in flushes),
+            'latency_p50_s': percentile(latencies, 0.5),
+            'latency_p95_s': percentile(latencies, 0.95),
+            'latency_max_s': max(latencies) if latencies else 0.0}
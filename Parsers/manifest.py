@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+'''
+DESCRIPTION
+-----------
+A manifest of the filings parsed into a store_path, so that a run can be
+resumed after it crashes, and a rerun, e.g. on the panel of next quarter,
+skips the filings parsed already.
+
+The manifest is a JSON-lines file, manifest.jsonl under the store_path. A
+line is appended for each filing once it is parsed, recording its size,
+modified time, the version of the parser, the items extracted, the results
+of extraction and the txt files exported. The last line of a filing is the
+one in use.
+
+A filing is taken as unchanged by its size and modified time, so that a
+resumed run reads none of the filings parsed already. Only with verify is
+the SHA-1 of each filing parsed recorded as well, which reads it once more:
+a filing whose size or modified time changes but whose SHA-1 does not, e.g.
+one copied to another disk, is then not parsed again.
+
+A filing is parsed again if
+    - it is not in the manifest, or the parser version differs;
+    - an item asked for was not extracted in the record;
+    - an item in the record is missing from the item store;
+    - its size or modified time differs, unless its SHA-1 is recorded and
+      is still the same;
+    - a re-parse is forced, for the whole form or some items.
+
+CONTENTS
+--------
+- <FUNC> file_sha1
+- <CLASS> run_manifest
+
+OTHER INFO.
+-----------
+- Last upate: R8/10/18(Nichi)
+
+'''
+import hashlib
+import json
+import os
+import time
+
+# bump this whenever a change of the parsers may change the results or the txt files
+parser_version = '2026.10.4'
+
+def file_sha1(path: str):
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+class run_manifest:
+    def __init__(self, store_path: str, form_type: str, items: list, version: str = parser_version, item_store = None,
+                 verify: bool = False):
+        '''
+        Load the manifest under store_path, if any.
+
+        Parameters
+        ----------
+        store_path : str
+            The store_path of the parser, where the txt files are exported.
+        form_type : str
+            The type of the form parsed, e.g. '10-K'.
+        items : list
+            The items to be extracted in this run.
+        version : str, optional
+            The version of the parsers. The default is parser_version.
+        item_store : optional
+            The item store of the parser, to check that the items in a record
+            are still there. The default is None, i.e. the txt files under
+            store_path; see item_store.
+        verify : bool, optional
+            Record the SHA-1 of each filing parsed. The default is False.
+
+        '''
+        self.store_path = store_path
+        self.form_type = form_type
+        self.items = list(items)
+        self.version = version
+        self.path = store_path + '/manifest.jsonl'
+        self.item_store = item_store
+        self.verify = verify
+
+        self.records = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # the last line may be cut by a crash
+                        continue
+                    self.records[record['path']] = record
+
+    def __getstate__(self):
+        # the workers only make new records; do not send them all the records
+        state = self.__dict__.copy()
+        state['records'] = {}
+        return state
+
+    def forced_items(self, force):
+        '''
+        The items to be parsed again whatever the manifest says. force may be
+        True or the form type for all the items, or an item name or a list
+        of them.
+
+        '''
+        if force is None or force is False:
+            return []
+        if force is True or force == self.form_type:
+            return list(self.items)
+        if isinstance(force, str):
+            force = [force]
+        return [item_name for item_name in self.items if item_name in force]
+
+    def outputs_exist(self, results: dict):
+        # the relative paths are like '10-K/<cik>/<file>_<item>.txt'
+        for key, adrs in results.items():
+            if not key.endswith('_path') or not adrs:
+                continue
+            if self.item_store is not None:
+                if not self.item_store.exists(adrs):
+                    return False
+            elif not os.path.exists(self.store_path + '/' + '/'.join(adrs.split('/')[-2:])):
+                return False
+        return True
+
+    def plan(self, path: str, force = None):
+        '''
+        Decide what to do with a filing.
+
+        Returns
+        -------
+        plan : dict or None
+            None if the filing is to be parsed as usual. Otherwise a dict of
+                - results: the results in the record;
+                - sha1: if not None, the size or modified time of the filing
+                  changed; reuse the results if its SHA-1 is still this one;
+                - items: if not None, parse these items only and reuse the
+                  results of the other items;
+                - record_items: the items extracted in the record.
+            If both sha1 and items are None, the results are reused as they are.
+
+        '''
+        record = self.records.get(path)
+        if record is None or record['version'] != self.version:
+            return None
+        if not set(self.items) <= set(record['items']):
+            return None
+        if not self.outputs_exist(record['results']):
+            return None
+
+        forced = self.forced_items(force)
+        if len(forced) == len(self.items):
+            return None
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        unchanged = stat.st_size == record['size'] and stat.st_mtime == record['mtime']
+
+        if len(forced) > 0:
+            if not unchanged:
+                return None
+            return {'results': record['results'], 'sha1': None, 'items': forced, 'record_items': record['items']}
+        if unchanged:
+            return {'results': record['results'], 'sha1': None, 'items': None, 'record_items': record['items']}
+        if record.get('sha1') is None:
+            # no SHA-1 to tell if the content is the same
+            return None
+        return {'results': record['results'], 'sha1': record['sha1'], 'items': None, 'record_items': record['items']}
+
+    def new_record(self, path: str, results: dict, items: list = None, sha1: str = None):
+        '''
+        The record of a filing just parsed. Called in the workers. With verify,
+        its SHA-1 is taken unless given.
+
+        '''
+        if sha1 is None and self.verify:
+            sha1 = file_sha1(path)
+        stat = os.stat(path)
+        record = {'path': path,
+                  'size': stat.st_size,
+                  'mtime': stat.st_mtime,
+                  'sha1': sha1,
+                  'version': self.version,
+                  'items': self.items if items is None else items,
+                  'results': results,
+                  'time': time.strftime('%Y-%m-%d %H:%M:%S')}
+        return record
+
+    def append(self, records: list):
+        '''
+        Append the records of a batch to the manifest, so that they are kept
+        even if the run crashes later.
+
+        '''
+        if len(records) == 0:
+            return
+
+        os.makedirs(self.store_path, exist_ok = True)
+        with open(self.path, 'a') as f:
+            f.write(''.join(json.dumps(record) + '\n' for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+        for record in records:
+            self.records[record['path']] = record
+
+    def compact(self):
+        '''
+        Rewrite the manifest with the last record of each filing only.
+
+        '''
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            for record in self.records.values():
+                f.write(json.dumps(record) + '\n')
+        os.replace(temp_path, self.path)
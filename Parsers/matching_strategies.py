@@ -7,19 +7,75 @@ different items, depending on the type of form to be parsed.
 
 CONTENTS
 --------
+- <FUNC> cut_table_of_contents
 - <FUNC> cut_uncreadable
+- <FUNC> item_prefix
+- <FUNC> exhibit_key
+- <FUNC> extract_section
+- <FUNC> extract_sections
+- <FUNC> fuse_patterns
 - <CLASS> item_detector
 
 
 OTHER INFO.
 -----------
-- Last upate: R4/8/19(Kin)
+- Last upate: R8/10/18(Nichi)
 
 
 '''
-from bs4 import BeautifulSoup
-import pandas as pd
+import heapq
 import re
+import zlib
+from document_index import document_index
+from boundary_cache import doc_sha1
+from regex_backend import compile_pattern, default_regex_backend
+from item_rules import boundary_engine, confidence, form_item_rules
+from item_table import item_table, normalise_label
+from html_text import bullet_table, default_backend, html_to_text
+from profiling import stage
+
+# bump this whenever a change of the strategies, cut_unreadable or html_text may change the item tables
+detector_version = '2026.10.1'
+
+# the errors a strategy raises on a filing it cannot parse, the same on every run, e.g. a tag not found;
+# any other error, e.g. a MemoryError or a locked database, is raised, and not kept in the cache
+parse_errors = (AttributeError, IndexError, KeyError, TypeError, ValueError, re.error)
+
+# the words and symbols removed by cut_unreadable
+table_of_contents = re.compile(r'Table\s*of\s*Contents\n*')
+# i.e. r'\s+([0-9]{1,2})(\n{2,}|\s+|\n\s+)|\n{2,}', but starting with a single \s so that re skips the letters fast
+page_number_or_enters = re.compile(r'\s(?:\s*([0-9]{1,2})(\n{2,}|\s+|\n\s+)|(?<=\n)\n+)')
+
+def cut_table_of_contents(content: str):
+    '''
+    A func to remove the words 'Table of Contents', with the blank lines around
+    them. The same as re.sub(r'\n*Table\s*of\s*Contents\n*', '', content), but
+    the pattern is only tried where str.find meets 'Table'.
+
+    '''
+    pieces = []
+    last = 0
+    i = content.find('Table')
+    while i >= 0:
+        x = table_of_contents.match(content, i)
+        if x is None:
+            i = content.find('Table', i + 1)
+            continue
+        
+        # the blank lines just before the words, but not those removed already
+        start = i
+        while start > last and content[start - 1] == '\n':
+            start -= 1
+        
+        pieces.append(content[last:start])
+        last = x.end()
+        i = content.find('Table', last)
+    
+    if last == 0:
+        return content
+    
+    pieces.append(content[last:])
+    return ''.join(pieces)
 
 def cut_unreadable(content: str):
     '''
@@ -29,7 +85,7 @@ def cut_unreadable(content: str):
     Parameters
     ----------
     content : str
-        The raw content extracted directly from a form. See extract_items method
+        The raw content extracted directly from a form. See export_single_file method
         in any module to parse a EDGAR form.
 
     Returns
@@ -39,75 +95,242 @@ def cut_unreadable(content: str):
         cannot be exported to a txt file(in utf-8).
 
     '''
-    # first ecoding into ASCII, and than decode into utf-8, with all odd symbols removed
-    content = content.encode('ascii', 'ignore')
-    content = content.decode()
+    with stage('cut_unreadable', len(content)):
+        # first remove all odd symbols, i.e. those not in ASCII, and '>'
+        if content.isascii():
+            content = content.replace('>', '')
+        else:
+            content = content.encode('ascii', 'ignore').replace(b'>', b'').decode('ascii')
+        
+        # remove other meaningless words
+        content = cut_table_of_contents(content)
+        
+        # replace the page numbers and the blank lines with a space in the same scan
+        out_str = page_number_or_enters.sub(' ', content)
+
+    return out_str
+
+def item_prefix(item_name: str):
+    '''
+    The prefix of the summary columns for an item, e.g. 'I1A' for 'item1a'
+    and 'I202' for 'item202'.
+
+    '''
+    return 'I' + item_name[len('item'):].upper()
+
+def exhibit_key(exhibit_type: str):
+    '''
+    The key of an exhibit in the results of extraction, e.g. 'ex991' for
+    'EX-99.1' and 'ex10' for the group 'EX-10'.
+
+    '''
+    return 'ex' + exhibit_type[len('EX-'):].replace('.', '').replace('-', '').lower()
+
+def extract_section(docs: str, start: int, end: int, st: int, backend: str = default_backend):
+    '''
+    A func to extract the content of a single item from docs[start:end].
+
+    The final extraction procedure differs due to the strategy we use. For
+    the first strategy, we remove all data tables from the XML code section
+    for the item we need, extract the content from XML codes that constitute
+    the item in a form, and finally apply cut_unreadable.
+    
+    In the case of the second strategy, as the data tables have already been
+    removed when applying the strategy and creating the raw_content, what 
+    remains is just applying cut_unreadable.
+    
+    The XML codes are converted into text by the backend in html_text.
+
+    '''
+    if st == 1:         
+        output = html_to_text(docs[start:end], backend = backend)
+        output = cut_unreadable(output)
+    else:
+        output = docs[start:end]
+        output = cut_unreadable(output)
+
+    return output
+
+# marks put at the start and the end of each item by extract_sections
+section_start_mark = '\ue000{}\ue001'
+section_end_mark = '\ue002{}\ue003'
+section_mark_pattern = re.compile('[\ue000\ue002][0-9]+[\ue001\ue003]')
+
+def extract_sections(docs: str, spans: dict, st: int, backend: str = default_backend):
+    '''
+    A func to extract several items from the same DOCUMENT at once. For the 
+    first strategy, instead of parsing the slice of every item, put
+    a pair of marks at the start and the end of each item, parse the part of
+    docs covering all the items only once, and cut the text at the marks.
     
-    # remove other meaningless symbols/words
-    content = content.replace('>', '')
+    A data table that contains a mark is kept, as a table that is cut in two
+    by an item boundary is the heading of that item in most cases. If the
+    marks of an item do not survive the parse, the item is parsed on its own
+    by extract_section.
+
+    Parameters
+    ----------
+    docs : str
+        The raw_content created by one of the strategies in item_detector.
+    spans : dict
+        {item: (start, end)} for the items to be extracted.
+    st : int
+        Which strategy created docs; 1 or 2.
+    backend : str, optional
+        The backend in html_text to convert the XML codes into text.
+
+    Returns
+    -------
+    sections : dict
+        {item: content} for the items in spans.
+
+    '''
+    if len(spans) == 0:
+        return {}
     
-    tc = re.compile(r'(\n){0,}Table(\n|\s){0,}of(\n|\s){0,}Contents\n{0,}')
-    out_str = re.sub(tc, '', content)
+    if st != 1 or len(spans) == 1:
+        return {which: extract_section(docs, start, end, st, backend) for which, (start, end) in spans.items()}
     
-    pagenum = re.compile(r'(\n{2,}|\s+|\n\s+)([0-9]{1,2})(\n{2,}|\s+|\n\s+)')
-    out_str = re.sub(pagenum, ' ', out_str)
+    def after_tag(pos):
+        # an item starts at the '>' closing a tag; do not put a mark inside the tag
+        return pos + 1 if pos < len(docs) and docs[pos] == '>' else pos
     
-    enters = re.compile(r'\n{2,}')
-    out_str = re.sub(enters, ' ', out_str)
+    marks = []
+    for k, (start, end) in enumerate(spans.values()):
+        marks.append((after_tag(start), section_start_mark.format(k)))
+        marks.append((after_tag(end), section_end_mark.format(k)))
+    marks.sort(key = lambda x: x[0])
+    
+    pieces = []
+    last = min(start for start, _ in spans.values())
+    for pos, mark in marks:
+        pieces.append(docs[last:pos])
+        pieces.append(mark)
+        last = pos
+    
+    def keep_table(table_text):
+        return bullet_table(table_text) or section_mark_pattern.search(table_text) is not None
+    
+    text = html_to_text(''.join(pieces), keep_table, backend)
+    
+    sections = {}
+    for k, (which, (start, end)) in enumerate(spans.items()):
+        start_mark = section_start_mark.format(k)
+        i = text.find(start_mark)
+        j = text.find(section_end_mark.format(k))
+        if i < 0 or j < i:
+            sections[which] = extract_section(docs, start, end, st, backend)
+        else:
+            output = section_mark_pattern.sub('', text[i + len(start_mark):j])
+            sections[which] = cut_unreadable(output)
+    return sections
 
-    return out_str
+
+def fuse_patterns(patterns: list):
+    '''
+    A func to fuse a list of regular expressions into alternations, each
+    pattern wrapped in a named group g0, g1, ..., so that the name of the
+    group that matches tells which pattern is found.
+    
+    Most patterns start with the same word in two cases, e.g. (Item|ITEM).
+    The patterns are grouped by that word into one alternation per word,
+    which starts with the literal first letter of the word. re can only skip
+    ahead to the next candidate quickly when a pattern starts with a single
+    known letter, so one alternation for all the patterns would be slower
+    than running them one by one; one alternation per word is much faster.
+
+    Parameters
+    ----------
+    patterns : list
+        A list of (label, rex) pairs.
+
+    Returns
+    -------
+    fused : list
+        The compiled alternations, one for each leading word.
+    labels : dict
+        {group name: label}.
+
+    '''
+    heading = re.compile(r'\((\w)(\w*)\|(\w)(\w*)\)')
+    
+    labels = {}
+    branches = {}
+    for k, (label, rex) in enumerate(patterns):
+        labels[f'g{k}'] = label
+        
+        m = heading.match(rex)
+        if m is not None and m.group(1) == m.group(3):
+            key = m.group(1) + f'(?:{m.group(2)}|{m.group(4)})'
+            rex = rex[m.end():]
+        else:
+            key = ''
+        branches.setdefault(key, []).append(f'(?P<g{k}>{rex})')
+    
+    fused = [re.compile(key + '(?:' + '|'.join(alts) + ')') for key, alts in branches.items()]
+    return fused, labels
 
 
 class item_detector:
-    def __init__(self, form_type: str):
+    def __init__(self, form_type: str, text_backend: str = default_backend, cache = None,
+                 regex_backend: str = default_regex_backend):
         self.form_type = form_type
+        
+        # the backend in html_text to convert the XML codes into text, e.g. 'lxml' or 'bs4'
+        self.text_backend = text_backend
+        
+        # a boundary_cache to keep the item tables found, or None; see boundary_cache
+        self.cache = cache
                 
-        ## regular expressions for the second strategy
+        ## regular expressions for the second strategy, each paired with the item it finds
         # form 10-K
-        rex_part1 = re.compile(r'(Part|PART)\s*I(\s|\n)+')
-        rex_p1item1 = re.compile(r'(Item|ITEM)\s*1\.?\s*([Bb]usiness\s*[Rr]?|BUSINESS\s*R?)')
-        rex_p1item1A = re.compile(r'(Item|ITEM)\s*A\s*\.?\s*([Rr]isk\s*[Ff]actors?|RISK\s*FACTORS?)')
-        rex_p1item1B = re.compile(r'(Item|ITEM)\s*1\s*B\s*\.?\s*([Uu]nresolved|UNRESOLVED)')
-        rex_p1item2 = re.compile(r'(Item|ITEM)\s*2\s*\.?\s*([Pp]roperties|PROPERTIES)')
-        rex_p1item3 = re.compile(r'(Item|ITEM)\s*3\s*\.?\s*([Ll]egal|LEGAL)')
-        rex_p1item4 = re.compile(r'(Item|ITEM)\s*4\s*\.?\s*([Mm]ine\s*[Ss]afety|MINE\s*SAFETY)')
-
-        rex_part2 = re.compile(r'(Part|PART)\s*II(\s|\n)+')
-        rex_p2item7 = re.compile(r'(Item|ITEM)\s*7\s*\.?\s*([Mm]anagement|MANAGEMENT)')
-        rex_p2item7a = re.compile(r'(Item|ITEM)\s*7\s*A\s*\.?\s*([Qq]uantitative|QUANTITATIVE)')
-        rex_p2item8 = re.compile(r'(Item|ITEM)\s*8\s*\.?\s*([Ff]inancial|FINANCIAL)')
-        rex_p2item9a = re.compile(r'(Item|ITEM)\s*9\s*A\s*\.?\s*([Cc]ontrol|CONTROL)')
-
-        reg10K_st2 = [rex_part1, rex_p1item1, rex_p1item1A, rex_p1item1B, rex_p1item2, rex_p1item3, rex_p1item4, rex_part2, rex_p2item7, rex_p2item7a, rex_p2item8, rex_p2item9a]
+        rex_part1 = r'(Part|PART)\s*I(\s|\n)+'
+        rex_p1item1 = r'(Item|ITEM)\s*1\.?\s*([Bb]usiness\s*[Rr]?|BUSINESS\s*R?)'
+        rex_p1item1A = r'(Item|ITEM)\s*1\s*A\s*\.?\s*([Rr]isk\s*[Ff]actors?|RISK\s*FACTORS?)'
+        rex_p1item1B = r'(Item|ITEM)\s*1\s*B\s*\.?\s*([Uu]nresolved|UNRESOLVED)'
+        rex_p1item2 = r'(Item|ITEM)\s*2\s*\.?\s*([Pp]roperties|PROPERTIES)'
+        rex_p1item3 = r'(Item|ITEM)\s*3\s*\.?\s*([Ll]egal|LEGAL)'
+        rex_p1item4 = r'(Item|ITEM)\s*4\s*\.?\s*([Mm]ine\s*[Ss]afety|MINE\s*SAFETY)'
+
+        rex_part2 = r'(Part|PART)\s*II(\s|\n)+'
+        rex_p2item7 = r'(Item|ITEM)\s*7\s*\.?\s*([Mm]anagement|MANAGEMENT)'
+        rex_p2item7a = r'(Item|ITEM)\s*7\s*A\s*\.?\s*([Qq]uantitative|QUANTITATIVE)'
+        rex_p2item8 = r'(Item|ITEM)\s*8\s*\.?\s*([Ff]inancial|FINANCIAL)'
+        rex_p2item9a = r'(Item|ITEM)\s*9\s*A\s*\.?\s*([Cc]ontrol|CONTROL)'
+
+        reg10K_st2 = [('parti', rex_part1), ('item1', rex_p1item1), ('item1a', rex_p1item1A), ('item1b', rex_p1item1B),
+                      ('item2', rex_p1item2), ('item3', rex_p1item3), ('item4', rex_p1item4), ('partii', rex_part2),
+                      ('item7', rex_p2item7), ('item7a', rex_p2item7a), ('item8', rex_p2item8), ('item9a', rex_p2item9a)]
         
         # form 10-Q
-        rex_p1item1 = re.compile(r'(Item|ITEM)\s*1\s*\.?\s*([Ff]inancial|FINANCIAL)')
-        rex_p1item2 = re.compile(r'(Item|ITEM)\s*2\s*\.?\s*([Mm]anagement|MANAGEMENT)')
-        rex_p1item3 = re.compile(r'(Item|ITEM)\s*3\s*\.?\s*([Qq]uantitative|QUANTITATIVE)')
-        rex_p1item4 = re.compile(r'(Item|ITEM)\s*4\s*\.?\s*([Cc]ontrols|CONTROLS)')
+        rex_p1item1 = r'(Item|ITEM)\s*1\s*\.?\s*([Ff]inancial|FINANCIAL)'
+        rex_p1item2 = r'(Item|ITEM)\s*2\s*\.?\s*([Mm]anagement|MANAGEMENT)'
+        rex_p1item3 = r'(Item|ITEM)\s*3\s*\.?\s*([Qq]uantitative|QUANTITATIVE)'
+        rex_p1item4 = r'(Item|ITEM)\s*4\s*\.?\s*([Cc]ontrols|CONTROLS)'
         
-        rex_p2item1 = re.compile(r'(Item|ITEM)\s*1\.?\s*([Ll]egal|LEGAL)\s?')
-        rex_p2item1a = re.compile(r'(Item|ITEM)\s*1\s*[Aa]\.?\s*([Rr]isk|RISK)\s?')
-        rex_p2i2 = re.compile(r'(Item|ITEM)\s*2\.?\s*(UNREGISTERED|[Uu]nregistered)')
-        rex_p2i6 = re.compile(r'(Item|ITEM)\s*6\.?\s*([Ee]xhibits|EXHIBITS)?')
+        rex_p2item1 = r'(Item|ITEM)\s*1\.?\s*([Ll]egal|LEGAL)\s?'
+        rex_p2item1a = r'(Item|ITEM)\s*1\s*[Aa]\.?\s*([Rr]isk|RISK)\s?'
+        rex_p2i2 = r'(Item|ITEM)\s*2\.?\s*(UNREGISTERED|[Uu]nregistered)'
+        rex_p2i6 = r'(Item|ITEM)\s*6\.?\s*([Ee]xhibits|EXHIBITS)?'
         
-        reg10Q_st2 = [rex_p1item1, rex_p1item2, rex_p1item3, rex_p1item4,
-            rex_p2item1, rex_p2item1a, rex_p2i2, rex_p2i6]
+        reg10Q_st2 = [('item1', rex_p1item1), ('item2', rex_p1item2), ('item3', rex_p1item3), ('item4', rex_p1item4),
+                      ('item1', rex_p2item1), ('item1a', rex_p2item1a), ('item2', rex_p2i2), ('item6', rex_p2i6)]
         
         
         # form 8-K
-        rex_202 = re.compile(r'(Item|ITEM)\s*2\s*\.?0\s*2\s*\.?\s*([Rr]esults\s*[Oo]f|RESULTS\s*OF)')
-        rex_501 = re.compile(r'(Item|ITEM)\s*5\s*\.?0\s*2\s*\.?\s*([Dd]eparture|DEPARTURE)')
-        rex_507 = re.compile(r'(Item|ITEM)\s*5\s*\.?0\s*7\s*\.?\s*([Ss]ubmission|SUBMISSION)')
-        rex_701 = re.compile(r'(Item|ITEM)\s*7\s*\.?0\s*1\s*\.?\s*([Rr]egulation|REGULATION)')
-        rex_801 = re.compile(r'(Item|ITEM)\s*8\s*\.?0\s*1\s*([Oo]ther\s*[Ee]vents?\s*\.*|OTHER\s*EVENTS?\s*)')
-        rex_901 = re.compile(r'(Item|ITEM)\s*9\s*\.?0\s*1\s*([Ff]inancial\s*[Ss]tatements?\s*\.*|FINANCIAL\s*STATEMENTS?\s*\.?)')
+        rex_202 = r'(Item|ITEM)\s*2\s*\.?0\s*2\s*\.?\s*([Rr]esults\s*[Oo]f|RESULTS\s*OF)'
+        rex_501 = r'(Item|ITEM)\s*5\s*\.?0\s*2\s*\.?\s*([Dd]eparture|DEPARTURE)'
+        rex_507 = r'(Item|ITEM)\s*5\s*\.?0\s*7\s*\.?\s*([Ss]ubmission|SUBMISSION)'
+        rex_701 = r'(Item|ITEM)\s*7\s*\.?0\s*1\s*\.?\s*([Rr]egulation|REGULATION)'
+        rex_801 = r'(Item|ITEM)\s*8\s*\.?0\s*1\s*([Oo]ther\s*[Ee]vents?\s*\.*|OTHER\s*EVENTS?\s*)'
+        rex_901 = r'(Item|ITEM)\s*9\s*\.?0\s*1\s*([Ff]inancial\s*[Ss]tatements?\s*\.*|FINANCIAL\s*STATEMENTS?\s*\.?)'
         
-        reg8K_st2 = [rex_202, rex_501, rex_507, rex_701, rex_801, rex_901]
+        reg8K_st2 = [('item202', rex_202), ('item502', rex_501), ('item507', rex_507),
+                     ('item701', rex_701), ('item801', rex_801), ('item901', rex_901)]
         
         # a dict of regular expressions for the first strategy
-        form_reg_dict_st1 = {'10-K': r'>\s*"*(Item|ITEM)(\s|&#160;|&nbsp;|&#xA0;)*(1\s*A|2|3|4|5|6|7\s*A*|8|9\s*A*)\.?|>\s*(PART|Part)(\s|&#160;|&nbsp;|&#xA0;)*I{1,2}\s*\.*',
-                             '10-Q': r'>\s*(Item|ITEM)(\s|&#160;|&nbsp;|&#xA0;)*<.*>\s*(1\s*A|2|3|4|5|6)\.?|>"*(Item|ITEM)(\s|&#160;|&nbsp;|&#xA0;)*(1\s*A|2|3|4|5|6)\.?|>\s*(PART|Part)(\s|&#160;|&nbsp;|&#xA0;)*I{1,2}\s*\.*',
+        form_reg_dict_st1 = {'10-K': r'>\s*"*(Item|ITEM)(\s|&#160;|&nbsp;|&#xA0;)*(1\s*A|1(\s|&#160;|&nbsp;|&#xA0;|\.|<)|2|3|4|5|6|7\s*A*|8|9\s*A*)\.?|>\s*(PART|Part)(\s|&#160;|&nbsp;|&#xA0;)*I{1,2}\s*\.*',
+                             '10-Q': r'>\s*(Item|ITEM)(\s|&#160;|&nbsp;|&#xA0;)*<.*>\s*(1\s*A|2|3|4|5|6)\.?|>"*(Item|ITEM)(\s|&#160;|&nbsp;|&#xA0;)*(1\s*A|1(\s|&#160;|&nbsp;|&#xA0;|\.|<)|2|3|4|5|6)\.?|>\s*(PART|Part)(\s|&#160;|&nbsp;|&#xA0;)*I{1,2}\s*\.*',
                              '8-K': r'>\s*I[Tt][Ee][Mm](\s|&#160;|&nbsp;|&#xA0;)*((2\s*\.\s*0\s*2)|5\s*\.\s*0\s*1|5\s*\.\s*0\s*7|7\s*\.\s*0\s*1|8\s*\.\s*0\s*1|9\s*\.\s*0\s*1)'}
 
         
@@ -116,22 +339,73 @@ class item_detector:
                              '10-Q': reg10Q_st2,
                              '8-K': reg8K_st2}
         
-        # create two attributes that save the rex to be used
-        self.reg_st1 = form_reg_dict_st1[form_type]
+        # the rules to find the start and the end of each item, see item_rules
+        self.item_rules = form_item_rules[form_type]
+        
+        # create two attributes that save the rex to be used; the patterns of the first
+        # strategy may be matched by RE2 in linear time, see regex_backend
+        self.regex_backend = regex_backend
+        self.reg_st1 = compile_pattern(form_reg_dict_st1[form_type], regex_backend)
         self.reg_st2 =form_reg_dict_st2[form_type]
+        
+        '''
+        Fuse the patterns of the second strategy into one alternation for each
+        leading word, e.g. Item or Part, so that second_method scans the text
+        once or twice instead of once per pattern. The name of the group that
+        matches tells which item is found.
+        
+        '''
+        self.fused_st2, self.labels_st2 = fuse_patterns(self.reg_st2)
+        
+        # the version of the item tables found by this detector, which changes with its patterns
+        patterns = '\n'.join([form_reg_dict_st1[form_type]] + [rex.pattern for rex in self.fused_st2])
+        self.version = f'{detector_version}/{form_type}/{text_backend}/{zlib.crc32(patterns.encode()):08x}'
     
     @staticmethod
-    def get_ex991(content:str):
+    def get_exhibits(content, exhibit_types: list, backend: str = default_backend):
         '''
-        A static method to extract Exhibit 99.1 from an 8-K form. Work flow:
-            i. find the names of all code sections that are included in a pair of <DOCUMENT> tags;         
-            ii. check if there are codes under Exhibit 99.1 DOCUMENT;
-            iii. if process ii is true, extract the codes under Exhibit 99.1, wash by BS4, and apply cut_unreadable.
+        A static method to extract a set of exhibits from a form at once, from one
+        document_index of it. Each exhibit type may be the type of a DOCUMENT, e.g.
+        'EX-99.1', or the prefix of a group of them, e.g. 'EX-10' for EX-10.1,
+        EX-10.2, ..., whose texts are then joined in the order they appear.
 
         Parameters
         ----------
-        content : str
-            The XML codes of the form.
+        content : str or document_index
+            The XML codes of the form, or a document_index already built from them.
+        exhibit_types : list
+            The types of the exhibits, e.g. ['EX-99.1', 'EX-99.2', 'EX-10'].
+        backend : str, optional
+            The backend in html_text to convert the XML codes into text.
+
+        Returns
+        -------
+        exhibits : dict
+            {exhibit type: text} of the exhibits found in the form; the codes are
+            converted into text and cut_unreadable is applied as get_ex991 does.
+
+        '''
+        docs_index = document_index.wrap(content)
+        
+        exhibits = {}
+        for exhibit_type in exhibit_types:
+            codes = docs_index.get_all(exhibit_type)
+            if len(codes) > 0:
+                exhibits[exhibit_type] = '\n\n'.join(cut_unreadable(html_to_text(each, backend = backend))
+                                                     for each in codes)
+        return exhibits
+    
+    @staticmethod
+    def get_ex991(content, backend: str = default_backend):
+        '''
+        A static method to extract Exhibit 99.1 from an 8-K form; see get_exhibits.
+
+        Parameters
+        ----------
+        content : str or document_index
+            The XML codes of the form, or a document_index already built from them.
+        backend : str, optional
+            The backend in html_text to convert the XML codes into text.
 
         Returns
         -------
@@ -139,101 +413,52 @@ class item_detector:
             The content under Exhibit 99.1.
 
         '''
+        return item_detector.get_exhibits(content, ['EX-99.1'], backend).get('EX-99.1', '')
         
-        # i
-        doc_start_pattern = re.compile(r'<DOCUMENT>')
-        doc_end_pattern = re.compile(r'</DOCUMENT>')
-        type_pattern = re.compile(r'<TYPE>[^\n]+')
-        
-        doc_start_is = [x.end() for x in doc_start_pattern.finditer(content)]
-        doc_end_is = [x.start() for x in doc_end_pattern.finditer(content)]
-        doc_types = [x[len('<TYPE>'):] for x in type_pattern.findall(content)]
-        docs_table = {}
-        
-        # ii
-        for doc_type, doc_start, doc_end in zip(doc_types, doc_start_is, doc_end_is):
-            if doc_type == 'EX-99.1':
-                docs_table[doc_type] = content[doc_start:doc_end]
-                break
-
-        if 'EX-99.1' not in docs_table.keys():
-            return ''
-                
-        # iii
-        raw_EX991 = BeautifulSoup(docs_table['EX-99.1'],'lxml')
-        for table in raw_EX991.find_all('table'):
-            if not('\u2022' in table.get_text()):
-                table.extract()
-        
-        content_EX991 = cut_unreadable(raw_EX991.get_text())
-        return content_EX991
-        
-    def first_method(self, content: str):
+    def first_method(self, content):
         '''
         The first strategy. The idea is: match the XML code patterns for the items.
         Work flow:
             i. find the names of all code sections that are included in a pair of <DOCUMENT> 
             ii. check if there are codes under the form to be parsed, e.g 10-Q, DOCUMENT tag;
             iii. if ii is true, find the starts and ends for the items in that DOCUMENT
-            iv. create a df to save the names, starts, and ends for the items
-            v. remove all meanningless symbols from the column for the names of the items
+            iv. create an item_table to save the names, starts, and ends for the items
+            v. remove all meanningless symbols from the names of the items as soon as they are matched
 
         Parameters
         ----------
-        content : str
-            The XML codes of the form.
+        content : str or document_index
+            The XML codes of the form, or a document_index already built from them.
 
         Returns
         -------
         raw_content : str
             The XML codes under the DOCUMENT tag of the form to be parsed.
-        out_tb : pandas df
-            The df comprised of the names, starts, and ends of the items in the form to be parsed.
+        out_tb : item_table
+            The table comprised of the names, starts, and ends of the items in the form to be parsed.
 
         '''
         
         # i
-        doc_start_pattern = re.compile(r'<DOCUMENT>')
-        doc_end_pattern = re.compile(r'</DOCUMENT>')
-        type_pattern = re.compile(r'<TYPE>[^\n]+')
-
-        doc_start_is = [x.end() for x in doc_start_pattern.finditer(content)]
-        doc_end_is = [x.start() for x in doc_end_pattern.finditer(content)]
-        doc_types = [x[len('<TYPE>'):] for x in type_pattern.findall(content)]
-
-        docs_table = {}
+        docs_index = document_index.wrap(content)
         
         # ii
-        for doc_type, doc_start, doc_end in zip(doc_types, doc_start_is, doc_end_is):
-            if doc_type == self.form_type:
-                docs_table[doc_type] = content[doc_start:doc_end]
-                break
-         
-        raw_content = docs_table[self.form_type]
+        raw_content = docs_index[self.form_type]
         
         # iii
-        regex = re.compile(self.reg_st1)
-        matches = regex.finditer(raw_content)
-        
-        # iv
-        out_tb = pd.DataFrame([(x.group(), x.start(), x.end()) for x in matches])
-        
-        if out_tb.size == 0: return '', pd.DataFrame()
-        
-        out_tb.columns = ['item', 'start', 'end']
-        out_tb['item'] = out_tb.item.str.lower()
-        
-        # v
-        replace_list = ['&#160;', '&nbsp;', '&#xa0;' , '\.', '>','<']
-        for symbol in replace_list:
-            out_tb.replace(symbol, '', regex = True, inplace = True)
+        with stage('match', len(raw_content)):
+            matches = self.reg_st1.finditer(raw_content)
+            
+            # iv & v: the matches come in the order of their starts; name each item once it is found
+            out_tb = item_table()
+            for x in matches:
+                out_tb.append(normalise_label(x.group()), x.start(), x.end())
         
-        out_tb.replace('\s', '', regex = True, inplace = True)
-        out_tb = out_tb.sort_values('start', ascending = True)
+        if len(out_tb) == 0: return '', item_table()
 
         return raw_content, out_tb
        
-    def second_method(self, content:str):
+    def second_method(self, content):
         '''
         The second strategy. Instead of matching the code pattern, as what we 
         did in the first strategy, now consider extracting the items needed 
@@ -242,94 +467,200 @@ class item_detector:
         Work flow:
             i. find the names of all code sections that are included in a pair of <DOCUMENT> 
             ii. check if there are codes under the form to be parsed, e.g 10-Q, DOCUMENT tag;
-            iii. if ii is true, clean the codes under the DOCUMENT tag using BS4;
-            iv. in the content cleaned by BS4, match each item directly with its title;
-            v. create a df to save the item info; remove meanningless symbols.
+            iii. if ii is true, clean the codes under the DOCUMENT tag, i.e. convert them into text by html_text;
+            iv. in the content cleaned, match all the items directly with their titles in one pass;
+            v. create an item_table to save the item info, named after the groups that match.
 
         Parameters
         ----------
-        content : str
-            DESCRIPTION.
+        content : str or document_index
+            The XML codes of the form, or a document_index already built from them.
 
         Returns
         -------
-        raw_content : str
-            The meanningful content in a form
-        out_tb : pandas df
-            The df comprised of the names, starts, and ends of the items in the form to be parsed.
+        content : str
+            The meanningful content in a form, i.e. the text cleaned in iii.
+        out_tb : item_table
+            The table comprised of the names, starts, and ends of the items in the form to be parsed.
 
         '''
         
         # i
-        doc_start_pattern = re.compile(r'<DOCUMENT>')
-        doc_end_pattern = re.compile(r'</DOCUMENT>')
-
-        type_pattern = re.compile(r'<TYPE>[^\n]+')
-
-        doc_start_is = [x.end() for x in doc_start_pattern.finditer(content)]
-        doc_end_is = [x.start() for x in doc_end_pattern.finditer(content)]
-        doc_types = [x[len('<TYPE>'):] for x in type_pattern.findall(content)]
-
-        docs_table = {}
+        docs_index = document_index.wrap(content)
         
         # ii
-        for doc_type, doc_start, doc_end in zip(doc_types, doc_start_is, doc_end_is):
-            if doc_type == self.form_type:
-                docs_table[doc_type] = content[doc_start:doc_end]
-                break
+        if self.form_type not in docs_index: return '', item_table()  
         
-        # iii        
-        if '8-K' not in docs_table.keys(): return '', pd.DataFrame()  
-        raw_content = BeautifulSoup(docs_table[self.form_type], 'lxml')
-        for table in raw_content.find_all('table'):
-            if not('\u2022' in table.get_text()):
-                table.extract()
-        content = cut_unreadable(raw_content.get_text())
+        # iii
+        content = cut_unreadable(html_to_text(docs_index[self.form_type], backend = self.text_backend))
 
         
-        item_name = []
-        item_start = []
-        item_end = []
-        
-        # iv
-        for mt in self.reg_st2:
-            matches = mt.finditer(content)
-            for x in matches:
-                item_name.append(x.group())
-                item_start.append(x.start())
-                item_end.append(x.end())
-        
-        # v
-        out_tb = []
-        out_tb.append(item_name)
-        out_tb.append(item_start)
-        out_tb.append(item_end)
-        out_tb = pd.DataFrame(out_tb).transpose()
-        out_tb.columns = ['item', 'start', 'end']
-        
-        symbols = ['\.','"','-','\n','\bb']
-        for symbol in symbols:         
-            out_tb.replace(symbol,' ',regex=True,inplace=True)
-          
-        if self.form_type == '8-K':
-            '''
-            The titles and item names in an 8-K form differs slightly from 
-            that of a 10-Q or 10-K form, so process them separately.
-            
-            '''
-            out_tb['item'] = [item[:10] for item in out_tb['item'].values]      
-        else:
-            out_tb['item'] = [''.join(item.split(' ')[:2]) for item in out_tb['item'].values]
+        # iv & v
+        with stage('match', len(content)):
+            out_tb = item_table()
+            matches = [rex.finditer(content) for rex in self.fused_st2]
+            for x in heapq.merge(*matches, key = lambda x: x.start()):
+                out_tb.append(self.labels_st2[x.lastgroup], x.start(), x.end())
         
-        out_tb.replace(' ','',regex=True,inplace=True)
-        out_tb = out_tb.sort_values('start', ascending = True)
+        if len(out_tb) == 0:
+            return '', item_table()
+
+        return content, out_tb
+    
+    def cached_method(self, content, st: int):
+        '''
+        first_method(st = 1) or second_method(st = 2), but the item table is
+        taken from self.cache if it is there, and saved in it if not. With a
+        table in the cache, only the text of the form is made again for the
+        second strategy, and nothing for the first.
+
+        '''
+        method = self.first_method if st == 1 else self.second_method
+        if self.cache is None:
+            return method(content)
+        
+        docs_index = document_index.wrap(content)
+        if self.form_type not in docs_index:
+            return method(docs_index)
+        
+        raw_content = docs_index[self.form_type]
+        with stage('cache'):
+            sha1 = doc_sha1(raw_content)
+            tb = self.cache.get(sha1, self.version, st)
+        if tb is None:
+            docs, tb = method(docs_index)
+            with stage('cache'):
+                self.cache.put(sha1, self.version, st, tb)
+            return docs, tb
+        
+        if len(tb) == 0:
+            return '', tb
+        if st == 1:
+            return raw_content, tb
+        return cut_unreadable(html_to_text(raw_content, backend = self.text_backend)), tb
+    
+    def locate_items(self, docs, tb, items: list):
+        '''
+        Find the start and the end of each item by its rule in item_rules.
+        The item table is compiled only once for all the items.
+
+        Parameters
+        ----------
+        docs : str
+            The raw_content created by one of the strategies.
+        tb : item_table
+            The out_tb created by the same strategy.
+        items : list
+            The names of the items to be located, e.g. ['item1a', 'item7'].
+
+        Returns
+        -------
+        spans : dict
+            {item: (start, end)}, or {item: None} if the item is not found.
+
+        '''
+        with stage('locate'):
+            engine = boundary_engine(tb)
+            spans = {}
+            for which in items:
+                if which in self.item_rules:
+                    spans[which] = engine.locate(self.item_rules[which], which, len(docs))
+                else:
+                    spans[which] = None
+        return spans
+    
+    def section_map(self, content, items: list):
+        '''
+        The section map mode. Find the boundaries of every item in a form in
+        one pass, i.e. run first_method(or second_method if the first strategy
+        fails) only once, and extract all the items wanted from one parse of
+        the DOCUMENT by extract_sections. The item tables are taken from the
+        cache if the detector has one; see cached_method.
+
+        Parameters
+        ----------
+        content : str or document_index
+            The XML codes of the form, or a document_index already built from them.
+        items : list
+            The names of the items to be extracted, e.g. ['item1a', 'item7'].
+
+        Returns
+        -------
+        sections : dict
+            {item: content}; the content is '' for the items not found.
+
+        '''
+        return self.scored_section_map(content, items)[0]
+    
+    def scored_section_map(self, content, items: list, order: list = (1, 2), try_all: bool = False):
+        '''
+        section_map, trying the strategies in the order given, e.g. the one
+        learnt by strategy_stats, and scoring the items extracted.
         
-        if out_tb.size == 0:
-            return '', pd.DataFrame()
-        else:
-            out_tb['item'] = out_tb.item.str.lower()
+        A strategy fails if it raises one of parse_errors or finds no item
+        tag, and then the next one is tried; with try_all, every strategy is
+        tried, e.g. to be counted by strategy_stats, but the items are still
+        those of the first that works. Such a failure is kept in the cache as
+        an empty item table, so that a rerun does not try it again on the
+        filing. The error of the last strategy is raised if all of them
+        raise, and any other error at once.
 
-        return raw_content, out_tb
+        Returns
+        -------
+        sections : dict
+            See section_map.
+        report : dict
+            'st', the strategy used, or 0 if none works; 'tried', [(st,
+            worked), ...] of the strategies tried; and 'confidence', {item:
+            score} of the items extracted, see item_rules.confidence.
+
+        '''
+        docs_index = document_index.wrap(content)
+        
+        tried = []
+        found = None
+        error = None
+        for st in order:
+            try:
+                docs, item_tb = self.cached_method(docs_index, st)
+            except parse_errors as st_error:
+                error = st_error
+                self.remember_failure(docs_index, st)
+                tried.append((st, False))
+                continue
+            worked = len(item_tb) > 0
+            tried.append((st, worked))
+            # a strategy with no tags, but no error either, is used if no other one works
+            if found is None or (worked and len(found[2]) == 0):
+                found = st, docs, item_tb
+            if worked and not try_all:
+                break
+        
+        if found is None:
+            raise error
+        
+        st, docs, item_tb = found
+        with stage('locate'):
+            engine = boundary_engine(item_tb)
+            spans = {}
+            end_ranks = {}
+            for which in items:
+                if which in self.item_rules:
+                    span, end_ranks[which] = engine.find(self.item_rules[which], which, len(docs))
+                    if span is not None:
+                        spans[which] = span
+        sections = extract_sections(docs, spans, st, self.text_backend)
+        
+        scores = {which: confidence(self.item_rules[which], end_ranks[which], st, len(sections[which]))
+                  for which in spans if len(sections.get(which, '')) > 0}
+        report = {'st': st if len(item_tb) > 0 else 0, 'tried': tried, 'confidence': scores}
+        return {which: sections.get(which, '') for which in items}, report
+    
+    def remember_failure(self, content, st: int):
+        # keep an empty table of a strategy that raises one of parse_errors on a filing in the cache
+        docs_index = document_index.wrap(content)
+        if self.cache is not None and self.form_type in docs_index:
+            self.cache.put(doc_sha1(docs_index[self.form_type]), self.version, st, item_table())
     
 
 if __name__ == '__main__':
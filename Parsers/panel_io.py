@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+'''
+DESCRIPTION
+-----------
+Read and write the panels and the summary tables in the format given by the
+extension of the file:
+    - .xlsx/.xls: Excel, as before; slow for a large panel, and limited to
+      1,048,576 rows;
+    - .csv: plain text, may be compressed, e.g. .csv.gz;
+    - .parquet/.pq: Parquet, needs pyarrow;
+    - .feather/.arrow: Arrow IPC, needs pyarrow.
+
+The empty strs, e.g. the *_adrs of the items not found, are read back as
+NaN from Excel and csv, but kept by Parquet and Arrow; they are written as
+NaN in those formats as well, so that every format reads back the same.
+
+CONTENTS
+--------
+- <DICT> panel_formats
+- <FUNC> panel_format
+- <FUNC> blank_to_nan
+- <FUNC> read_panel
+- <FUNC> write_panel
+
+OTHER INFO.
+-----------
+- Last upate: R8/10/18(Nichi)
+
+'''
+import pandas as pd
+
+# the format of each extension
+panel_formats = {'.xlsx': 'excel', '.xls': 'excel',
+                 '.csv': 'csv', '.csv.gz': 'csv', '.csv.bz2': 'csv', '.csv.zst': 'csv',
+                 '.parquet': 'parquet', '.pq': 'parquet',
+                 '.feather': 'feather', '.arrow': 'feather'}
+
+def panel_format(path: str):
+    '''
+    The format of a panel file by its extension, e.g. 'parquet'. Raises
+    ValueError for an unknown extension.
+
+    '''
+    lower = path.lower()
+    for extension, file_format in panel_formats.items():
+        if lower.endswith(extension):
+            return file_format
+    raise ValueError(f'unknown format of panel: {path}; use one of {", ".join(panel_formats)}')
+
+def blank_to_nan(panel_df: pd.DataFrame):
+    # a copy of panel_df with the empty strs in its str columns as NaN
+    blanks = {col: panel_df[col].mask(panel_df[col] == '') for col in panel_df.columns
+              if pd.api.types.is_string_dtype(panel_df[col].dtype) and (panel_df[col] == '').any()}
+    if len(blanks) == 0:
+        return panel_df
+    panel_df = panel_df.copy()
+    for col, values in blanks.items():
+        panel_df[col] = values
+    return panel_df
+
+def read_panel(path: str, columns: list = None):
+    '''
+    Read a panel or a summary table.
+
+    Parameters
+    ----------
+    path : str
+        The path of the file; see panel_formats.
+    columns : list, optional
+        Read these columns only. The default is None, i.e. all of them.
+
+    Returns
+    -------
+    panel_df : pandas.DataFrame
+
+    '''
+    file_format = panel_format(path)
+    if file_format == 'excel':
+        return pd.read_excel(path, usecols = columns)
+    if file_format == 'csv':
+        return pd.read_csv(path, usecols = columns)
+    if file_format == 'parquet':
+        return pd.read_parquet(path, columns = columns)
+    return pd.read_feather(path, columns = columns)
+
+def write_panel(panel_df: pd.DataFrame, path: str, index: bool = False):
+    '''
+    Write a panel or a summary table in the format of the extension of path.
+    The index is written as a column if index is True.
+
+    '''
+    file_format = panel_format(path)
+    if file_format == 'excel':
+        panel_df.to_excel(path, index = index)
+    elif file_format == 'csv':
+        panel_df.to_csv(path, index = index)
+    elif file_format == 'parquet':
+        blank_to_nan(panel_df).to_parquet(path, index = index)
+    else:
+        # feather keeps no index
+        panel_df = blank_to_nan(panel_df.reset_index() if index else panel_df.reset_index(drop = True))
+        panel_df.to_feather(path)
@@ -5,7 +5,7 @@ DESCRIPTION
  Using two matching strategies to extract:
     - Part I Item 2. Management's Discussion and Analysis of Financial Condition and Results of Operations
     - PART II Item 1A. Risk Factors
-    from 10-Q forms
+    from 10-Q forms. Part I Item 1 can be extracted as well.
 
 CONTENTS
 --------
@@ -13,117 +13,109 @@ CONTENTS
 
 OTHER INFO.
 -----------
-- Last upate: R4/8/28(Nichi)
+- Last upate: R8/10/18(Nichi)
 
 '''
-from bs4 import BeautifulSoup
-import pandas as pd
+from panel_io import read_panel
 import re
-import os
-from joblib import Parallel, delayed
-from matching_strategies import  cut_unreadable, item_detector
+from scheduling import schedule
+from manifest import run_manifest
+from item_store import open_item_store
+from matching_strategies import item_detector, item_prefix
+from document_index import document_index
+from boundary_cache import boundary_cache
+from profiling import run_profile, run_stage, stage
+from strategy_stats import learnt_section_map, strategy_stats
 
 class Parsing10Q:
     def __init__(self,
                 panel_df_path: str,
-                store_path: str):
+                store_path: str,
+                items: list = None,
+                store_backend: str = 'dir',
+                cache_boundaries: bool = True,
+                regex_backend: str = 're',
+                learn_order: bool = True,
+                write_threads: int = 0,
+                fsync: bool = False):
         
         self.panel_df_path = panel_df_path
         self.store_path = store_path
         
-        self.strategies = item_detector('10-Q')
-
-    def extract_items(self, docs, tb, which: str, st: int):
-        if len(tb) == 0: return ''
-        item_tb = tb.loc[tb['item'] == which,:]
+        # the item tables found are kept in store_path/boundaries.sqlite for the reruns; see boundary_cache
+        # the patterns are compiled by RE2 instead of re if regex_backend is 're2'; see regex_backend
+        self.strategies = item_detector('10-Q', cache = boundary_cache(store_path) if cache_boundaries else None,
+                                        regex_backend = regex_backend)
         
-        if which == 'item1a':
-            if len(item_tb) == 0: return ''             
-            elif len(item_tb) >= 2:
-                start_idx = 1
-            else:
-                start_idx = 0
-                
-            start_item = item_tb.start.values[start_idx]
-            rawtb = tb.loc[tb['start'] > start_item]
-            
-            if 'item2' in rawtb['item'].values:
-                end_item = rawtb.loc[rawtb['item'] == 'item2', 'start'].values[0]
-            elif 'item6' in rawtb['item'].values:
-                end_item = rawtb.loc[rawtb['item'] == 'item6', 'start'].values[0]
-            else: return ''
-            
-        elif which == 'item2':
-            if len(item_tb) == 0: return ''
-            elif len(item_tb) > 2:
-                start_idx = 2
-            elif len(item_tb) == 2:
-                start_idx = 1
-            else:
-                start_idx = 0
-                
-            start_item = item_tb.start.values[start_idx]
-            rawtb = tb.loc[tb['start'] > start_item]
-            
-            if 'item3' in rawtb['item'].values:
-                end_item = rawtb.loc[rawtb['item'] == 'item3', 'start'].values[0]
-            elif 'item4' in rawtb['item'].values:
-                end_item = rawtb.loc[rawtb['item'] == 'item4', 'start'].values[0]
-            elif 'partii' in rawtb['item'].values:
-                end_item = rawtb.loc[rawtb['item'] == 'partii', 'start'].values[0]
-            elif 'item1a' in rawtb['item'].values:
-                end_item = rawtb.loc[rawtb['item'] == 'item1a', 'start'].values[0]
-            elif 'item2' in rawtb['item'].values:
-                end_item = rawtb.loc[rawtb['item'] == 'item2', 'start'].values[0]
-            elif 'item6' in rawtb['item'].values:
-                end_item = rawtb.loc[rawtb['item'] == 'item6', 'start'].values[0]
-            else: end_item = len(docs)
-            
-        if st == 1:
-            item_raw = docs[start_item:end_item]
-            item_content = BeautifulSoup(item_raw, 'lxml')
-            
-            for table in item_content.find_all('table'):
-                if not ('\u2022' in table.get_text()):
-                    table.extract()
-       
-            output = item_content.get_text()
-            output = cut_unreadable(output)
-        else:
-            output = docs[start_item:end_item]
-            output = cut_unreadable(output)
+        # try the strategy likeliest to work on the filings of the same filer agent, form and year
+        # first, as counted in store_path/strategy_stats.sqlite, unless learn_order is False; see strategy_stats
+        self.strategy_stats = strategy_stats(store_path) if learn_order else None
+        
+        # the only DOCUMENTs read from a filing; the others are skipped unread
+        self.doc_types = ['10-Q']
+        
+        # where the items are exported, txt files or a packed store; see item_store
+        # with write_threads, the items are written in a pool of threads while the next filings are parsed; see item_writer
+        self.item_store = open_item_store(store_path, store_backend, write_threads = write_threads, fsync = fsync)
+        
+        # the items to be extracted; Part I Item 1 is also available, see item_rules
+        self.items = items if items is not None else ['item2', 'item1a']
 
-        return output
+    def __getstate__(self):
+        # the panel and the records of the run stay in the main process; a worker is sent only the rows to parse, see scheduling
+        state = self.__dict__.copy()
+        for name in ['panel_df', 'profiler', 'utilization']:
+            state.pop(name, None)
+        return state
+
+    def empty_results(self):
+        # the results of a filing in which no item is found, or of a file quarantined; see scheduling
+        results = {}
+        for item_name in self.items:
+            results[item_name] = 0
+            results[item_name + '_path'] = ''
+            results[item_name + '_conf'] = None
+        results['strategy'] = 0
+        if 'item1a' in self.items:
+            results['if10k'] = 0
+            results['ifnos'] = 0
+        return results
+
+    def merge_results(self, results: dict, forced: dict, items: list):
+        # the results of the items re-parsed in forced, the others as recorded; see Parsing8K.merge_results
+        results = dict(results)
+        for item_name in items:
+            for key in [item_name, item_name + '_path', item_name + '_conf']:
+                results[key] = forced[key]
+            if item_name == 'item1a':
+                results['if10k'] = forced['if10k']
+                results['ifnos'] = forced['ifnos']
+        results['strategy'] = results['strategy'] or forced['strategy']
+        return results
 
     def export_single_file(self, single_path):
         cik = single_path.split('/')[-1].split('_')[0]
         txt_filename = single_path.split('/')[-1].split('.')[0]
-        item_store_path = self.store_path + '/' + cik 
-        os.makedirs(item_store_path, exist_ok = True)
 
-        with open(single_path, 'r') as f:
-            content = f.read()
+        # scan the <DOCUMENT> layout once and share it across all the items,
+        # reading only the DOCUMENTs needed out of the file
+        docs_index = document_index.from_file(single_path, self.doc_types)
         
-        results = {'item2':0, 'item2_path': '',
-                   'item1a':0, 'item1a_path': '',
-                   'if10k': 0, 'ifnos':0
-                  }
+        results = self.empty_results()
         
-        for item_name in ['item2', 'item1a']:
-            try:
-                docs, item_tb = self.strategies.first_method(content)
-                item = self.extract_items(docs, item_tb, item_name,1)
-            except:
-                docs, item_tb= self.strategies.second_method(content)
-                item = self.extract_items(docs, item_tb, 'item',2)
+        # find the boundaries of all the items at once and extract them together,
+        # trying the strategy likeliest to work first
+        sections, report = learnt_section_map(self.strategies, docs_index, self.items, single_path, self.strategy_stats)
+        results['strategy'] = report['st']
+        outputs = {}
+        for item_name in self.items:
+            item = sections[item_name]
             
             if len(item) > 0:
                 results[item_name] = 1
-                item_filename = item_store_path + '/' + txt_filename + '_' + item_name + '.txt'
                 results[item_name + '_path'] = '10-Q/' + cik + '/' + txt_filename + '_' + item_name + '.txt'
-                
-                with open(item_filename, 'w') as f:
-                    f.write(item)
+                results[item_name + '_conf'] = report['confidence'].get(item_name)
+                outputs[results[item_name + '_path']] = item
                     
             if item_name == 'item1a':
                 # find 10K
@@ -140,45 +132,46 @@ class Parsing10Q:
 
                 if len(found_none) != 0 or len(found_na) != 0:
                     results['ifnos'] = 1
+        
+        with stage('write', sum(len(content) for content in outputs.values())):
+            self.item_store.write_many(outputs)
         return results
 
-    def threading(self, jobs):
-        self.panel_df = pd.read_excel(self.panel_df_path)
-        idx_list = list(self.panel_df.index)
-        num_per_job = int(len(idx_list) / jobs)
-        idx_list_cut = []
-        for i in range(jobs):
-            if i != jobs - 1:
-                idx_list_cut.append(idx_list[i * num_per_job: (i + 1) * num_per_job])
-            else:
-                idx_list_cut.append(idx_list[i * num_per_job:])
-        output = pd.DataFrame()
-        def multi_run(sub_idx_list):
-            sub_df = self.panel_df.loc[sub_idx_list,:]
-            info_names = list(sub_df.columns)
-            for idx in sub_idx_list:
-                file = sub_df.loc[idx, 'f_name']
-                results = self.export_single_file(file)
+    def threading(self, jobs, resume: bool = True, force = None, time_budget: float = None,
+                  profile: bool = False, verify: bool = False):
+        # with profile, the stages of each file are timed into self.profiler; see profiling
+        self.profiler = run_profile() if profile else None
+        with run_stage(self.profiler, 'read_panel'):
+            self.panel_df = read_panel(self.panel_df_path)
+        output = self.panel_df.copy()
+        info_names = list(output.columns)
 
-                for key, value in results.items():
-                    sub_df.loc[idx, key] = value
+        # send the files to the workers in small batches, the largest first; see scheduling
+        tasks = list(zip(output.index, output['f_name']))
+        manifest = (run_manifest(self.store_path, '10-Q', self.items, item_store = self.item_store, verify = verify)
+                    if resume else None)
+        # with a time_budget, the files too slow or failing are quarantined; see scheduling
+        results, self.utilization = schedule(self, tasks, jobs, manifest = manifest, force = force,
+                                             time_budget = time_budget, profiler = self.profiler)
+        for key in results.columns:
+            output[key] = results[key]
 
-            original_names = ['item2', 'item2_path',
-                               'item1a', 'item1a_path',
-                               'if10k', 'ifnos']
-            sub_df = sub_df.loc[:, info_names + original_names]
-            new_names = ['I2_y', 'I2_adrs',
-                        'I1A_y', 'I1A_adrs',
-                        'I1A_if10k', 'I1A_ifnos'
-                         ]
-            
-            sub_df.columns = info_names + new_names
-            
-            return sub_df
+        original_names = []
+        new_names = []
+        for item_name in self.items:
+            original_names += [item_name, item_name + '_path', item_name + '_conf']
+            new_names += [item_prefix(item_name) + '_y', item_prefix(item_name) + '_adrs', item_prefix(item_name) + '_conf']
+        original_names.append('strategy')
+        new_names.append('Strategy')
+        if 'item1a' in self.items:
+            original_names += ['if10k', 'ifnos']
+            new_names += ['I1A_if10k', 'I1A_ifnos']
+        if 'quarantine' in results.columns:
+            original_names.append('quarantine')
+            new_names.append('Quarantine')
+        output = output.loc[:, info_names + original_names]
+        output.columns = info_names + new_names
         
-        output_dfs = Parallel(n_jobs=jobs, verbose=1)(delayed(multi_run)(sub_list) for sub_list in idx_list_cut)
-        for sub_df in output_dfs:
-            output = pd.concat([output, sub_df])
         output.sort_values(by = ['CIK'], inplace = True)
         output.reset_index(drop = True, inplace = True)
         return output
@@ -15,148 +15,102 @@ CONTENTS
 
 OTHER INFO.
 -----------
-- Last upate: R4/8/28(Nichi)
+- Last upate: R8/10/18(Nichi)
 
 '''
-from bs4 import BeautifulSoup
-import pandas as pd
-import os
-from joblib import Parallel, delayed
-from matching_strategies import  cut_unreadable, item_detector
+from panel_io import read_panel
+from scheduling import schedule
+from manifest import run_manifest
+from item_store import open_item_store
+from matching_strategies import exhibit_key, item_detector, item_prefix
+from document_index import document_index
+from boundary_cache import boundary_cache
+from profiling import run_profile, run_stage, stage
+from strategy_stats import learnt_section_map, strategy_stats
+from sec_header import declared_items, parse_header, read_header
 
 class Parsing8K:
-    def __init__(self, panel_df_path: str, store_path: str):
+    def __init__(self, panel_df_path: str, store_path: str, items: list = None, store_backend: str = 'dir',
+                 header_filter: bool = True, exhibits: list = None, offset_index: bool = True,
+                 cache_boundaries: bool = True, regex_backend: str = 're', learn_order: bool = True,
+                 write_threads: int = 0, fsync: bool = False):
         
         self.panel_df_path = panel_df_path
         self.store_path = store_path
         
+        # where the items are exported, txt files or a packed store; see item_store
+        # with write_threads, the items are written in a pool of threads while the next filings are parsed; see item_writer
+        self.item_store = open_item_store(store_path, store_backend, write_threads = write_threads, fsync = fsync)
+        
         # initialise an item_detector instance as an attributes of a Parsing8K object
-        self.strategies = item_detector('8-K')
+        # the item tables found are kept in store_path/boundaries.sqlite for the reruns; see boundary_cache
+        # the patterns are compiled by RE2 instead of re if regex_backend is 're2'; see regex_backend
+        self.strategies = item_detector('8-K', cache = boundary_cache(store_path) if cache_boundaries else None,
+                                        regex_backend = regex_backend)
         
-    def extract_items(self, docs:str, tb, which: str, st: int):
-        '''
-        A method to extract the content of a certain item from the raw XML codes.
-
-        Parameters
-        ----------
-        docs : str
-            The raw XML codes included in a <DOCUMENT></DOCUMENT> tag. 
-            Input a string created by one of the strategies in item_detector module,
-            i.e., raw_content.
-            
-        tb : pandas.DataFrame
-            A dataframe including the name, start, and end of items in an 8-K form.
-            Input a pd df created by one of the strategies in item_detector module.
-            i.e., out_tb.
-            
-        which : str
-            Which item to be extractd. In the case of an 8-K form. The input should be one
-            of the following:
-                i. item202;
-                ii. item701;
-                iii. item801.
-                
-        st : int
-            Which strategy to be used in finding the start and end of a certain item.
-            The input should be one of the following:
-                i. 1 if the first strategy to be used;
-                ii. 2 if the second strategy to be used.
-
-        Returns
-        -------
-        output : str
-            The content of the item desired.
-
-        '''
-        if len(tb) == 0 or which not in tb.item.values: return ''
+        # try the strategy likeliest to work on the filings of the same filer agent, form and year
+        # first, as counted in store_path/strategy_stats.sqlite, unless learn_order is False; see strategy_stats
+        self.strategy_stats = strategy_stats(store_path) if learn_order else None
         
-        # find how many tags of the item to be extracted are found
-        item_tb = tb.loc[tb['item'] == which,:]
+        # the items to be extracted
+        self.items = items if items is not None else ['item202', 'item701', 'item801']
         
-        if len(item_tb) >= 2:
-            '''
-            If more than 2 tags of the item are found, the first one is the tag
-            in the table of contents in most cases, so use the second.
-            
-            On the other, if only one tag is found, most possibly there is no
-            table of contents in the form, so just use the only one found.
-            
-            '''
-            start_idx = 1
-        else:
-            start_idx = 0
+        # the exhibits to be extracted besides Exhibit 99.1, e.g. 'EX-99.2', or 'EX-10' for all of EX-10.x
+        self.exhibits = ['EX-99.1'] + [exhibit for exhibit in (exhibits if exhibits is not None else ['EX-99.2'])
+                                       if exhibit != 'EX-99.1']
         
-        # set the start of the item in the string
-        start_item = item_tb.start.values[start_idx]
+        # the only DOCUMENTs read from a filing; the others are skipped unread
+        self.doc_types = ['8-K'] + self.exhibits
         
-        '''
-        To find the end of the item, look at the tags whose starts have the indices
-        larger than the start we just set.
+        # keep the offsets of the DOCUMENTs of each filing in the item store, so that other
+        # exhibits can be read later without reading the whole filing; see document_index
+        self.offset_index = offset_index
         
-        '''
-        rawtb = tb.loc[tb['start'] > start_item]
+        # skip the items and Exhibit 99.1 ruled out by the SGML header of a filing; see sec_header
+        self.header_filter = header_filter
         
+    def __getstate__(self):
+        # the panel and the records of the run stay in the main process; a worker is sent only the rows to parse, see scheduling
+        state = self.__dict__.copy()
+        for name in ['panel_df', 'profiler', 'utilization']:
+            state.pop(name, None)
+        return state
+
+    def empty_results(self):
         '''
-        In the following block of codes, find the end of the item by checking the 
-        start of the item that is most possible to appear after the item we need 
-        one by one.
-        
+        The results of a filing in which nothing is found, the header telling
+        nothing about the items. Also the results of a file quarantined; see scheduling.
+
         '''
-       
-        # find item 2.02
-        if which == 'item202':
-             if 'item501' in rawtb.item.values:
-                 end_item = rawtb.start.values[rawtb.item.values == 'item501'][0]
-             elif 'item507' in rawtb.item.values:
-                 end_item = rawtb.start.values[rawtb.item.values == 'item507'][0]
-             elif 'item701' in rawtb.item.values:
-                 end_item = rawtb.start.values[rawtb.item.values == 'item701'][0]
-             elif 'item801' in rawtb.item.values:
-                 end_item = rawtb.start.values[rawtb.item.values == 'item801'][0]
-             elif 'item901' in rawtb.item.values:
-                 end_item = rawtb.start.values[rawtb.item.values == 'item901'][0]
-             else:
-                 end_item = len(docs)   
-        # find item 7.91
-        elif which == 'item701':
-             if 'item801' in rawtb.item.values:
-                 end_item = rawtb.start.values[rawtb.item.values == 'item801'][0]
-             elif 'item901' in rawtb.item.values:
-                 end_item = rawtb.start.values[rawtb.item.values == 'item901'][0]
-             else:
-                 end_item = len(docs)
-        # find item 8.01
-        elif which == 'item801':
-             if 'item901' in rawtb.item.values:
-                 end_item = rawtb.start.values[rawtb.item.values == 'item901'][0]
-             else:
-                 end_item = len(docs)
+        results = {'ex991':0,'if_ex991':0, 'ex991_path': ''}
+        for exhibit in self.exhibits[1:]:
+            results[exhibit_key(exhibit)] = 0
+            results[exhibit_key(exhibit) + '_path'] = ''
+        results['declared'] = ''
+        for item_name in self.items:
+            results[item_name] = 0
+            results[item_name + '_path'] = ''
+            results[item_name + '_991'] = 0
+            results[item_name + '_hdr'] = None
+            results[item_name + '_conf'] = None
+        results['strategy'] = 0
+        return results
+
+    def merge_results(self, results: dict, forced: dict, items: list):
         '''
-        The final extraction procedure differs due to the strategy we use. For
-        the first strategy, we remove all data tables from the XML code section
-        for the item we need, extract the content from XML codes that constitute
-        the item in a form, and finally apply cut_unreadable.
-        
-        In the case of the second strategy, as the data tables have already been
-        removed when applying the strategy and creating the raw_content, what 
-        remains is just applying cut_unreadable.
-        
+        The results of a filing whose items are re-parsed: those of the items
+        in forced, the others recorded in results. Whether 'Exhibit 99.1' is
+        mentioned in any item is taken again from the items merged; the exhibits
+        and the strategy are those recorded, unless no strategy worked.
+
         '''
-        if st == 1:         
-             item_raw = docs[start_item:end_item]
-             item_content = BeautifulSoup(item_raw, 'lxml')
-              
-             for table in item_content.find_all('table'):
-                 if not ('\u2022' in table.get_text()):
-                     table.extract()
-     
-             output = item_content.get_text()
-             output = cut_unreadable(output)
-        else:
-             output = docs[start_item:end_item]
-             output = cut_unreadable(output)
-    
-        return output
+        results = dict(results)
+        for item_name in items:
+            for key in [item_name, item_name + '_path', item_name + '_991', item_name + '_hdr', item_name + '_conf']:
+                results[key] = forced[key]
+        results['if_ex991'] = int(any(results.get(item_name + '_991') == 1 for item_name in self.items))
+        results['strategy'] = results['strategy'] or forced['strategy']
+        return results
     
     def export_single_file(self, single_path: str):
         '''
@@ -174,9 +128,13 @@ class Parsing8K:
             In the case of an 8-K form, it contains:
                 - ex991: = 1 if Exhibit 99.1 found and extracted;
                 - if_ex991: = 1 if the word 'Exhibit 99.1' found in any of the other item(s) found;
+                - ex992, ...: = 1 if the other exhibit found and extracted;
                 - item202: = 1 if Item 2.02 found and extracted;
                 - item701: = 1 if Item 7.01 found and extracted;
-                - item801: = 1 if Item 8.01 found and extracted.
+                - item801: = 1 if Item 8.01 found and extracted;
+                - declared: the items declared in the SGML header, e.g. '2.02,9.01';
+                - item202_hdr, ...: = 1 if the item is declared in the header, None if
+                  the header tells nothing about the items.
 
         '''
         
@@ -187,39 +145,66 @@ class Parsing8K:
         '''
         cik = single_path.split('/')[-1].split('_')[0]
         txt_filename = single_path.split('/')[-1].split('.')[0]
-        item_store_path = self.store_path + '/' + cik 
-        os.makedirs(item_store_path, exist_ok = True)
         
-        with open(single_path, 'r') as f:
-            content = f.read()
+        # the items declared in the header, read before the rest of the file
+        with stage('header'):
+            header = parse_header(read_header(single_path))
+            declared = declared_items(header)
         
         # extract and export Exhibit 99.1, item 2.02, item 7.01, and item 8.01, if found
-        results = {'ex991':0,'if_ex991':0, 'ex991_path': '',
-                   'item202':0, 'item202_path': '', 'item202_991': 0,
-                   'item701':0, 'item701_path': '', 'item701_991': 0,
-                   'item801':0, 'item801_path': '', 'item801_991': 0}
+        results = self.empty_results()
+        if declared is not None:
+            results['declared'] = ','.join(item[4] + '.' + item[5:] for item in declared)
+            for item_name in self.items:
+                results[item_name + '_hdr'] = int(item_name in declared)
+        
+        '''
+        Only the items declared in the header can be in the filing, and the exhibits
+        are filed under Item 9.01 and never in a filing of a single document. If
+        none of them is left, the filing is not read any further.
+        
+        '''
+        items = self.items
+        if_exhibits = True
+        if self.header_filter:
+            if declared is not None:
+                items = [item_name for item_name in self.items if item_name in declared]
+                if_exhibits = 'item901' in declared
+            if header.get('PUBLIC DOCUMENT COUNT') == '1':
+                if_exhibits = False
+            if len(items) == 0 and not if_exhibits:
+                return results
+        
+        # scan the <DOCUMENT> layout once and share it across all the items,
+        # reading only the DOCUMENTs needed out of the file, by their offsets
+        # in the sidecar index if it is there
+        # kept by the item store, packed in items.sqlite with the sqlite backend; see item_store
+        docs_index = document_index.load(single_path, self.doc_types, self.item_store if self.offset_index else None,
+                                         cik + '/' + txt_filename)
 
-        # extract Exhibit 99.1 and export, if found
-        flag_ex991 = 0
-        ex991 = item_detector.get_ex991(content)
-        if len(ex991) > 0:
-            flag_ex991 = 1
-            ex991_filename = item_store_path + '/' + txt_filename + '_ex991.txt'
-            with open(ex991_filename, 'w') as f:
-                f.write(ex991)
-            ex991_store_path = '8-K/' + cik + '/' + txt_filename + '_ex991.txt'
-            results['ex991_path'] = ex991_store_path
+        # extract all the exhibits and export, if found
+        outputs = {}
+        exhibits = item_detector.get_exhibits(docs_index, self.exhibits, self.strategies.text_backend) if if_exhibits else {}
+        for exhibit, content in exhibits.items():
+            if len(content) > 0:
+                exhibit_store_path = '8-K/' + cik + '/' + txt_filename + '_' + exhibit_key(exhibit) + '.txt'
+                results[exhibit_key(exhibit)] = 1
+                results[exhibit_key(exhibit) + '_path'] = exhibit_store_path
+                outputs[exhibit_store_path] = content
+        flag_ex991 = results['ex991']
                 
         # a dummy to indicate whether the word 'Exhibit 99.1' is mentioned in 
         # any of the other items found
         flag_if991 = 0
-        for item_name in ['item202', 'item701', 'item801']:
-            try:
-                docs, item_tb = self.strategies.first_method(content)
-                item = self.extract_items(docs, item_tb, item_name,1)
-            except:
-                docs, item_tb= self.strategies.second_method(content)
-                item = self.extract_items(docs, item_tb, 'item',2)
+        
+        # find the boundaries of all the items at once and extract them together,
+        # trying the strategy likeliest to work first
+        sections, report = {}, {'st': 0, 'confidence': {}}
+        if len(items) > 0:
+            sections, report = learnt_section_map(self.strategies, docs_index, items, single_path, self.strategy_stats)
+        results['strategy'] = report['st']
+        for item_name in self.items:
+            item = sections.get(item_name, '')
             item_if_ex991 = 0
             if len(item) > 0:
                 # export only when the length of the content is larger than zero
@@ -229,31 +214,50 @@ class Parsing8K:
                     flag_if991 += 1
                     item_if_ex991 = 1
                 results[item_name] = 1
-                item_filename = item_store_path + '/' + txt_filename + '_' + item_name + '.txt'
-                
-                with open(item_filename, 'w') as f:
-                    f.write(item)
                 results[item_name + '_991'] = item_if_ex991
 
-                # record the relative dir
+                # record the relative dir, which is also the key of the item in the item store
                 item_relative_dir = '8-K/' + cik + '/' + txt_filename + '_' + item_name + '.txt'
                 results[item_name + '_path'] = item_relative_dir
+                results[item_name + '_conf'] = report['confidence'].get(item_name)
+                outputs[item_relative_dir] = item
                     
             results['ex991'] = flag_ex991
             if flag_if991 > 0:
                 results['if_ex991'] = 1 
 
-            
+        # export all the items found at once
+        with stage('write', sum(len(content) for content in outputs.values())):
+            self.item_store.write_many(outputs)
         return results
     
-    def threading(self, jobs: int):
+    def threading(self, jobs: int, resume: bool = True, force = None, time_budget: float = None,
+                  profile: bool = False, verify: bool = False):
         '''
         Use threading to process a list of files.
 
         Parameters
         ----------
         jobs : int
-            Num. of threads to assign.
+            Num. of processes to assign.
+        resume : bool, optional
+            Skip the files recorded in the manifest under store_path, and record
+            the others; see manifest. The default is True.
+        force : optional
+            Parse the files in the manifest again, for the whole form(True or '8-K')
+            or some items(an item name or a list of them). The default is None.
+        time_budget : float, optional
+            The seconds a file may take before it is given up and quarantined, e.g.
+            a filing that makes a pattern backtrack for hours; see scheduling. The
+            default is None, i.e. no limit.
+        profile : bool, optional
+            Time the stages of each file, e.g. matching or html_text, and keep the
+            records in self.profiler, a run_profile; see profiling. The default is False.
+        verify : bool, optional
+            Record the SHA-1 of each file parsed in the manifest, so that a file whose
+            size or modified time changes but whose content does not is not parsed
+            again; this reads each file once more. The default is False, i.e. a file
+            is taken as unchanged by its size and modified time only.
 
         Returns
         -------
@@ -262,58 +266,47 @@ class Parsing8K:
 
         '''
         
+        self.profiler = run_profile() if profile else None
+        
         # read the panel data
-        self.panel_df = pd.read_excel(self.panel_df_path)
+        with run_stage(self.profiler, 'read_panel'):
+            self.panel_df = read_panel(self.panel_df_path)
         
-        # get the index of the panel data df
-        idx_list = list(self.panel_df.index)
-        num_per_job = int(len(idx_list) / jobs)
+        output = self.panel_df.copy()
+        info_names = list(output.columns)
         
         '''
-        To apply threading, first cut the list of indices into some sub-lists;
-        the length of each sub-list is dependent of the jobs we assign.
+        Instead of cutting the panel into one chunk for each job, send the files
+        to the workers in small batches as they become free, the largest files
+        first; see scheduling.
         
         '''
-        idx_list_cut = []
-        for i in range(jobs):
-            if i != jobs - 1:
-                idx_list_cut.append(idx_list[i * num_per_job: (i + 1) * num_per_job])
-            else:
-                idx_list_cut.append(idx_list[i * num_per_job:])
-        
-        # the func to be run in each thread
-        def multi_run(sub_idx_list):
-            sub_df = self.panel_df.loc[sub_idx_list,:]
-            info_names = list(sub_df.columns)
+        tasks = list(zip(output.index, output['f_name']))
+        manifest = (run_manifest(self.store_path, '8-K', self.items, item_store = self.item_store, verify = verify)
+                    if resume else None)
+        results, self.utilization = schedule(self, tasks, jobs, manifest = manifest, force = force,
+                                             time_budget = time_budget, profiler = self.profiler)
         
-            for idx in sub_idx_list:
-                file = sub_df.loc[idx, 'f_name']
-                results = self.export_single_file(file)
-                
-                # fill in the results of extraction
-                for key, value in results.items():
-                    sub_df.loc[idx, key] = value
+        # fill in the results of extraction
+        for key in results.columns:
+            output[key] = results[key]
 
-            original_names = ['ex991','if_ex991', 'ex991_path',
-                            'item202', 'item202_path', 'item202_991',
-                            'item701', 'item701_path', 'item701_991',
-                            'item801', 'item801_path', 'item801_991']
-            sub_df = sub_df.loc[:, info_names + original_names]
-            new_names = ['Ex991_y', 'Ex991_any', 'Ex991_adrs',
-                        'I202_y', 'I202_adrs', 'I202_if991',
-                        'I701_y', 'I701_adrs', 'I701_if991',
-                        'I801_y', 'I801_adrs', 'I801_if991']
-            sub_df.columns = info_names + new_names
-
-            return sub_df
-        
-        # apply threading
-        output_dfs = Parallel(n_jobs=jobs, verbose=5)(delayed(multi_run)(sub_list) for sub_list in idx_list_cut)
-        # create an empty df to save the result
-        output = pd.DataFrame()
-        # aggregate sub-dfs created by the threading
-        for sub_df in output_dfs:
-            output = pd.concat([output, sub_df])
+        original_names = ['ex991','if_ex991', 'ex991_path', 'declared']
+        new_names = ['Ex991_y', 'Ex991_any', 'Ex991_adrs', 'Items_declared']
+        for exhibit in self.exhibits[1:]:
+            original_names += [exhibit_key(exhibit), exhibit_key(exhibit) + '_path']
+            new_names += ['Ex' + exhibit_key(exhibit)[2:] + '_y', 'Ex' + exhibit_key(exhibit)[2:] + '_adrs']
+        for item_name in self.items:
+            original_names += [item_name, item_name + '_path', item_name + '_991', item_name + '_hdr', item_name + '_conf']
+            new_names += [item_prefix(item_name) + '_y', item_prefix(item_name) + '_adrs', item_prefix(item_name) + '_if991',
+                          item_prefix(item_name) + '_hdr', item_prefix(item_name) + '_conf']
+        original_names.append('strategy')
+        new_names.append('Strategy')
+        if 'quarantine' in results.columns:
+            original_names.append('quarantine')
+            new_names.append('Quarantine')
+        output = output.loc[:, info_names + original_names]
+        output.columns = info_names + new_names
             
         output.sort_values(by = ['CIK'], inplace = True)
         output.reset_index(drop = True, inplace = True)
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+'''
+DESCRIPTION
+-----------
+The stage timer of the parsers, to tell where the time of a slow run goes.
+The hot spots of the parsers are wrapped in a stage, e.g.
+
+    with stage('html_text', len(codes)):
+        ...
+
+which does nothing unless a filing_profile is active in the process, i.e.
+unless the run is profiled. A filing_profile takes the wall and CPU time,
+the bytes and the calls of each stage in a filing; the time of a stage
+within another one is taken out of the outer one, so that the stages of a
+filing add up to its time, the rest being 'other'. If tracemalloc is
+tracing, the peak of the memory allocated in each stage is taken as well.
+The stages are:
+    - header: read and parse the SGML header(8-K);
+    - read: read the bytes of the filing, decompressed if need be;
+    - split: find the DOCUMENTs and decode those wanted;
+    - match: match the patterns of the strategies;
+    - cache: get or put the item tables in the boundary_cache;
+    - locate: find the boundaries of the items by their rules;
+    - strip_hidden: cut the hidden markup out of the codes before html_text;
+    - html_text: convert the codes to text, by BeautifulSoup or lxml;
+    - cut_unreadable: clean the text;
+    - write: export the items, or queue them if they are written by an
+      async_writer, whose latency is reported apart; see item_writer.
+
+The records of the filings are sent back by the workers and summed up by a
+run_profile: histograms of the time of each stage in a filing, the bytes
+processed, the time of each worker, and the slowest filings with their
+stages, and the writer of the items if async. The report is saved as JSON.
+
+CONTENTS
+--------
+- <LIST> histogram_edges
+- <CLASS> stage
+- <CLASS> filing_profile
+- <FUNC> histogram
+- <FUNC> percentile
+- <CLASS> run_profile
+- <CLASS> run_stage
+
+OTHER INFO.
+-----------
+- Last upate: R8/10/18(Nichi)
+
+'''
+import json
+import os
+import time
+import tracemalloc
+
+# the filing_profile of the filing being parsed in this process, if profiled
+active = None
+
+# the edges, in seconds, of the bins of the histograms
+histogram_edges = [0.001, 0.01, 0.1, 1, 10, 100]
+histogram_labels = ['<1ms', '1-10ms', '10-100ms', '0.1-1s', '1-10s', '10-100s', '>=100s']
+
+class stage:
+    __slots__ = ('name', 'nbytes', 'profile', 'parent', 'wall', 'cpu', 'child_wall', 'child_cpu',
+                 'memory', 'peak_before', 'child_peak')
+
+    def __init__(self, name: str, nbytes: int = 0):
+        self.name = name
+        self.nbytes = nbytes
+
+    def __enter__(self):
+        self.profile = active
+        if self.profile is not None:
+            self.parent = self.profile.current
+            self.profile.current = self
+            self.child_wall = self.child_cpu = 0.0
+            if self.profile.trace_memory:
+                # the peak so far belongs to the outer stage; take the peak of this one from here
+                self.memory, self.peak_before = tracemalloc.get_traced_memory()
+                self.child_peak = 0
+                tracemalloc.reset_peak()
+            self.wall = time.perf_counter()
+            self.cpu = time.process_time()
+        return self
+
+    def add_bytes(self, nbytes: int):
+        # for the bytes known only in the stage, e.g. those read
+        self.nbytes += nbytes
+
+    def __exit__(self, *exc):
+        if self.profile is None:
+            return False
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        peak = 0
+        if self.profile.trace_memory:
+            peak = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+        self.profile.add(self.name, wall - self.child_wall, cpu - self.child_cpu, self.nbytes,
+                         peak - self.memory if self.profile.trace_memory else 0)
+        self.profile.current = self.parent
+        if self.parent is not None:
+            self.parent.child_wall += wall
+            self.parent.child_cpu += cpu
+            if self.profile.trace_memory:
+                self.parent.child_peak = max(self.parent.child_peak, self.peak_before, peak)
+        return False
+
+class filing_profile:
+    '''
+    The stages of one filing; active in the process within a with block.
+
+    '''
+    def __init__(self, path: str, nbytes: int = 0):
+        self.path = path
+        self.nbytes = nbytes
+        # name: [wall, cpu, bytes, calls, peak]
+        self.stages = {}
+        self.current = None
+        self.trace_memory = tracemalloc.is_tracing()
+
+    def __enter__(self):
+        global active
+        self.outer = active
+        active = self
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc):
+        global active
+        self.wall = time.perf_counter() - self.wall
+        self.cpu = time.process_time() - self.cpu
+        active = self.outer
+        return False
+
+    def add(self, name: str, wall: float, cpu: float, nbytes: int, peak: int = 0):
+        values = self.stages.setdefault(name, [0.0, 0.0, 0, 0, 0])
+        values[0] += wall
+        values[1] += cpu
+        values[2] += nbytes
+        values[3] += 1
+        values[4] = max(values[4], peak)
+
+    def record(self):
+        '''
+        {'path', 'pid', 'bytes', 'wall', 'cpu', 'stages': {name: {'wall',
+        'cpu', 'bytes', 'calls', 'peak'}}}, the time not in any stage being
+        'other'. peak is the most memory allocated in a call of the stage
+        over what there was when it began, 0 if tracemalloc is not tracing.
+
+        '''
+        stages = {name: {'wall': wall, 'cpu': cpu, 'bytes': nbytes, 'calls': calls, 'peak': peak}
+                  for name, (wall, cpu, nbytes, calls, peak) in self.stages.items()}
+        stages['other'] = {'wall': max(self.wall - sum(each['wall'] for each in stages.values()), 0.0),
+                           'cpu': max(self.cpu - sum(each['cpu'] for each in stages.values()), 0.0),
+                           'bytes': 0, 'calls': 1, 'peak': 0}
+        return {'path': self.path, 'pid': os.getpid(), 'bytes': self.nbytes,
+                'wall': self.wall, 'cpu': self.cpu, 'stages': stages}
+
+def histogram(values: list):
+    # {label: count} over histogram_edges
+    counts = dict.fromkeys(histogram_labels, 0)
+    for value in values:
+        i = 0
+        while i < len(histogram_edges) and value >= histogram_edges[i]:
+            i += 1
+        counts[histogram_labels[i]] += 1
+    return counts
+
+def percentile(values: list, q: float):
+    if len(values) == 0:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+class run_profile:
+    '''
+    The records of the filings of a run, from all the workers, and the time
+    of the stages of the run itself, e.g. reading the panel.
+
+    '''
+    def __init__(self, top_n: int = 20):
+        self.top_n = top_n
+        self.filings = []
+        self.run_stages = {}
+        # see item_writer.writer_report
+        self.writer = None
+
+    def add(self, records: list):
+        self.filings.extend(records)
+
+    def report(self):
+        '''
+        The report of the run.
+
+        Returns
+        -------
+        report : dict
+            files, bytes, wall_s and cpu_s summed over the filings;
+            run_stages, the seconds of each stage of the run; stages, for each
+            stage the time, bytes and calls summed up, its share of the wall
+            time of the filings, and the histograms and percentiles of its
+            time in a filing, and the peak memory of a call of it in MB;
+            workers, the files and time of each process;
+            writer, the writes and latency of the async_writer, or None;
+            slowest, the records of the top_n slowest filings.
+
+        '''
+        wall = sum(record['wall'] for record in self.filings)
+        stages = {}
+        for record in self.filings:
+            for name, values in record['stages'].items():
+                stages.setdefault(name, []).append(values)
+
+        stage_report = {}
+        for name, values in sorted(stages.items(), key = lambda x: -sum(each['wall'] for each in x[1])):
+            walls = [each['wall'] for each in values]
+            cpus = [each['cpu'] for each in values]
+            stage_report[name] = {'wall_s': sum(walls), 'cpu_s': sum(cpus),
+                                  'bytes': sum(each['bytes'] for each in values),
+                                  'calls': sum(each['calls'] for each in values),
+                                  'files': len(values),
+                                  'share': sum(walls) / wall if wall > 0 else 0.0,
+                                  'wall_p50_s': percentile(walls, 0.5),
+                                  'wall_p95_s': percentile(walls, 0.95),
+                                  'wall_max_s': max(walls),
+                                  'peak_mb': max(each['peak'] for each in values) / 1e6,
+                                  'wall_hist': histogram(walls),
+                                  'cpu_hist': histogram(cpus)}
+
+        workers = {}
+        for record in self.filings:
+            worker = workers.setdefault(str(record['pid']), {'files': 0, 'bytes': 0, 'wall_s': 0.0, 'cpu_s': 0.0})
+            worker['files'] += 1
+            worker['bytes'] += record['bytes']
+            worker['wall_s'] += record['wall']
+            worker['cpu_s'] += record['cpu']
+
+        slowest = sorted(self.filings, key = lambda record: -record['wall'])[:self.top_n]
+        return {'files': len(self.filings),
+                'bytes': sum(record['bytes'] for record in self.filings),
+                'wall_s': wall,
+                'cpu_s': sum(record['cpu'] for record in self.filings),
+                'run_stages': self.run_stages,
+                'stages': stage_report,
+                'workers': workers,
+                'writer': self.writer,
+                'slowest': slowest}
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent = 1)
+
+class run_stage:
+    # a stage of the run, timed by wall time into profile.run_stages unless profile is None
+    def __init__(self, profile: run_profile, name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.profile is None:
+            return False
+        self.profile.run_stages[self.name] = self.profile.run_stages.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+'''
+DESCRIPTION
+-----------
+The regex engines to compile the patterns of the first strategy with:
+    - re: the stdlib, the default. It backtracks, so a pattern like the
+      <.*> of the 10-Q pattern takes time quadratic in the length of a line
+      on the long single-line HTML of some filings;
+    - re2: RE2 by the google-re2 package, which matches in linear time. It
+      is used only if it is installed, and only for the patterns it
+      supports, i.e. without lookarounds or backreferences; re is used
+      otherwise.
+
+The class of spaces of re matches any Unicode space for a str, but that of
+RE2 only the ASCII ones, so it is translated into the same set for RE2 to
+find the same matches, e.g. on the non-breaking spaces in the codes.
+
+CONTENTS
+--------
+- <STR> default_regex_backend
+- <FUNC> re2_pattern
+- <FUNC> compile_pattern
+
+OTHER INFO.
+-----------
+- Last upate: R8/10/18(Nichi)
+
+'''
+import re
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+default_regex_backend = 're'
+
+# the chars matched by \s of re for a str
+re2_spaces = r'\t\n\x0b\x0c\r\x1c-\x1f\x{85}\p{Z}'
+
+def re2_pattern(pattern: str):
+    '''
+    A func to rewrite a pattern of re for RE2, i.e. translate the class of
+    spaces into re2_spaces.
+
+    '''
+    pieces = []
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\' and i + 1 < len(pattern):
+            escape = pattern[i:i + 2]
+            if escape == r'\s':
+                pieces.append(re2_spaces if in_class else '[' + re2_spaces + ']')
+            else:
+                pieces.append(escape)
+            i += 2
+            continue
+        if char == '[' and not in_class:
+            in_class = True
+        elif char == ']' and in_class and pattern[i - 1] != '[':
+            in_class = False
+        pieces.append(char)
+        i += 1
+    return ''.join(pieces)
+
+def compile_pattern(pattern: str, backend: str = default_regex_backend):
+    '''
+    Compile a pattern with the backend, 're' or 're2'. re is used if re2 is
+    not installed or does not support the pattern.
+
+    Returns
+    -------
+    rex : compiled pattern
+        Used as one of re, i.e. by finditer, group, start and end.
+
+    '''
+    if backend == 're2' and re2 is not None:
+        try:
+            return re2.compile(re2_pattern(pattern))
+        except re2.error:
+            pass
+    elif backend not in ('re', 're2'):
+        raise ValueError(f'unknown regex backend: {backend}')
+    return re.compile(pattern)
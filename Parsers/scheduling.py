@@ -0,0 +1,534 @@
+# -*- coding: utf-8 -*-
+'''
+DESCRIPTION
+-----------
+The scheduler used by the threading method of the parsers. Instead of
+cutting the panel into one chunk of files for each job, the files are sent
+to the workers in small batches as the workers become free, the largest
+files first, so that a chunk full of large submissions no longer decides
+when a run finishes. The size of a file on the disk is taken as the cost to
+parse it.
+
+The workers are not sent the paths of their files: the paths and sizes of
+the files to parse are written once, sorted by size, into a task_table, a
+memory-mapped .npy file that a worker maps for each batch, and a batch
+is only a range of its rows, with the plans of the manifest for those rows
+if any. A worker sends back the range and the results by columns, those of
+bools, ints or floats as numpy arrays, instead of a df for each file.
+
+If a run_manifest is given, the files parsed already are skipped, and each
+batch is recorded in the manifest as soon as it is done; see manifest.
+
+If a time budget is given, each file is parsed in a child process of the
+worker, which is killed if the file is not done in time, e.g. on a filing
+that makes a regex backtrack for hours. The SQLite connections of the
+parser are closed before the child is forked, SQLite forbidding a
+connection to be used across a fork, and opened again when used. Such a
+file, or one that raises an error, is quarantined: its row has the reason
+in the quarantine column and the results of a filing in which nothing is
+found, and it is not recorded in the manifest, so that it is tried again by
+the next run.
+
+If a run_profile is given, the time of each stage of each file is taken
+by the workers and sent back with the results; see profiling.
+
+The counts of the strategies learnt by the parser(see strategy_stats) are
+sent back with the results of a batch and saved by the main process, one
+transaction for each batch.
+
+If the items are written by an async_writer(see item_writer), a worker
+flushes it at the end of each batch, so that a batch is recorded in the
+manifest only once its items are written, and sends back the stats of the
+writer; in a child process of a time budget, the items are flushed before
+the child exits.
+
+CONTENTS
+--------
+- <FUNC> file_size
+- <CLASS> task_table
+- <FUNC> size_aware_batches
+- <FUNC> to_columns
+- <FUNC> compact_columns
+- <FUNC> export_with_plan
+- <FUNC> export_profiled
+- <FUNC> close_connections
+- <FUNC> export_in_child
+- <FUNC> run_batch
+- <FUNC> merge_batches
+- <FUNC> utilization_report
+- <FUNC> schedule
+
+OTHER INFO.
+-----------
+- Last upate: R8/10/18(Nichi)
+
+'''
+import multiprocessing
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from manifest import file_sha1
+from filing_io import filing_path
+from profiling import filing_profile
+from item_writer import async_writer, writer_report
+
+def file_size(path: str):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+class task_table:
+    '''
+    The paths and sizes of the files to parse, in a .npy file mapped by each
+    process that reads it, so that the panel is written once instead of being
+    sent to the workers with every batch.
+
+    '''
+    def __init__(self, path: str):
+        self.path = path
+
+    @classmethod
+    def create(cls, sized: list, folder: str = None):
+        '''
+        Write the table of [(path, size), ...] into a temp file in folder(the
+        temp folder of the system if None).
+
+        '''
+        paths = [path.encode('utf-8', 'surrogateescape') for path, _ in sized]
+        table = np.zeros(len(sized), dtype = [('size', 'i8'), ('path', 'S%d' % max([len(x) for x in paths] + [1]))])
+        table['size'] = [size for _, size in sized]
+        table['path'] = paths
+        handle, path = tempfile.mkstemp(prefix = 'tasks_', suffix = '.npy', dir = folder)
+        with os.fdopen(handle, 'wb') as f:
+            np.save(f, table)
+        return cls(path)
+
+    def rows(self, start: int, stop: int):
+        # [(path, size), ...] of the rows in range(start, stop); the file is unmapped at once, so that it can be removed
+        table = np.load(self.path, mmap_mode = 'r')
+        rows = [(path.decode('utf-8', 'surrogateescape'), int(size)) for size, path in table[start:stop]]
+        del table
+        return rows
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def size_aware_batches(tasks: list, batch_size: int = 4, plans: dict = None):
+    '''
+    A func to sort the files by their sizes, the largest first, and cut them
+    into batches of rows of the sorted list.
+
+    Parameters
+    ----------
+    tasks : list
+        (idx, path) of the files to be parsed, idx being the index of the
+        file in the panel.
+    batch_size : int, optional
+        The num. of files in a batch. The default is 4.
+    plans : dict, optional
+        {idx: plan} made by run_manifest.plan. The default is None.
+
+    Returns
+    -------
+    sized : list
+        (idx, path, size) of the files, the largest first.
+    batches : list
+        (start, stop, {row: plan}) of each batch, the rows of sized being
+        range(start, stop) and those without a plan left out of the dict.
+
+    '''
+    plans = plans if plans is not None else {}
+    sized = [(idx, path, file_size(path)) for idx, path in tasks]
+    sized.sort(key = lambda x: x[2], reverse = True)
+    batches = []
+    for start in range(0, len(sized), batch_size):
+        stop = min(start + batch_size, len(sized))
+        batch_plans = {row: plans[sized[row][0]] for row in range(start, stop) if plans.get(sized[row][0]) is not None}
+        batches.append((start, stop, batch_plans))
+    return sized, batches
+
+def to_columns(rows: list):
+    '''
+    A func to turn a list of dicts into {key: [values]}, None being filled
+    in for a key that is not in every dict.
+
+    '''
+    columns = {}
+    for row, results in enumerate(rows):
+        for key, value in results.items():
+            columns.setdefault(key, [None] * row).append(value)
+        for values in columns.values():
+            if len(values) == row:
+                values.append(None)
+    return columns
+
+def compact_columns(columns: dict):
+    '''
+    A func to turn the columns of to_columns made only of bools, ints or
+    floats into numpy arrays, which are sent back by a worker as one buffer
+    each instead of one object for each value; see merge_batches.
+
+    '''
+    compact = {}
+    for key, values in columns.items():
+        kinds = {type(value) for value in values}
+        if len(values) > 0 and len(kinds) == 1 and kinds <= {bool, int, float}:
+            try:
+                compact[key] = np.array(values)
+                continue
+            except OverflowError:
+                pass
+        compact[key] = values
+    return compact
+
+def export_with_plan(parser, path: str, plan: dict, manifest):
+    '''
+    Export a file by the parser, following its plan made by the manifest.
+
+    Returns
+    -------
+    results : dict
+        The results of extraction.
+    record : dict or None
+        The new record of the file for the manifest, or None if no manifest.
+
+    '''
+    if manifest is None:
+        return parser.export_single_file(path), None
+
+    # the filing is read to be hashed only if its size or modified time changed and a SHA-1 is recorded
+    sha1 = file_sha1(path) if plan is not None and plan['sha1'] is not None else None
+    if plan is None or (sha1 is not None and plan['sha1'] != sha1):
+        results = parser.export_single_file(path)
+        return results, manifest.new_record(path, results, sha1 = sha1)
+
+    if plan['items'] is None:
+        # modified time changed, but the content did not
+        results = plan['results']
+    else:
+        # re-parse the items forced only, keeping the results of the filing as a whole
+        all_items = parser.items
+        parser.items = plan['items']
+        try:
+            forced = parser.export_single_file(path)
+        finally:
+            parser.items = all_items
+        results = parser.merge_results(plan['results'], forced, plan['items'])
+    return results, manifest.new_record(path, results, plan['record_items'], sha1 = sha1)
+
+def export_profiled(parser, path: str, size: int, plan: dict, manifest, profile: bool):
+    '''
+    export_with_plan, and if profile is True, the record of the stages of the
+    file taken by a filing_profile; see profiling.
+
+    Returns
+    -------
+    results : dict
+    record : dict
+        See export_with_plan.
+    profile_record : dict
+        See filing_profile.record; None if profile is False.
+
+    '''
+    if not profile:
+        return (*export_with_plan(parser, path, plan, manifest), None)
+
+    with filing_profile(path, size) as timer:
+        results, record = export_with_plan(parser, path, plan, manifest)
+    return results, record, timer.record()
+
+def close_connections(parser):
+    '''
+    Close the SQLite connections of the item store, the boundary_cache and
+    the strategy_stats of the parser, if open; each of them opens a new one
+    when it is used again.
+
+    '''
+    store = parser.item_store.store if isinstance(parser.item_store, async_writer) else parser.item_store
+    for holder in [store, parser.strategies.cache, parser.strategy_stats]:
+        if getattr(holder, 'connection', None) is not None:
+            holder.connection.close()
+            holder.connection = None
+
+def child_export(sender, parser, path: str, size: int, plan: dict, manifest, profile: bool):
+    # the func run by the child process of export_in_child
+    try:
+        if parser.strategy_stats is not None:
+            # the counts forked from the worker are its own; send back those of this file only
+            parser.strategy_stats.take_pending()
+        value = export_profiled(parser, path, size, plan, manifest, profile)
+        parser.item_store.flush()
+        counts = parser.strategy_stats.take_pending() if parser.strategy_stats is not None else {}
+        sender.send(('ok', (*value, counts)))
+    except BaseException as error:
+        sender.send(('error', f'{type(error).__name__}: {error}'))
+    finally:
+        sender.close()
+
+def export_in_child(parser, path: str, size: int, plan: dict, manifest, profile: bool, time_budget: float):
+    '''
+    Run export_profiled in a child process, and kill it if it is not done
+    in time_budget seconds. The child is forked where possible, so that the
+    parser need not be sent to it.
+
+    Returns
+    -------
+    status : str
+        'ok', 'timeout' or 'error'.
+    value : tuple or str
+        The (results, record, profile_record) of export_profiled and the new
+        counts of parser.strategy_stats if ok, or else the reason.
+
+    '''
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+    # a connection open in the worker must not be used by the forked child
+    close_connections(parser)
+    receiver, sender = context.Pipe(duplex = False)
+    child = context.Process(target = child_export, args = (sender, parser, path, size, plan, manifest, profile))
+    child.start()
+    sender.close()
+    
+    if receiver.poll(time_budget):
+        try:
+            status, value = receiver.recv()
+        except EOFError:
+            status, value = 'error', 'the process of the file exited'
+    else:
+        status, value = 'timeout', f'not done in {time_budget}s'
+    
+    if child.is_alive():
+        child.terminate()
+    child.join()
+    receiver.close()
+    return status, value
+
+def run_batch(parser, tasks: task_table, batch: tuple, manifest = None, time_budget: float = None,
+              profile: bool = False):
+    '''
+    The func run by a worker: export every file in a batch of rows of tasks
+    by the parser, and record how long the worker is busy with it. The
+    results of the files are returned by columns, i.e. one list or array of
+    values for each key of the results, which is much smaller to send back
+    than a dict or a df for each file; see compact_columns.
+
+    With a time_budget in seconds, each file is parsed by export_in_child,
+    and the results of a file that fails are the empty results of the
+    parser, with the reason in 'quarantine'.
+    
+    With profile True, the stages of each file are timed; see profiling.
+
+    Returns
+    -------
+    stats : dict
+        The pid of the worker, the num. of files and bytes, the time spent,
+        the (start, stop) of the rows, {key: values} of their results, their
+        new records for the manifest, the records of their stages if
+        profiled, the stats of the writer of the items, if async, and the new
+        counts of parser.strategy_stats.
+
+    '''
+    start = time.perf_counter()
+    first, stop, plans = batch
+    files = tasks.rows(first, stop)
+    rows = []
+    records = []
+    profiles = []
+    for row, (path, size) in enumerate(files, first):
+        plan = plans.get(row)
+        if time_budget is None:
+            results, record, profile_record = export_profiled(parser, path, size, plan, manifest, profile)
+        else:
+            status, value = export_in_child(parser, path, size, plan, manifest, profile, time_budget)
+            if status == 'ok':
+                (results, record, profile_record, counts), reason = value, ''
+                if parser.strategy_stats is not None:
+                    parser.strategy_stats.add_counts(counts)
+            else:
+                results, record, profile_record, reason = parser.empty_results(), None, None, f'{status}: {value}'
+            results = {**results, 'quarantine': reason}
+        rows.append(results)
+        if record is not None:
+            records.append(record)
+        if profile_record is not None:
+            profiles.append(profile_record)
+    writer = parser.item_store.flush()
+    
+    stats = {'pid': os.getpid(),
+             'files': len(files),
+             'bytes': sum(size for _, size in files),
+             'busy': time.perf_counter() - start,
+             'rows': (first, stop),
+             'columns': compact_columns(to_columns(rows)),
+             'records': records,
+             'profiles': profiles,
+             'writer': writer,
+             'strategy_counts': parser.strategy_stats.take_pending() if parser.strategy_stats is not None else {}}
+    return stats
+
+def merge_batches(batch_stats: list, tasks: list, sized: list):
+    '''
+    A func to merge the columns returned by the batches into one df at once,
+    the rows of a batch being mapped to the idx of their files by sized; a
+    batch with 'idx' instead of 'rows', e.g. the files skipped, gives them.
+
+    Returns
+    -------
+    results : pandas.DataFrame
+        The results of each file, indexed by its idx in the panel and sorted
+        in the order of tasks.
+
+    '''
+    idx_list = []
+    columns = {}
+    for stats in batch_stats:
+        n_rows = len(idx_list)
+        if 'rows' in stats:
+            idx_list += [sized[row][0] for row in range(*stats['rows'])]
+        else:
+            idx_list += stats['idx']
+        for key, values in stats['columns'].items():
+            values = values.tolist() if isinstance(values, np.ndarray) else values
+            columns.setdefault(key, [None] * n_rows).extend(values)
+        for values in columns.values():
+            if len(values) < len(idx_list):
+                values.extend([None] * (len(idx_list) - len(values)))
+
+    results = pd.DataFrame(columns, index = idx_list)
+    return results.reindex([idx for idx, _ in tasks])
+
+def utilization_report(batch_stats: list, wall: float):
+    '''
+    A func to sum up the batches done by each worker.
+
+    Returns
+    -------
+    report : pandas.DataFrame
+        One row for each worker: the num. of batches, files and MB parsed, the
+        time it was busy, and its utilization, i.e. busy time / wall time.
+
+    '''
+    report = {}
+    for stats in batch_stats:
+        worker = report.setdefault(stats['pid'], {'pid': stats['pid'], 'batches': 0, 'files': 0, 'mb': 0.0, 'busy_s': 0.0})
+        worker['batches'] += 1
+        worker['files'] += stats['files']
+        worker['mb'] += stats['bytes'] / 1e6
+        worker['busy_s'] += stats['busy']
+
+    report = pd.DataFrame(list(report.values()), columns = ['pid', 'batches', 'files', 'mb', 'busy_s'])
+    report['utilization'] = report['busy_s'] / wall if wall > 0 else 0.0
+    return report
+
+def schedule(parser, tasks: list, jobs: int, batch_size: int = 4, verbose: int = 1, manifest = None, force = None,
+             time_budget: float = None, profiler = None):
+    '''
+    Export the files by parser.export_single_file in a pool of jobs processes,
+    the batches of files being dispatched to the workers one at a time.
+
+    Parameters
+    ----------
+    parser : Parsing8K, Parsing10K or Parsing10Q
+        The parser to export each file.
+    tasks : list
+        (idx, path) of the files to be parsed. A file may be compressed.
+    jobs : int
+        Num. of processes.
+    batch_size : int, optional
+        The num. of files sent to a worker at a time. The default is 4.
+    verbose : int, optional
+        Print the utilization of the workers at the end if verbose > 0. The
+        default is 1.
+    manifest : run_manifest, optional
+        Skip the files parsed already and record the others in it. The
+        default is None, i.e. parse every file.
+    force : optional
+        Parse again the files in the manifest, for the form(True or the form
+        type) or some items(an item name or a list of them). The default is None.
+    time_budget : float, optional
+        The seconds a file may take before it is quarantined; see run_batch.
+        The default is None, i.e. no limit.
+    profiler : run_profile, optional
+        Time the stages of each file, and add their records to it; see
+        profiling. The default is None, i.e. no profiling.
+
+    Returns
+    -------
+    results : pandas.DataFrame
+        See merge_batches. With a time_budget, the quarantine column gives
+        the reason why a file is quarantined, or '' if it is not.
+    report : pandas.DataFrame
+        See utilization_report. The writer of the items is reported by
+        writer_report, in the profiler if any.
+
+    '''
+    # a filing may be on the disk compressed, e.g. <file>.txt.gz; see filing_io
+    tasks = [(idx, filing_path(path)) for idx, path in tasks]
+    
+    done = {'idx': [], 'columns': {}}
+    plans = {}
+    if manifest is not None:
+        skipped = []
+        to_parse = []
+        for idx, path in tasks:
+            plan = manifest.plan(path, force)
+            if plan is not None and plan['sha1'] is None and plan['items'] is None:
+                done['idx'].append(idx)
+                skipped.append(plan['results'])
+            else:
+                to_parse.append((idx, path))
+                plans[idx] = plan
+        done['columns'] = to_columns(skipped)
+    else:
+        to_parse = tasks
+    
+    sized, batches = size_aware_batches(to_parse, batch_size, plans)
+    table = task_table.create([(path, size) for _, path, size in sized])
+
+    start = time.perf_counter()
+    batch_stats = []
+    try:
+        for stats in Parallel(n_jobs = jobs, batch_size = 1, pre_dispatch = '2*n_jobs', verbose = verbose,
+                              return_as = 'generator_unordered')(
+                delayed(run_batch)(parser, table, batch, manifest, time_budget, profiler is not None)
+                for batch in batches):
+            if manifest is not None:
+                manifest.append(stats['records'])
+            if profiler is not None:
+                profiler.add(stats['profiles'])
+            if parser.strategy_stats is not None:
+                parser.strategy_stats.save(stats['strategy_counts'])
+            batch_stats.append(stats)
+    finally:
+        table.remove()
+    wall = time.perf_counter() - start
+    writer = writer_report([stats['writer'] for stats in batch_stats])
+    if profiler is not None:
+        profiler.run_stages['parse'] = wall
+        profiler.writer = writer
+    
+    if manifest is not None:
+        manifest.compact()
+
+    results = merge_batches([done] + batch_stats, tasks, sized)
+    if time_budget is not None:
+        # the files skipped as parsed already are not quarantined
+        results['quarantine'] = results['quarantine'].fillna('') if 'quarantine' in results else ''
+
+    report = utilization_report(batch_stats, wall)
+    if verbose > 0:
+        print(f'{len(to_parse)} files in {len(batches)} batches, {wall:.1f}s on {jobs} workers; '
+              f'{len(done["idx"])} files skipped as parsed already')
+        if time_budget is not None:
+            print(f'{(results["quarantine"] != "").sum()} files quarantined')
+        print(report.to_string(index = False))
+        if writer is not None:
+            print(f'writer: {writer["files"]} files in {writer["batches"]} batches, {writer["write_s"]:.1f}s writing, '
+                  f'{writer["wait_s"]:.1f}s waited on a full queue, latency p50 {writer["latency_p50_s"]:.3f}s, '
+                  f'p95 {writer["latency_p95_s"]:.3f}s')
+    return results, report
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+'''
+DESCRIPTION
+-----------
+Read the SGML header of an EDGAR full-submission file, i.e. the lines
+before the first <DOCUMENT>, without reading the rest of the file:
+
+    ACCESSION NUMBER:		0000950170-22-009069
+    CONFORMED SUBMISSION TYPE:	8-K
+    PUBLIC DOCUMENT COUNT:		3
+    CONFORMED PERIOD OF REPORT:	20220510
+    ITEM INFORMATION:		Results of Operations and Financial Condition
+    ITEM INFORMATION:		Financial Statements and Exhibits
+    ...
+
+The ITEM INFORMATION lines of an 8-K tell the items in it, so that the
+filings without any of the items wanted need not be parsed at all.
+
+CONTENTS
+--------
+- <FUNC> read_header
+- <FUNC> parse_header
+- <DICT> item_descriptions
+- <FUNC> declared_items
+
+OTHER INFO.
+-----------
+- Last upate: R8/10/18(Nichi)
+
+'''
+import re
+from filing_io import open_filing
+
+header_line = re.compile(r'^\s*([A-Z][A-Z0-9 \-/]*[A-Z0-9]):[ \t]*(.*?)\s*$', re.M)
+
+def read_header(path: str, chunk_size: int = 8192, max_size: int = 1 << 20):
+    '''
+    Read the header of a filing, which may be compressed, chunk_size bytes at
+    a time until </SEC-HEADER> or <DOCUMENT> is met, but max_size bytes at most.
+
+    '''
+    data = b''
+    with open_filing(path, 'rb') as f:
+        while len(data) < max_size:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            data += chunk
+            end = min(i for i in (data.find(b'</SEC-HEADER>'), data.find(b'<DOCUMENT>'), len(data)) if i >= 0)
+            if end < len(data):
+                data = data[:end]
+                break
+    return data.decode('utf-8', 'replace')
+
+def parse_header(header: str):
+    '''
+    The 'KEY: value' lines of a header. The first value is kept for a key,
+    e.g. the CIK of the first filer, except ITEM INFORMATION, whose values are
+    all kept in a list.
+
+    Returns
+    -------
+    fields : dict
+        e.g. {'ACCESSION NUMBER': '0000950170-22-009069', ...,
+              'ITEM INFORMATION': ['Results of Operations and Financial Condition', ...]}
+
+    '''
+    fields = {'ITEM INFORMATION': []}
+    for key, value in header_line.findall(header):
+        if key == 'ITEM INFORMATION':
+            fields[key].append(value)
+        elif value and key not in fields:
+            fields[key] = value
+    return fields
+
+def description_key(description: str):
+    return re.sub(r'[^a-z]', '', description.lower())
+
+# the descriptions of the 8-K items in ITEM INFORMATION; the last three are
+# those used before the items were renumbered in 2004
+item_descriptions = {description_key(description): item for description, item in [
+    ('Entry into a Material Definitive Agreement', 'item101'),
+    ('Termination of a Material Definitive Agreement', 'item102'),
+    ('Bankruptcy or Receivership', 'item103'),
+    ('Mine Safety - Reporting of Shutdowns and Patterns of Violations', 'item104'),
+    ('Material Cybersecurity Incidents', 'item105'),
+    ('Completion of Acquisition or Disposition of Assets', 'item201'),
+    ('Results of Operations and Financial Condition', 'item202'),
+    ('Creation of a Direct Financial Obligation or an Obligation under an Off-Balance Sheet Arrangement of a Registrant', 'item203'),
+    ('Triggering Events That Accelerate or Increase a Direct Financial Obligation or an Obligation under an Off-Balance Sheet Arrangement', 'item204'),
+    ('Costs Associated with Exit or Disposal Activities', 'item205'),
+    ('Material Impairments', 'item206'),
+    ('Notice of Delisting or Failure to Satisfy a Continued Listing Rule or Standard; Transfer of Listing', 'item301'),
+    ('Unregistered Sales of Equity Securities', 'item302'),
+    ('Material Modification to Rights of Security Holders', 'item303'),
+    ("Changes in Registrant's Certifying Accountant", 'item401'),
+    ('Non-Reliance on Previously Issued Financial Statements or a Related Audit Report or Completed Interim Review', 'item402'),
+    ('Changes in Control of Registrant', 'item501'),
+    ('Departure of Directors or Certain Officers; Election of Directors; Appointment of Certain Officers; Compensatory Arrangements of Certain Officers', 'item502'),
+    ('Amendments to Articles of Incorporation or Bylaws; Change in Fiscal Year', 'item503'),
+    ("Temporary Suspension of Trading Under Registrant's Employee Benefit Plans", 'item504'),
+    ("Amendments to the Registrant's Code of Ethics, or Waiver of a Provision of the Code of Ethics", 'item505'),
+    ('Change in Shell Company Status', 'item506'),
+    ('Submission of Matters to a Vote of Security Holders', 'item507'),
+    ('Shareholder Director Nominations', 'item508'),
+    ('ABS Informational and Computational Material', 'item601'),
+    ('Change of Servicer or Trustee', 'item602'),
+    ('Change in Credit Enhancement or Other External Support', 'item603'),
+    ('Failure to Make a Required Distribution', 'item604'),
+    ('Securities Act Updating Disclosure', 'item605'),
+    ('Static Pool', 'item606'),
+    ('Regulation FD Disclosure', 'item701'),
+    ('Other Events', 'item801'),
+    ('Financial Statements and Exhibits', 'item901'),
+    ('Acquisition or Disposition of Assets', 'item201'),
+    ("Resignations of Registrant's Directors", 'item502'),
+    ('Change in Fiscal Year', 'item503')]}
+
+def declared_items(fields: dict):
+    '''
+    The 8-K items declared in the header, e.g. ['item202', 'item901'].
+
+    None if the header declares no item, or a description is not known, in
+    which case nothing can be told about the items in the filing.
+
+    '''
+    descriptions = fields.get('ITEM INFORMATION', [])
+    if len(descriptions) == 0:
+        return None
+
+    items = []
+    for description in descriptions:
+        item = item_descriptions.get(description_key(description))
+        if item is None:
+            return None
+        if item not in items:
+            items.append(item)
+    return items
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+'''
+DESCRIPTION
+-----------
+Running statistics of how often each strategy in matching_strategies works,
+by filer agent, form and year, to try the likeliest strategy of a filing
+first. A strategy works on a filing if it raises no error and finds any
+item tag in it; see item_detector.scored_section_map.
+
+Only a sample of the filings is counted: one in sample_every, by the hash
+of the file name, on which every strategy is tried whatever the order, so
+that the rates compare the strategies on the same filings, and a strategy
+put second is still counted and can come first again. The default order is
+kept unless another strategy works more often than the first one by more
+than margin on the sampled filings of the group.
+
+The filer agent is the first ten digits of the accession number, e.g.
+0000950170 in 0000950170-22-009069, i.e. the CIK of the agent that made the
+filing, whose software decides how the codes look; the year is that of the
+accession number.
+
+The counts are kept in one SQLite database under the store_path,
+strategy_stats.sqlite:
+
+    stats(agent TEXT, form TEXT, year INTEGER, st INTEGER, tried INTEGER, worked INTEGER)
+
+Each worker loads the counts when it starts and adds those of its filings
+to them as it goes; the new counts of a batch are sent back with its
+results and saved by the main process(see scheduling), so that the workers
+never contend for the database, and the order learnt by a run is used by
+the next one.
+
+CONTENTS
+--------
+- <FUNC> filing_group
+- <CLASS> strategy_stats
+- <FUNC> learnt_section_map
+
+OTHER INFO.
+-----------
+- Last upate: R8/10/18(Nichi)
+
+'''
+import hashlib
+import os
+import re
+import sqlite3
+
+accession_number = re.compile(r'([0-9]{10})-([0-9]{2})-[0-9]{6}')
+
+def filing_group(path: str, form_type: str):
+    '''
+    (agent, form, year) of a filing by the accession number in its file name,
+    e.g. ('0000950170', '8-K', 2022) for
+    1000045_8-K_2022-05-10_0000950170-22-009069.txt; the agent is '' and the
+    year 0 if there is no accession number in the name.
+
+    '''
+    found = accession_number.search(path.split('/')[-1])
+    if found is None:
+        return '', form_type, 0
+    yy = int(found.group(2))
+    return found.group(1), form_type, (1900 if yy >= 90 else 2000) + yy
+
+class strategy_stats:
+    file_name = 'strategy_stats.sqlite'
+
+    def __init__(self, store_path: str, strategies: tuple = (1, 2), min_tried: int = 20, sample_every: int = 10,
+                 margin: float = 0.05):
+        '''
+        Parameters
+        ----------
+        store_path : str
+            The store_path of the parser, where the database is kept.
+        strategies : tuple, optional
+            The strategies in the default order, used while too few filings
+            are counted. The default is (1, 2).
+        min_tried : int, optional
+            The num. of filings of a group to be counted before its own rates
+            are used; with fewer, those of the filer agent and form of all the
+            years are used, and then those of the form. The default is 20.
+        sample_every : int, optional
+            One in so many filings is sampled, i.e. tried by every strategy and
+            counted. The default is 10.
+        margin : float, optional
+            How much more often another strategy must work than the first of
+            the default order to be tried first. The default is 0.05.
+
+        '''
+        self.store_path = store_path
+        self.db_path = store_path + '/' + self.file_name
+        self.strategies = tuple(strategies)
+        self.min_tried = min_tried
+        self.sample_every = sample_every
+        self.margin = margin
+        self.connection = None
+        # (agent, form, year, st): [tried, worked], loaded from the database once
+        self.counts = {}
+        self.loaded = False
+        # the counts not saved yet, in the same form
+        self.pending = {}
+
+    def __getstate__(self):
+        # each process opens a connection of its own and loads the counts then
+        state = self.__dict__.copy()
+        state['connection'] = None
+        state['counts'] = {}
+        state['pending'] = {}
+        state['loaded'] = False
+        return state
+
+    def connect(self):
+        if self.connection is None:
+            os.makedirs(self.store_path, exist_ok = True)
+            self.connection = sqlite3.connect(self.db_path, timeout = 600)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS stats (agent TEXT, form TEXT, year INTEGER, st INTEGER, '
+                                    'tried INTEGER, worked INTEGER, PRIMARY KEY (agent, form, year, st))')
+            self.connection.commit()
+        if not self.loaded:
+            # not again on a connection opened once more, e.g. after a fork, which would lose the counts of this process
+            for agent, form, year, st, tried, worked in self.connection.execute('SELECT * FROM stats'):
+                self.counts[(agent, form, year, st)] = [tried, worked]
+            self.loaded = True
+        return self.connection
+
+    def rates(self, group: tuple):
+        '''
+        {st: the rate the strategy works at} for a group, falling back to the
+        wider groups while fewer than min_tried filings are counted, or None if
+        even the form has fewer. The rates are smoothed, (worked + 1) / (tried + 2).
+
+        '''
+        self.connect()
+        agent, form, year = group
+        for matches in [lambda key: key[:3] == (agent, form, year),
+                        lambda key: key[:2] == (agent, form),
+                        lambda key: key[1] == form]:
+            sums = {st: [0, 0] for st in self.strategies}
+            for key, (tried, worked) in self.counts.items():
+                if key[3] in sums and matches(key):
+                    sums[key[3]][0] += tried
+                    sums[key[3]][1] += worked
+            if min(tried for tried, _ in sums.values()) >= self.min_tried:
+                return {st: (worked + 1) / (tried + 2) for st, (tried, worked) in sums.items()}
+        return None
+
+    def order(self, group: tuple):
+        '''
+        The strategies to try on a filing of the group: the default order,
+        unless another strategy works more often than the first one by more
+        than margin, in which case it is tried first.
+
+        '''
+        rates = self.rates(group)
+        order = list(self.strategies)
+        if rates is None:
+            return order
+        best = max(order, key = lambda st: rates[st])
+        if rates[best] > rates[order[0]] + self.margin:
+            order.remove(best)
+            order.insert(0, best)
+        return order
+
+    def sampled(self, path: str):
+        # whether a filing is sampled, by the hash of its file name, the same in every run
+        name = path.split('/')[-1].encode('utf-8', 'surrogateescape')
+        return int(hashlib.sha1(name).hexdigest()[:8], 16) % self.sample_every == 0
+
+    def add_counts(self, counts: dict):
+        # add {(agent, form, year, st): [tried, worked]} to the counts and to those to be saved
+        for key, (tried, worked) in counts.items():
+            for table in [self.counts, self.pending]:
+                values = table.setdefault(key, [0, 0])
+                values[0] += tried
+                values[1] += worked
+
+    def record(self, group: tuple, tried: list):
+        '''
+        Count the strategies tried on a sampled filing, [(st, worked), ...].
+        The counts are saved by save.
+
+        '''
+        self.add_counts({(*group, st): [1, int(worked)] for st, worked in tried})
+
+    def take_pending(self):
+        # the counts not saved yet, which are then left to the caller to save
+        pending, self.pending = self.pending, {}
+        return pending
+
+    def save(self, counts: dict = None):
+        '''
+        Add counts, e.g. those of a batch sent back by a worker, or else the
+        pending ones of this process, to the database in one transaction.
+
+        '''
+        counts = counts if counts is not None else self.take_pending()
+        if len(counts) == 0:
+            return
+        connection = self.connect()
+        with connection:
+            connection.executemany('INSERT INTO stats VALUES (?, ?, ?, ?, ?, ?) '
+                                   'ON CONFLICT (agent, form, year, st) DO UPDATE SET '
+                                   'tried = tried + excluded.tried, worked = worked + excluded.worked',
+                                   [(*key, tried, worked) for key, (tried, worked) in counts.items()])
+
+def learnt_section_map(detector, content, items: list, path: str, stats: strategy_stats = None):
+    '''
+    detector.scored_section_map of a filing in path, trying the strategies in
+    the order learnt by stats for its group; a sampled filing is tried by
+    every strategy and counted in stats. The default order is used if stats
+    is None.
+
+    '''
+    if stats is None:
+        return detector.scored_section_map(content, items, (1, 2))
+    group = filing_group(path, detector.form_type)
+    sampled = stats.sampled(path)
+    sections, report = detector.scored_section_map(content, items, stats.order(group), try_all = sampled)
+    if sampled:
+        stats.record(group, report['tried'])
+    return sections, report
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+# the modules of Parsers import each other by their names, so Parsers is put on the path
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
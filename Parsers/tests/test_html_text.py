@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+'''
+The text of every backend in html_text must be the same as that of the bs4
+backend, the reference, on the HTML fixtures in tests/fixtures, whole and
+cut into slices like the codes of the items, with and without strip_hidden.
+
+'''
+import os
+import random
+import pytest
+from html_text import html_to_text, strip_hidden, text_backends
+
+fixtures_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+fixture_names = sorted(name for name in os.listdir(fixtures_path) if name.endswith('.html'))
+
+def read_fixture(name: str):
+    # newline = '' keeps the \r\n of crlf.html
+    with open(os.path.join(fixtures_path, name), 'r', encoding = 'utf-8', newline = '') as f:
+        return f.read()
+
+def fixture_slices(codes: str, n_slices: int = 20, seed: int = 0):
+    rng = random.Random(seed)
+    spans = []
+    for _ in range(n_slices):
+        start = rng.randrange(len(codes) + 1)
+        spans.append((start, rng.randint(start, len(codes))))
+    return spans
+
+@pytest.mark.parametrize('name', fixture_names)
+@pytest.mark.parametrize('backend', [backend for backend in text_backends if backend != 'bs4'])
+def test_same_text_as_bs4(name, backend):
+    codes = read_fixture(name)
+    assert text_backends[backend](codes) == text_backends['bs4'](codes)
+    for start, end in fixture_slices(codes):
+        assert text_backends[backend](codes[start:end]) == text_backends['bs4'](codes[start:end]), (start, end)
+
+@pytest.mark.parametrize('name', fixture_names)
+def test_same_text_after_strip_hidden(name):
+    codes = read_fixture(name)
+    texts = {backend: html_to_text(codes, backend = backend) for backend in text_backends}
+    assert len(set(texts.values())) == 1, texts
+
+def test_bullet_tables_kept():
+    text = text_backends['bs4'](read_fixture('bullet_tables.html'))
+    assert 'Our revenue depends on a few customers.' in text
+    assert 'Rates may rise.' in text
+    assert '1,234' not in text
+    assert 'A middle dot is not a bullet.' not in text
+
+def test_hidden_markup_stripped():
+    codes = read_fixture('ixbrl_hidden.html')
+    stripped = strip_hidden(codes)
+    assert 'ix:header' not in stripped
+    assert 'style=' not in stripped.split('An unclosed hidden div')[0]
+    for backend in text_backends:
+        text = html_to_text(codes, backend = backend)
+        assert 'HIDDEN' not in text
+        assert "Item 7. Management's Discussion and Analysis" in text
+        assert 'Revenue was $1,234 million.' in text
+        assert 'Visible after the hidden parts.' in text
+        # a hidden element not closed in the codes, e.g. in the slice of an item, is kept
+        assert 'An unclosed hidden div is kept' in text
+
+def test_hidden_markup_kept_without_strip():
+    codes = read_fixture('ixbrl_hidden.html')
+    for backend in text_backends:
+        assert 'HIDDEN-10-K' in html_to_text(codes, backend = backend, strip = False)
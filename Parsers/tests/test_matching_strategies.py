@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+'''
+The failures of a strategy kept in the boundary_cache by
+item_detector.scored_section_map: only those of parse_errors.
+
+'''
+import sqlite3
+import pytest
+from benchmark import synthetic_submission
+from boundary_cache import boundary_cache, doc_sha1
+from document_index import document_index
+from matching_strategies import item_detector
+
+def failing(error):
+    def method(content):
+        raise error
+    return method
+
+@pytest.mark.parametrize('error, cached', [(IndexError('no tag'), True), (AttributeError('no match'), True),
+                                           (MemoryError(), False), (sqlite3.OperationalError('database is locked'), False)])
+def test_failure_cached(tmp_path, error, cached):
+    detector = item_detector('8-K', cache = boundary_cache(str(tmp_path)))
+    detector.first_method = failing(error)
+    content = synthetic_submission('8-K', 500, binary_kb = 1)
+    
+    if cached:
+        sections, report = detector.scored_section_map(content, ['item202'])
+        assert report['tried'][0] == (1, False) and report['st'] == 2
+    else:
+        with pytest.raises(type(error)):
+            detector.scored_section_map(content, ['item202'])
+    
+    sha1 = doc_sha1(document_index.wrap(content)['8-K'])
+    tb = detector.cache.get(sha1, detector.version, 1)
+    assert (tb is not None and len(tb) == 0) if cached else tb is None
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+'''
+The runs of the parsers on a small synthetic archive written by benchmark:
+the summaries keep their columns when every filing is quarantined, the
+results of a filing when some of its items are forced to be parsed again,
+and the 10-K tables the columns of the panel.
+
+'''
+import pandas as pd
+import pytest
+from benchmark import write_synthetic_archive
+from parsing8K import Parsing8K
+from parsing10K import Parsing10K
+from parsing10Q import Parsing10Q
+
+parsers = {'8-K': Parsing8K, '10-K': Parsing10K, '10-Q': Parsing10Q}
+
+def synthetic_parser(folder, form_type: str, n_files: int = 2):
+    panel_path = write_synthetic_archive(str(folder / 'archive'), form_type, n_files, n_words = 2000, binary_kb = 4)
+    if form_type == '8-K':
+        # Exhibit 99.1 is mentioned in Item 8.01 only, for Ex991_any
+        for path in pd.read_csv(panel_path)['f_name']:
+            with open(path) as f:
+                content = f.read()
+            with open(path, 'w') as f:
+                f.write(content.replace('Other Events</span></div>',
+                                        'Other Events</span></div>\n<div><span>The press release is furnished as '
+                                        'Exhibit 99.1.</span></div>'))
+    return parsers[form_type](panel_path, str(folder / 'store'))
+
+def summaries(output):
+    # the 10-K summary is one table for each item
+    return output if isinstance(output, tuple) else (output,)
+
+@pytest.mark.parametrize('form_type', list(parsers))
+def test_all_quarantined(tmp_path, form_type):
+    parser = synthetic_parser(tmp_path, form_type)
+    expected = [summary.columns.tolist() for summary in summaries(parser.threading(1, resume = False))]
+    
+    for summary, columns in zip(summaries(parser.threading(1, resume = False, time_budget = 1e-6)), expected):
+        assert summary.columns.tolist() == columns + ['Quarantine']
+        assert (summary['Quarantine'] != '').all()
+        assert (summary['Strategy'] == 0).all()
+
+@pytest.mark.parametrize('form_type', list(parsers))
+def test_forced_partial_reparse(tmp_path, form_type):
+    # the results of the filing as a whole are kept when some of its items are parsed again
+    parser = synthetic_parser(tmp_path, form_type)
+    expected = summaries(parser.threading(1))
+    if form_type == '8-K':
+        assert (expected[0]['Ex991_any'] == 1).all() and (expected[0]['I801_if991'] == 1).all()
+    
+    for summary, first in zip(summaries(parser.threading(1, force = parser.items[0])), expected):
+        pd.testing.assert_frame_equal(summary, first)
+
+def test_discovery_columns_in_10k_tables(tmp_path):
+    # the columns of the panel besides the path are kept in the table of each item
+    parser = synthetic_parser(tmp_path, '10-K')
+    panel_df = pd.read_csv(parser.panel_df_path)
+    panel_df['accession'] = panel_df['f_name'].str.rsplit('_', n = 1).str[-1].str[:-4]
+    panel_df['sic'] = 7372
+    panel_df.to_csv(parser.panel_df_path, index = False)
+    
+    for summary in parser.threading(1, resume = False):
+        assert summary.columns[:6].tolist() == ['CIK', 'co_name', 'f_date', 'f_type', 'accession', 'sic']
+        assert 'f_name' not in summary.columns